@@ -0,0 +1,89 @@
+from dataclasses import dataclass
+from typing import List, Optional, TypeVar
+import numpy as np
+from .time_dep_value import TimeDependentValue
+
+Room = TypeVar('Room')
+
+
+@dataclass
+class AdaptiveInterval:
+    """
+        @brief Settings for choosing the interval between applications of the wind as the simulation runs
+        The interval grows while the concentration changes caused by the apertures stay below the tolerance,
+        and shrinks when they go above it.
+        @variable min_interval: the shortest interval allowed (s)
+        @variable max_interval: the longest interval allowed (s)
+        @variable tolerance: the largest relative concentration change allowed from one application of the wind
+        @variable growth_factor: the most the interval can grow by from one interval to the next
+        @variable shrink_factor: the most the interval can shrink by (as a multiplier) in one attempt
+        @variable safety_factor: how far below the tolerance to aim
+        @variable concentration_floor: concentrations (molecule cm-3) below this are compared to it instead,
+        so that the relative changes of species which are barely present are ignored
+    """
+    min_interval: float
+    max_interval: float
+    tolerance: float = 0.05
+    growth_factor: float = 2.0
+    shrink_factor: float = 0.2
+    safety_factor: float = 0.9
+    concentration_floor: float = 1.0e5
+
+    def __post_init__(self):
+        if self.min_interval <= 0 or self.max_interval < self.min_interval:
+            raise ValueError("The interval bounds must satisfy 0 < min_interval <= max_interval")
+        if self.tolerance <= 0:
+            raise ValueError("The tolerance must be positive")
+
+    def clamp(self, interval: float) -> float:
+        """
+        Restrict an interval to the bounds
+        """
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def next_interval(self, interval: float, relative_change: float) -> float:
+        """
+        The interval to try next, given the relative concentration change caused by the current one
+        The change caused by the wind is proportional to the interval, so it is scaled towards the tolerance
+        """
+        if relative_change <= 0:
+            factor = self.growth_factor
+        else:
+            factor = self.safety_factor*self.tolerance/relative_change
+            factor = min(self.growth_factor, max(self.shrink_factor, factor))
+        return self.clamp(interval*factor)
+
+
+def _step_change_times(value: TimeDependentValue) -> np.ndarray:
+    """
+    The times at which a step-wise value differs from its value before,
+    a schedule given every hour changes far less often than that
+    """
+    times = np.asarray(value.times(), dtype=float)
+    values = np.asarray(value.values(), dtype=float)
+    return times[1:][values[1:] != values[:-1]]
+
+
+def schedule_change_times(rooms: List[Room]) -> np.ndarray:
+    """
+    The sorted times at which any room's inputs change abruptly:
+    the times at which any step-wise (not continuous) time dependent value, such as the light switch
+    and the numbers of adults and children, takes a new value, and the start and end of every emission bracket
+    """
+    times = []
+    for room in rooms:
+        for value in vars(room).values():
+            if isinstance(value, TimeDependentValue) and not value.continuous:
+                times.extend(_step_change_times(value))
+        emissions = getattr(room, "emissions", None) or {}
+        for bracketed_value in emissions.values():
+            times.extend(bracketed_value.boundaries())
+    return np.unique(np.array(times, dtype=float))
+
+
+def next_change_after(change_times: np.ndarray, t: float) -> Optional[float]:
+    """
+    The first of the change times strictly after t, or None if there isn't one
+    """
+    i = np.searchsorted(change_times, t, side='right')
+    return float(change_times[i]) if i < len(change_times) else None
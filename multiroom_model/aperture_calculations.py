@@ -1,8 +1,9 @@
 from dataclasses import dataclass
-from typing import List, Union, Tuple, TypeVar
+from typing import Callable, List, Union, Tuple, TypeVar
 from .aperture import Aperture, Side
 from .transport_paths import TransportPath
 import math
+import numpy as np
 
 Room = TypeVar('Room')
 
@@ -37,29 +38,32 @@ def room_has_outdoor_aperture(room: Room, apertures: List[Aperture]):
     return any((a.origin == room and type(a.destination) is Side for a in apertures))
 
 
+# The angle of a transport path relative to the building, by its start and end sides
+_transport_path_offsets = {
+    (Side.Front, Side.Back): math.pi,
+    (Side.Front, Side.Left): -3.0*math.pi / 4,
+    (Side.Front, Side.Right): 3.0*math.pi / 4,
+
+    (Side.Back, Side.Front): 0,
+    (Side.Back, Side.Left): -math.pi / 4,
+    (Side.Back, Side.Right): math.pi / 4,
+
+    (Side.Left, Side.Front): math.pi / 4,
+    (Side.Left, Side.Back): 3 * math.pi / 4,
+    (Side.Left, Side.Right): math.pi/2.0,
+
+    (Side.Right, Side.Front): -math.pi / 4,
+    (Side.Right, Side.Back): -3 * math.pi / 4,
+    (Side.Right, Side.Left): -math.pi/2.0,
+}
+
+
 def transport_path_angle_in_radians(transport_path: TransportPath, building_direction_in_radians: float):
     """
     Find the angle of a given transport path, and a given building direction
     if the building direction is 0, then a back->front path will be north and this method will return 0
     """
-    offsets = {
-        (Side.Front, Side.Back): math.pi,
-        (Side.Front, Side.Left): -3.0*math.pi / 4,
-        (Side.Front, Side.Right): 3.0*math.pi / 4,
-
-        (Side.Back, Side.Front): 0,
-        (Side.Back, Side.Left): -math.pi / 4,
-        (Side.Back, Side.Right): math.pi / 4,
-
-        (Side.Left, Side.Front): math.pi / 4,
-        (Side.Left, Side.Back): 3 * math.pi / 4,
-        (Side.Left, Side.Right): math.pi/2.0,
-
-        (Side.Right, Side.Front): -math.pi / 4,
-        (Side.Right, Side.Back): -3 * math.pi / 4,
-        (Side.Right, Side.Left): -math.pi/2.0,
-    }
-    offset = offsets.get((transport_path.start, transport_path.end))
+    offset = _transport_path_offsets.get((transport_path.start, transport_path.end))
     if offset is None:
         raise ValueError("Invalid direction transition")
     return building_direction_in_radians + offset
@@ -81,6 +85,7 @@ def flow_advection(io_windspd: float, oarea: float, Cd: float, Cp: float, air_de
     '''
     Calculate the advection flow through an opening (door or window), given its area
     and the component of ambient wind passing through it.
+    ApertureCalculation.advection_flow_rate calculates the same for all of its contributions at once.
 
     inputs:
         io_windspd = component of the wind through the aperture (m/s)
@@ -107,10 +112,6 @@ def flow_advection(io_windspd: float, oarea: float, Cd: float, Cp: float, air_de
     # advection flow (in m3/s)
     adv_flow = flow_coeff * math.sqrt(2/air_density) * (delta_P**flow_m)
 
-    print('|-------> delta_P = ', delta_P)
-    print('|-------> flow_coeff = ', flow_coeff)
-    print('|-------> adv_flow = ', adv_flow)
-
     return adv_flow
 
 
@@ -180,6 +181,21 @@ class ApertureCalculation:
         self.building_pressure_coefficients = building_pressure_coefficients
         self.contributions = self._build_contributions(aperture, transport_paths)
 
+        # The geometry does not change with the wind, so everything which only depends on it is calculated once here
+        # The angle of every transport path, and whether it includes the rooms either side of this aperture
+        self._path_angles = np.array([transport_path_angle_in_radians(tp, building_direction_in_radians)
+                                      for tp in transport_paths], dtype=float)
+        self._origin_paths = np.array([transport_path_contains_room(aperture.origin, tp)
+                                       for tp in transport_paths], dtype=bool)
+        self._destination_paths = np.array([transport_path_contains_room(aperture.destination, tp)
+                                            for tp in transport_paths], dtype=bool)
+
+        # The angle, position down the path and direction sign of each contribution
+        self._contribution_angles = np.array([transport_path_angle_in_radians(c.path, building_direction_in_radians)
+                                              for c in self.contributions], dtype=float)
+        self._contribution_positions = np.array([c.position_down_path for c in self.contributions], dtype=float)
+        self._contribution_signs = np.array([-1 if c.reversed else 1 for c in self.contributions], dtype=float)
+
         if (building_pressure_coefficients[0] < building_pressure_coefficients[1]):
             raise Exception("The higher building pressure coefficient should come first")
 
@@ -203,45 +219,50 @@ class ApertureCalculation:
                     ))
         return result
 
+    def _contribution_windspeeds(self, wind_speed: float, wind_direction: float) -> np.ndarray:
+        """
+        the component of the wind along the path of each contribution
+        """
+        return wind_speed * np.cos(wind_direction - self._contribution_angles)
+
+    def _is_cross_ventilated(self, room_paths: np.ndarray, wind_speed: float, wind_direction: float) -> bool:
+        """
+        detect whether any of the given transport paths carries wind, as is_room_cross_ventilated
+        """
+        path_windspeeds = wind_speed * np.cos(wind_direction - self._path_angles[room_paths])
+        return bool(np.any(np.abs(path_windspeeds) > _zero_advection_tolerance))
+
     def has_advection_flow(self, wind_speed: float, wind_direction: float):
         """
         detect whether given wind conditions cause any advection flow
         """
-        for contribution in self.contributions:
-            value = transport_path_windspeed(contribution.path, wind_speed,
-                                             wind_direction, self.building_direction_in_radians)
-            if abs(value) > _zero_advection_tolerance:
-                return True
-        return False
+        values = self._contribution_windspeeds(wind_speed, wind_direction)
+        return bool(np.any(np.abs(values) > _zero_advection_tolerance))
 
     def advection_flow_rate(self, wind_speed: float, wind_direction: float):
         """
         the advection flow resulting from given wind conditions
         """
-        sum = 0
-        for contribution in self.contributions:
-            path_windspeed = transport_path_windspeed(contribution.path,
-                                                      wind_speed,
-                                                      wind_direction,
-                                                      self.building_direction_in_radians)
+        if len(self.contributions) == 0:
+            return 0
+
+        path_windspeeds = self._contribution_windspeeds(wind_speed, wind_direction)
 
-            position = contribution.position_down_path if path_windspeed > 0 else 1.0-contribution.position_down_path
+        positions = np.where(path_windspeeds > 0, self._contribution_positions, 1.0-self._contribution_positions)
 
-            path_wind_direction_sign = -1 if path_windspeed < 0 else 1
-            aperture_reversed_sign = -1 if contribution.reversed else 1
-            flow_advection_sign = path_wind_direction_sign*aperture_reversed_sign
+        path_wind_direction_signs = np.where(path_windspeeds < 0, -1.0, 1.0)
+        flow_advection_signs = path_wind_direction_signs*self._contribution_signs
 
-            discharge_coefficient = 0.7/(1.0 + position)
+        discharge_coefficients = 0.7/(1.0 + positions)
 
-            flow_advection_magnitude = flow_advection(path_windspeed,
-                                  self.aperture.area,
-                                  discharge_coefficient,
-                                  self.building_pressure_coefficients,
-                                  self.air_density)
-            
-            sum += flow_advection_sign * flow_advection_magnitude
+        # The advection flow of every contribution at once, as flow_advection calculates for one
+        dynamic_pressures = 0.5 * self.air_density * path_windspeeds**2
+        pressure_differences = (dynamic_pressures * self.building_pressure_coefficients[0]
+                                - dynamic_pressures * self.building_pressure_coefficients[1])
+        flow_advection_magnitudes = (discharge_coefficients * self.aperture.area
+                                     * math.sqrt(2/self.air_density) * np.sqrt(pressure_differences))
 
-        return sum
+        return float(np.dot(flow_advection_signs, flow_advection_magnitudes))
 
     def exchange_category(self, wind_speed: float, wind_direction: float):
         """
@@ -252,19 +273,18 @@ class ApertureCalculation:
         3) if this aperture goes to a room with a connection to outside ("costal" room)
         4) if this aperture is none of the above (between 2 "landlocked" rooms)
         """
-        if is_room_cross_ventilated(self.aperture.origin,
-                                    self.transport_paths,
-                                    wind_speed,
-                                    wind_direction,
-                                    self.building_direction_in_radians):
+        if self._is_cross_ventilated(self._origin_paths, wind_speed, wind_direction):
             return 1
-        elif is_room_cross_ventilated(self.aperture.destination,
-                                      self.transport_paths,
-                                      wind_speed,
-                                      wind_direction,
-                                      self.building_direction_in_radians):
+        elif self._is_cross_ventilated(self._destination_paths, wind_speed, wind_direction):
             return 1
-        elif self.is_outdoor_aperture:
+        else:
+            return self._uncross_ventilated_exchange_category()
+
+    def _uncross_ventilated_exchange_category(self):
+        """
+        the exchange category if neither room is cross-ventilated, which doesn't depend on the wind
+        """
+        if self.is_outdoor_aperture:
             return 2
         elif self.has_room_with_outdoor_aperture:
             return 3
@@ -284,6 +304,21 @@ class ApertureCalculation:
         """
 
         advection = self.advection_flow_rate(wind_speed, wind_direction_in_radians)
+        return self._fluxes(advection, lambda: self.exchange_flow_rate(wind_speed, wind_direction_in_radians))
+
+    def trans_matrix_contributions_from_flow(self, advection: float, cross_ventilated: bool):
+        """
+        the advection or exchange fluxes, given the advection flow from room 1 to room 2 found some other way
+        (such as by a PressureNetwork) and whether either room is cross-ventilated
+        """
+        return self._fluxes(advection, lambda: flow_exchange(
+            1 if cross_ventilated else self._uncross_ventilated_exchange_category()))
+
+    @staticmethod
+    def _fluxes(advection: float, exchange_flow_rate: Callable[[], float]):
+        """
+        the advection fluxes if there is any advection, otherwise the exchange fluxes
+        """
         if (advection > _zero_advection_tolerance):
             # Advection flow from room 1 to room 2
 
@@ -302,7 +337,7 @@ class ApertureCalculation:
 
         else:
             # No Advection flow, use exchange flow instead
-            exchange = self.exchange_flow_rate(wind_speed, wind_direction_in_radians)
+            exchange = exchange_flow_rate()
 
             return Fluxes(
                 from_1_to_2=exchange,
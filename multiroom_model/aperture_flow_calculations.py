@@ -1,9 +1,73 @@
 from typing import List, Tuple, Dict, Any
+from functools import lru_cache
 import re
 from .aperture_calculations import Fluxes
+import numpy as np
 import pandas as pd
 
 
+# indoor variables that cannot be transported
+_in_patterns = [
+    re.compile(r'.+SURF$'),  # concentrations on surfaces
+    re.compile(r'^J\d+'),    # photolysis rates
+    re.compile(r'^YIELD.+'),  # yields from materials
+    re.compile(r'^AV.+'),    # surface/volume ratios
+    re.compile(r'^vd.+'),    # deposition velocities
+    re.compile(r'^r\d+')     # reaction rates
+]
+
+# outdoor variables
+_out_pattern = re.compile(r'.*OUT$')
+
+# constants, rate coefficients, and other variables
+_reserved_names = frozenset(['ACRate', 'cosx', 'secx', 'M', 'temp', 'H2O', 'PI', 'AV', 'adults', 'children', 'O2', 'N2', 'H2', 'saero',
+                             'OH_reactivity', 'OH_production', 'KDI', 'K8I', 'FC9', 'NC13', 'NCD', 'FC12', 'KMT14', 'CNO3', 'KMT05',
+                             'F17', 'K140', 'KFPAN', 'KPPNI', 'K20', 'KMT06', 'KCH3O2', 'K7I', 'NC14', 'NCPPN', 'F3', 'K10I', 'KRD',
+                             'KR10', 'NC1', 'K3I', 'NC17', 'K12I', 'NC4', 'K14I', 'K150', 'K200', 'F20', 'KMT16', 'K160', 'F19', 'KR7',
+                             'FC2', 'F16', 'N19', 'KR3', 'KMT20', 'KHOCL', 'F13', 'KC0', 'KMT04', 'KRPPN', 'F9', 'K130', 'KMT10', 'KR19',
+                             'KMT02', 'K4I', 'KMT01', 'FC14', 'KR14', 'NC7', 'K170', 'KBPPN', 'K190', 'NC3', 'K15I', 'KR15', 'KCI', 'FCPPN',
+                             'F15', 'FC4', 'KR12', 'KMT17', 'KR13', 'K298CH3O2', 'K80', 'KMT19', 'FC15', 'K90', 'K17I', 'NC', 'K20I', 'F4',
+                             'K4', 'N20', 'KNO3AL', 'KROSEC', 'KNO3', 'CCLNO3', 'K70', 'F8', 'KRO2HO2', 'FC20', 'K14ISOM1', 'KMT09', 'FC16',
+                             'FPPN', 'KROPRIM', 'F12', 'K19I', 'NC8', 'FCD', 'KRO2NO3', 'KMT18', 'NC12', 'KMT07', 'FC3', 'KRC', 'F1', 'FCC',
+                             'KR16', 'CCLHO', 'KMT13', 'F10', 'K100', 'K40', 'KCLNO3', 'FC7', 'F7', 'FC', 'NC10', 'KR2', 'FC17', 'CN2O5', 'KR4',
+                             'FC8', 'KMT11', 'KMT15', 'KAPNO', 'K1I', 'KBPAN', 'NC9', 'FC19', 'KMT03', 'K3', 'K16I', 'KR20', 'KPPN0', 'F2',
+                             'K10', 'FC1', 'KR1', 'KMT08', 'KAPHO2', 'KMT12', 'F14', 'KR17', 'FC13', 'KR8', 'K2I', 'K2', 'FC10', 'KDEC', 'KD0',
+                             'NC16', 'K13I', 'KR9', 'KN2O5', 'K30', 'K1', 'K9I', 'KRO2NO', 'K120', 'FD', 'NC2', 'NC15'])
+
+
+@lru_cache(maxsize=16)
+def _classify_trans_vars(all_vars: Tuple[str, ...]) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """
+    Split a tuple of variable names into the indoor and the outdoor variables which can be transported
+    Cached, because the same columns are classified for every aperture at every interval of a run
+    """
+    outdoor_vars = []
+    indoor_vars = []
+    for i in all_vars:
+        if i in _reserved_names or any(j.match(i) for j in _in_patterns):
+            continue
+        if _out_pattern.match(i):
+            outdoor_vars.append(i)
+        else:
+            indoor_vars.append(i)
+    return tuple(indoor_vars), tuple(outdoor_vars)
+
+
+@lru_cache(maxsize=16)
+def _trans_var_indices(all_vars: Tuple[str, ...]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The positions, in a tuple of variable names, of the indoor and the outdoor variables which can be transported
+    """
+    indoor_vars, outdoor_vars = _classify_trans_vars(all_vars)
+    position = dict((v, i) for i, v in enumerate(all_vars))
+    indoor_index = np.array([position[v] for v in indoor_vars], dtype=np.intp)
+    outdoor_index = np.array([position[v] for v in outdoor_vars], dtype=np.intp)
+    # The arrays are shared by every caller, so they must not be changed
+    indoor_index.flags.writeable = False
+    outdoor_index.flags.writeable = False
+    return indoor_index, outdoor_index
+
+
 class ApertureFlowCalculator:
     """
         @brief A class used to deduce absolute changes to concentrations, caused by a flux through an aperture
@@ -101,6 +165,7 @@ class ApertureFlowCalculator:
         '''
         Function to obtain a list of indoor species and a list of outdoor species, excluding any other variable
         that cannot be transported across rooms (e.g. reaction rates, surface concentrations, constants, etc...)
+        The classification is cached for each set of variables, so repeated calls are cheap
 
         inputs:
             all_var_list = complete list of variables from the restart pickle file
@@ -109,51 +174,20 @@ class ApertureFlowCalculator:
             indoor_var_list = list of indoor variables that can be transported
             outdoor_var_list = list of outdoor variables that can be transported
         '''
+        indoor_vars, outdoor_vars = _classify_trans_vars(tuple(all_var_list))
+        return list(indoor_vars), list(outdoor_vars)
+
+    @staticmethod
+    def trans_var_indices(all_var_list):
+        '''
+        Function to obtain the positions of the indoor and the outdoor species which can be transported,
+        as found by get_trans_vars. The result is cached for each set of variables
 
-        # indoor variables that cannot be transported
-        in_patterns = [
-            re.compile(r'.+SURF$'),  # concentrations on surfaces
-            re.compile(r'^J\d+'),    # photolysis rates
-            re.compile(r'^YIELD.+'),  # yields from materials
-            re.compile(r'^AV.+'),    # surface/volume ratios
-            re.compile(r'^vd.+'),    # deposition velocities
-            re.compile(r'^r\d+')     # reaction rates
-        ]
-
-        # outdoor variables
-        out_pattern = re.compile(r'.*OUT$')
-
-        # constants, rate coefficients, and other variables
-        reserved_list = ['ACRate', 'cosx', 'secx', 'M', 'temp', 'H2O', 'PI', 'AV', 'adults', 'children', 'O2', 'N2', 'H2', 'saero',
-                         'OH_reactivity', 'OH_production', 'KDI', 'K8I', 'FC9', 'NC13', 'NCD', 'FC12', 'KMT14', 'CNO3', 'KMT05',
-                         'F17', 'K140', 'KFPAN', 'KPPNI', 'K20', 'KMT06', 'KCH3O2', 'K7I', 'NC14', 'NCPPN', 'F3', 'K10I', 'KRD',
-                         'KR10', 'NC1', 'K3I', 'NC17', 'K12I', 'NC4', 'K14I', 'K150', 'K200', 'F20', 'KMT16', 'K160', 'F19', 'KR7',
-                         'FC2', 'F16', 'N19', 'KR3', 'KMT20', 'KHOCL', 'F13', 'KC0', 'KMT04', 'KRPPN', 'F9', 'K130', 'KMT10', 'KR19',
-                         'KMT02', 'K4I', 'KMT01', 'FC14', 'KR14', 'NC7', 'K170', 'KBPPN', 'K190', 'NC3', 'K15I', 'KR15', 'KCI', 'FCPPN',
-                         'F15', 'FC4', 'KR12', 'KMT17', 'KR13', 'K298CH3O2', 'K80', 'KMT19', 'FC15', 'K90', 'K17I', 'NC', 'K20I', 'F4',
-                         'K4', 'N20', 'KNO3AL', 'KROSEC', 'KNO3', 'CCLNO3', 'K70', 'F8', 'KRO2HO2', 'FC20', 'K14ISOM1', 'KMT09', 'FC16',
-                         'FPPN', 'KROPRIM', 'F12', 'K19I', 'NC8', 'FCD', 'KRO2NO3', 'KMT18', 'NC12', 'KMT07', 'FC3', 'KRC', 'F1', 'FCC',
-                         'KR16', 'CCLHO', 'KMT13', 'F10', 'K100', 'K40', 'KCLNO3', 'FC7', 'F7', 'FC', 'NC10', 'KR2', 'FC17', 'CN2O5', 'KR4',
-                         'FC8', 'KMT11', 'KMT15', 'KAPNO', 'K1I', 'KBPAN', 'NC9', 'FC19', 'KMT03', 'K3', 'K16I', 'KR20', 'KPPN0', 'F2',
-                         'K10', 'FC1', 'KR1', 'KMT08', 'KAPHO2', 'KMT12', 'F14', 'KR17', 'FC13', 'KR8', 'K2I', 'K2', 'FC10', 'KDEC', 'KD0',
-                         'NC16', 'K13I', 'KR9', 'KN2O5', 'K30', 'K1', 'K9I', 'KRO2NO', 'K120', 'FD', 'NC2', 'NC15']
-
-        # create list of indoor and a list of outdoor variables that can be transported
-        outdoor_var_list = []
-        indoor_var_list = []
-        for i in all_var_list:
-            matched = False
-            for j in in_patterns:
-                if j.match(i):
-                    matched = True
-                    break
-                elif i in reserved_list:
-                    matched = True
-                    break
-            if not matched:
-                if out_pattern.match(i):
-                    outdoor_var_list.append(i)
-                else:
-                    indoor_var_list.append(i)
-
-        return indoor_var_list, outdoor_var_list
+        inputs:
+            all_var_list = complete list of variables from the restart pickle file
+
+        returns:
+            indoor_index = read only integer array of the positions of the indoor variables that can be transported
+            outdoor_index = read only integer array of the positions of the outdoor variables that can be transported
+        '''
+        return _trans_var_indices(tuple(all_var_list))
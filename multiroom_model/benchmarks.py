@@ -0,0 +1,394 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
+import datetime
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+import numpy as np
+from .aperture import Aperture, Side
+from .aperture_factory import build_apertures_from_double_definition, build_wind_definition
+from .aperture_flow_calculations import ApertureFlowCalculator, _classify_trans_vars
+from .global_settings import GlobalSettings
+from .room_factory import (
+    build_rooms,
+    populate_room_with_emissions_file,
+    populate_room_with_tvar_file,
+    populate_room_with_expos_file
+)
+from .room_inchempy_evolver import RoomInchemPyEvolver
+from .simulation import Simulation
+from .transport_paths import paths_through_building
+
+# Bump this if the layout of the records in the history files changes
+_history_format_version = 1
+
+
+@dataclass
+class BenchmarkResult:
+    """
+        @brief The times taken by repeated calls of one benchmark
+        @variable name: identifies the benchmark, and what it was run on
+        @variable seconds: the time taken by each repeat
+    """
+    name: str
+    seconds: List[float]
+
+    @property
+    def best(self) -> float:
+        return min(self.seconds)
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.seconds)
+
+
+# Each repeat of a benchmark lasts at least this long, quick functions are called many times in each repeat
+_min_repeat_seconds = 0.05
+
+
+def _time_calls(function: Callable[[], object], number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        function()
+    return time.perf_counter()-start
+
+
+def time_repeated(name: str, function: Callable[[], object], repeat: int) -> BenchmarkResult:
+    """
+    Time a number of repeats of a function, giving the time of one call in each repeat
+    A slow function is called once in each repeat, a quick one as many times as fill _min_repeat_seconds,
+    so its time isn't lost in the resolution of the clock
+    """
+    first = _time_calls(function, 1)
+    if first >= _min_repeat_seconds:
+        return BenchmarkResult(name, [first]+[_time_calls(function, 1) for _ in range(repeat-1)])
+
+    number = int(math.ceil(_min_repeat_seconds/max(first, 1e-9)))
+    return BenchmarkResult(name, [_time_calls(function, number)/number for _ in range(repeat)])
+
+
+class _SyntheticRoom:
+    """
+    A room of a synthetic building, only the connections between the rooms matter to the transport paths
+    """
+    volume_in_m3: float = 30.0
+
+
+def synthetic_building(rows: int, columns: int, seed: int = 0) -> Tuple[List[_SyntheticRoom], List[Aperture]]:
+    """
+    Rooms in a grid, each joined to its neighbours, with windows to the front and back along the first and last rows
+    and some windows to the left and right, with random areas
+    """
+    rng = random.Random(seed)
+    rooms = [_SyntheticRoom() for _ in range(rows*columns)]
+    apertures = []
+    for y in range(rows):
+        for x in range(columns):
+            room = rooms[y*columns+x]
+            if x+1 < columns:
+                apertures.append(Aperture(room, rooms[y*columns+x+1], rng.uniform(0.5, 3)))
+            if y+1 < rows:
+                apertures.append(Aperture(room, rooms[(y+1)*columns+x], rng.uniform(0.5, 3)))
+            if y == 0:
+                apertures.append(Aperture(room, Side.Front, rng.uniform(0.5, 3)))
+            if y == rows-1:
+                apertures.append(Aperture(room, Side.Back, rng.uniform(0.5, 3)))
+            if x == 0 and rng.random() < 0.5:
+                apertures.append(Aperture(room, Side.Left, rng.uniform(0.5, 3)))
+            if x == columns-1 and rng.random() < 0.5:
+                apertures.append(Aperture(room, Side.Right, rng.uniform(0.5, 3)))
+    return rooms, apertures
+
+
+# The synthetic buildings (rows, columns) whose every transport path is found,
+# and those in which only the widest paths are found
+_all_paths_buildings = [(2, 2), (2, 3), (3, 3)]
+_widest_paths_buildings = [(5, 5), (10, 10), (20, 20)]
+_widest_paths = 20
+
+
+class BuildingBenchmarks:
+    """
+        @brief The benchmarks of the hot paths of the model, on the example building of run_mbm.py
+        The building, a simulation of it (run in this process), and the results of one interval of each room
+        are only built when a benchmark first needs them, and are shared by the benchmarks after that.
+
+    """
+
+    def __init__(self,
+                 config_folder: str = "config_rooms",
+                 mechanism_file: str = "chem_mech/mcm_subset.fac",
+                 initial_conditions_file: str = "initial_concentrations.txt",
+                 t_interval: float = 6.0):
+        """
+        @param config_folder: The folder of the csv files describing the building.
+        @param mechanism_file: The chemical mechanism.
+        @param initial_conditions_file: The initial concentrations of every room.
+        @param t_interval: The interval of chemistry, and of transport, which is timed.
+        """
+        self.config_folder = config_folder
+        self.mechanism_file = mechanism_file
+        self.initial_conditions_file = initial_conditions_file
+        self.t_interval = t_interval
+
+        self._building = None
+        self._simulation: Simulation = None
+        self._interval_results = None
+
+    def global_settings(self) -> GlobalSettings:
+        """
+        The settings of run_mbm.py, without a mechanism cache so the InChemPy classes are really built
+        """
+        ambient_press = 1013.0
+        ambient_temp = 293.0
+        return GlobalSettings(
+            filename=self.mechanism_file,
+            INCHEM_additional=False,
+            particles=True,
+            constrained_file=None,
+            output_folder=None,
+            dt=1,
+            H2O2_dep=False,
+            O3_dep=False,
+            custom=False,
+            custom_filename=None,
+            diurnal=True,
+            city='London_urban',
+            date='21-06-2020',
+            lat=45.4,
+            path=None,
+            reactions_output=False,
+            building_direction_in_radians=math.radians(180),
+            air_density=(100*ambient_press) / (287.050 * ambient_temp),
+            upwind_pressure_coefficient=0.3,
+            downwind_pressure_coefficient=-0.2
+        )
+
+    def building(self):
+        """
+        The rooms, apertures and wind of the example building
+        """
+        if self._building is None:
+            rooms = build_rooms(os.path.join(self.config_folder, "mr_tcon_room_params.csv"))
+            for i, room in rooms.items():
+                populate_room_with_emissions_file(room, os.path.join(self.config_folder, f"mr_room_emis_params_{i}.csv"))
+                populate_room_with_tvar_file(room, os.path.join(self.config_folder, f"mr_tvar_room_params_{i}.csv"))
+                populate_room_with_expos_file(room, os.path.join(self.config_folder, f"mr_tvar_expos_params_{i}.csv"))
+            apertures = build_apertures_from_double_definition(
+                os.path.join(self.config_folder, "mr_tcon_building.csv"), rooms)
+            wind_definition = build_wind_definition(os.path.join(self.config_folder, "mr_tvar_wind_params.csv"))
+            self._building = (list(rooms.values()), apertures, wind_definition)
+        return self._building
+
+    def simulation(self) -> Simulation:
+        """
+        A simulation of the building which runs in this process, so the time of each part can be measured
+        """
+        if self._simulation is None:
+            rooms, apertures, wind_definition = self.building()
+            self._simulation = Simulation(self.global_settings(), rooms, apertures, wind_definition, cpu_count=1)
+        return self._simulation
+
+    def interval_results(self):
+        """
+        The results of each room after one interval from the initial conditions
+        """
+        if self._interval_results is None:
+            simulation = self.simulation()
+            with simulation._open_executor() as executor:
+                self._interval_results, _ = simulation._evolve_rooms(
+                    executor, 0.0, self.t_interval, [self.initial_conditions_file]*len(simulation.rooms), True)
+        return self._interval_results
+
+    def evolver_construction(self, repeat: int) -> List[BenchmarkResult]:
+        """
+        Generating the InChemPy class of one room, including its jacobians
+        """
+        rooms, _, _ = self.building()
+        global_settings = self.global_settings()
+        return [time_repeated("evolver_construction", lambda: RoomInchemPyEvolver(rooms[0], global_settings), repeat)]
+
+    def room_interval(self, repeat: int) -> List[BenchmarkResult]:
+        """
+        The chemistry of one interval of each room, starting from the end of the first interval
+        """
+        simulation = self.simulation()
+        results = []
+        for i, (evolver, r) in enumerate(zip(simulation._room_evolvers, self.interval_results())):
+            t0 = r.index[-1]
+            results.append(time_repeated(
+                f"room_interval[room {i+1}]",
+                lambda: evolver.run(t0=t0, seconds_to_integrate=self.t_interval, initial_dataframe=r.iloc[-1:]),
+                repeat))
+        return results
+
+    def apply_wind(self, repeat: int) -> List[BenchmarkResult]:
+        """
+        The transport between every room and the outdoors over one interval,
+        with the trans matrix assembled from the apertures (as for a new wind state) and taken from the cache
+        """
+        simulation = self.simulation()
+        room_results = self.interval_results()
+        states = np.vstack([r.iloc[-1].to_numpy(dtype=float) for r in room_results])
+        columns = room_results[0].columns
+        t = room_results[0].index[-1]
+        wind_speed, wind_direction_in_radians = simulation.wind_state(t)
+
+        def apply_wind():
+            simulation._apply_wind(t, self.t_interval, states, columns, record_diagnostics=False)
+
+        # The first call puts the trans matrix in the cache
+        apply_wind()
+        return [time_repeated("assemble_trans_matrix",
+                              lambda: simulation._assemble_trans_matrix(wind_speed, wind_direction_in_radians), repeat),
+                time_repeated("apply_wind", apply_wind, repeat)]
+
+    def transport_paths(self, repeat: int) -> List[BenchmarkResult]:
+        """
+        Finding the transport paths of synthetic buildings of growing size,
+        every path of the smaller ones, and only the widest paths of the larger ones
+        """
+        results = []
+        for rows, columns in _all_paths_buildings:
+            rooms, apertures = synthetic_building(rows, columns)
+            results.append(time_repeated(f"paths_through_building[{rows}x{columns}]",
+                                         lambda: paths_through_building(rooms, apertures), repeat))
+        for rows, columns in _widest_paths_buildings:
+            rooms, apertures = synthetic_building(rows, columns)
+            results.append(time_repeated(f"paths_through_building[{rows}x{columns}, {_widest_paths} widest]",
+                                         lambda: paths_through_building(rooms, apertures, max_paths=_widest_paths),
+                                         repeat))
+        return results
+
+    def trans_vars(self, repeat: int) -> List[BenchmarkResult]:
+        """
+        Classifying the columns of the results into the species which can be transported, without the cache
+        """
+        columns = list(self.interval_results()[0].columns)
+
+        def get_trans_vars():
+            _classify_trans_vars.cache_clear()
+            ApertureFlowCalculator.get_trans_vars(columns)
+
+        return [time_repeated("get_trans_vars", get_trans_vars, repeat)]
+
+    def end_to_end(self, repeat: int) -> List[BenchmarkResult]:
+        """
+        Building and running the whole simulation as run_mbm.py does, in parallel
+        """
+        rooms, apertures, wind_definition = self.building()
+        global_settings = self.global_settings()
+        initial_conditions = dict((r, self.initial_conditions_file) for r in rooms)
+
+        def run():
+            simulation = Simulation(global_settings, rooms, apertures, wind_definition)
+            simulation.run(initial_conditions, t0=0, t_total=20, t_interval=self.t_interval)
+
+        return [time_repeated("end_to_end", run, repeat)]
+
+    def benchmarks(self) -> Dict[str, Callable[[int], List[BenchmarkResult]]]:
+        """
+        Every group of benchmarks, by name
+        """
+        return {
+            "evolver_construction": self.evolver_construction,
+            "room_interval": self.room_interval,
+            "apply_wind": self.apply_wind,
+            "transport_paths": self.transport_paths,
+            "get_trans_vars": self.trans_vars,
+            "end_to_end": self.end_to_end,
+        }
+
+    def run(self, names: List[str] = None, repeat: int = 3) -> List[BenchmarkResult]:
+        """
+        @brief Run the groups of benchmarks with the names given, or all of them
+
+        @param names: The groups to run, from: evolver_construction, room_interval, apply_wind,
+        transport_paths, get_trans_vars and end_to_end.
+        @param repeat: How many times to time each benchmark.
+        """
+        benchmarks = self.benchmarks()
+        names = list(benchmarks.keys()) if names is None else names
+        unknown = [n for n in names if n not in benchmarks]
+        if unknown:
+            raise ValueError(f"Unknown benchmarks {unknown}, choose from {list(benchmarks.keys())}")
+        results = []
+        for n in names:
+            results.extend(benchmarks[n](repeat))
+        return results
+
+
+def _git_commit() -> str:
+    """
+    The commit the code being benchmarked is from, if it is in a git repository
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def history_record(results: List[BenchmarkResult]) -> dict:
+    """
+    A record of the results, with the machine and the code they were measured on
+    """
+    return {
+        'format_version': _history_format_version,
+        'time': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'machine': platform.node(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'results': {r.name: {'best': r.best, 'median': r.median, 'repeat': len(r.seconds)} for r in results},
+    }
+
+
+def append_history(filename: str, record: dict):
+    """
+    Add a record to the end of a history file, which holds one json record on each line
+    """
+    with open(filename, 'a') as f:
+        f.write(json.dumps(record)+"\n")
+
+
+def read_history(filename: str) -> List[dict]:
+    """
+    The records of a history file, oldest first, or none if it doesn't exist yet
+    """
+    if not os.path.exists(filename):
+        return []
+    with open(filename) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def find_regressions(record: dict, history: List[dict], tolerance: float = 0.25,
+                     window: int = 5) -> Dict[str, Tuple[float, float]]:
+    """
+    @brief The benchmarks of a record which are slower than their baseline by more than the tolerance.
+    The baseline of a benchmark is the median of its best times in the latest records of the history
+    measured on the same machine, so times from other machines are never compared.
+
+    @param record: The record to check.
+    @param history: The earlier records.
+    @param tolerance: The fraction by which a benchmark may be slower than its baseline.
+    @param window: How many of the latest records of each benchmark make up its baseline.
+    @return: The best time and the baseline of each benchmark which is slower, by name.
+    """
+    same_machine = [h for h in history
+                    if h.get('machine') == record['machine'] and h.get('cpu_count') == record['cpu_count']]
+    regressions = {}
+    for name, result in record['results'].items():
+        earlier = [h['results'][name]['best'] for h in same_machine if name in h['results']][-window:]
+        if not earlier:
+            continue
+        baseline = statistics.median(earlier)
+        if result['best'] > baseline*(1+tolerance):
+            regressions[name] = (result['best'], baseline)
+    return regressions
@@ -1,11 +1,13 @@
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+import numpy as np
 
 
 class TimeBracketedValue:
     """
         @brief A class recording a variable takes a non-zero value for bracketed intervals of time
-        Stored in the form of a list of tuples,
-        each  tuple has a start time, end time, and a value 
+        Provided in the form of a list of tuples,
+        each  tuple has a start time, end time, and a value
+        The brackets are also stored as arrays sorted by start time, so times are looked up by binary search
 
     """
 
@@ -16,27 +18,69 @@ class TimeBracketedValue:
             raise Exception("no times provided")
 
         #Check that the end time comes after the start time
-        for i in range(len(values)-1):
-            if (values[i][0] >= values[i][1]):
+        for start, end, _ in values:
+            if (start >= end):
                 raise Exception("times were not in order")
 
         self._values: List[Tuple[float, float, float]] = values
 
+        # The brackets sorted by start time (the order they were provided in for equal starts)
+        order = np.argsort([v[0] for v in values], kind='stable')
+        self._starts: np.ndarray = np.array([values[i][0] for i in order], dtype=float)
+        self._ends: np.ndarray = np.array([values[i][1] for i in order], dtype=float)
+        self._bracket_values: np.ndarray = np.array([values[i][2] for i in order], dtype=float)
+
+        # Brackets may touch but if they overlap the first one provided takes precedence, which needs a scan
+        self._disjoint = bool(np.all(self._starts[1:] >= self._ends[:-1]))
+
+        # Every time at which the value can change
+        self._boundaries: np.ndarray = np.unique(np.concatenate([self._starts, self._ends]))
+
     def value_at_time(self, t: float) -> float:
         """
         if the time is within a bracket return that value, otherwise return 0
         """
+        if not self._disjoint:
+            #Loop through the brackets
+            for t0, t1, v in self._values:
+                #if t is in the bracket return the value
+                if t0 <= t <= t1:
+                    return v
+            return 0
 
-        #Loop through the brackets
-        for i in range(len(self._values) - 1):
-            t0, t1, v = self._values[i]
-            #if t is in the bracket return the value
-            if t0 <= t <= t1:
-                return v
+        #The first bracket which ends at or after t, t is in it if it has started
+        i = int(np.searchsorted(self._ends, t, side='left'))
+        if i < len(self._ends) and self._starts[i] <= t:
+            return self._bracket_values[i]
 
         #return 0 if there isn't a bracket around t
         return 0
 
+    def values_at_times(self, times: np.ndarray) -> np.ndarray:
+        """
+        Returns the values at many times at once, as value_at_time would for each of them
+        """
+        times = np.asarray(times, dtype=float)
+        if not self._disjoint:
+            return np.array([self.value_at_time(t) for t in times.ravel()], dtype=float).reshape(times.shape)
+
+        i = np.searchsorted(self._ends, times, side='left')
+        inside = i < len(self._ends)
+        inside[inside] = self._starts[i[inside]] <= times[inside]
+        return np.where(inside, self._bracket_values[np.minimum(i, len(self._ends)-1)], 0.0)
+
+    def boundaries(self) -> np.ndarray:
+        """
+        The sorted times at which any bracket starts or ends
+        """
+        return self._boundaries.copy()
+
+    def next_boundary_after(self, t: float) -> Optional[float]:
+        """
+        The first time strictly after t at which a bracket starts or ends, or None if there isn't one
+        """
+        i = np.searchsorted(self._boundaries, t, side='right')
+        return float(self._boundaries[i]) if i < len(self._boundaries) else None
+
     def values(self):
         return self._values
-
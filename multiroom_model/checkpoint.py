@@ -0,0 +1,116 @@
+from dataclasses import dataclass, astuple, field
+from typing import Dict, List, Optional
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from .adaptive_interval import AdaptiveInterval
+
+# Bump this if the layout of the checkpoint files changes
+_checkpoint_format_version = 2
+
+
+@dataclass
+class Checkpoint:
+    """
+        @brief The state of a run of a Simulation at the end of one interval, enough to continue it exactly
+        @variable solved_time: the time the rooms have been solved to
+        @variable t_final: the time the run finishes at
+        @variable t_interval: the interval to use next
+        @variable adaptive_interval: the settings used to choose the intervals, if they were adaptive
+        @variable states: rooms x columns, the state of each room at the solved time
+        @variable columns: the columns of the states
+        @variable index_name: the name of the index of the results of the rooms
+        @variable sink_type: the name of the class of the result sink the results were given to
+        @variable sink_state: the state of the result sink, which holds (or wrote out) the results so far
+    """
+    solved_time: float
+    t_final: float
+    t_interval: float
+    adaptive_interval: Optional[AdaptiveInterval]
+    states: np.ndarray
+    columns: pd.Index
+    index_name: Optional[str] = None
+    sink_type: str = 'MemoryResultSink'
+    sink_state: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    @classmethod
+    def from_room_results(cls, solved_time: float, t_final: float, t_interval: float,
+                          adaptive_interval: Optional[AdaptiveInterval], room_results: List[pd.DataFrame],
+                          sink_type: str, sink_state: Dict[str, np.ndarray]) -> 'Checkpoint':
+        """
+        Make a checkpoint from the results of the latest interval of each room
+        """
+        states = np.vstack([r.iloc[-1].to_numpy(dtype=float) for r in room_results])
+        return cls(solved_time, t_final, t_interval, adaptive_interval, states,
+                   room_results[0].columns, room_results[0].index.name, sink_type, sink_state)
+
+    def room_states(self) -> List[pd.DataFrame]:
+        """
+        The state of each room at the solved time, as one row dataframes like the results of an interval
+        """
+        index = pd.Index([self.solved_time], name=self.index_name)
+        return [pd.DataFrame(self.states[[i]], index=index, columns=self.columns) for i in range(len(self.states))]
+
+
+def checkpoint_results_folder(filename: str) -> str:
+    """
+    The folder beside a checkpoint file in which a result sink holding its results in memory saves them,
+    a part at a time, so that each checkpoint only writes the rows added since the one before
+    """
+    return os.path.splitext(os.path.abspath(filename))[0] + "_results"
+
+
+def save_checkpoint(filename: str, checkpoint: Checkpoint):
+    """
+    Save a checkpoint as an uncompressed numpy .npz file
+    The file is written under a temporary name and then renamed,
+    so an interrupted save never replaces the previous checkpoint with a partial one
+
+    @param filename: The file to write, the folder must already exist.
+    @param checkpoint: The checkpoint to save.
+    """
+    arrays = {
+        'format_version': np.array(_checkpoint_format_version),
+        'times': np.array([checkpoint.solved_time, checkpoint.t_final, checkpoint.t_interval], dtype=float),
+        'adaptive_interval': np.array(astuple(checkpoint.adaptive_interval) if checkpoint.adaptive_interval else [],
+                                      dtype=float),
+        'states': np.asarray(checkpoint.states, dtype=float),
+        'columns': np.array(checkpoint.columns, dtype=str),
+        'index_name': np.array([] if checkpoint.index_name is None else [checkpoint.index_name], dtype=str),
+        'sink_type': np.array(checkpoint.sink_type, dtype=str),
+    }
+    for name, value in checkpoint.sink_state.items():
+        arrays[f'sink_{name}'] = value
+
+    folder = os.path.dirname(os.path.abspath(filename))
+    handle, temporary_file = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(temporary_file, filename)
+    except Exception:
+        if os.path.exists(temporary_file):
+            os.remove(temporary_file)
+        raise
+
+
+def load_checkpoint(filename: str) -> Checkpoint:
+    """
+    Load a checkpoint saved by save_checkpoint
+    """
+    with np.load(filename, allow_pickle=False) as data:
+        if int(data['format_version']) != _checkpoint_format_version:
+            raise ValueError(f"{filename} is not a checkpoint of a supported format")
+
+        solved_time, t_final, t_interval = (float(t) for t in data['times'])
+        adaptive_settings = data['adaptive_interval']
+        adaptive_interval = AdaptiveInterval(*adaptive_settings.tolist()) if len(adaptive_settings) else None
+        index_name = data['index_name']
+
+        return Checkpoint(solved_time, t_final, t_interval, adaptive_interval,
+                          data['states'],
+                          pd.Index(data['columns'].tolist()),
+                          str(index_name[0]) if len(index_name) else None,
+                          str(data['sink_type']),
+                          dict((k[len('sink_'):], data[k]) for k in data.files if k.startswith('sink_') and k != 'sink_type'))
@@ -0,0 +1,74 @@
+from typing import List, Tuple
+import numpy as np
+from scipy.linalg import expm
+
+
+def transport_rate_matrix(trans_matrix: np.ndarray, volumes: List[float]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert a trans matrix of flows into the linear system obeyed by the concentrations of every room
+
+    The trans matrix is (rooms+1)x(rooms+1), index 0 is the outdoors,
+    and element [i, j] is the flow (m3/s) from i to j.
+    For each transported species the concentrations C of the rooms then obey
+        dC/dt = A C + b C_outdoor
+
+    inputs:
+        trans_matrix = the flows between the rooms and the outdoors, as returned by Simulation.trans_matrix
+        volumes = the volume of each room (m3)
+
+    returns:
+        A = the rooms x rooms rate matrix (1/s)
+        b = the rate (1/s) at which each room receives outdoor air
+    """
+    volumes = np.asarray(volumes, dtype=float)
+    flows_between_rooms = trans_matrix[1:, 1:]
+
+    # Air arriving in room k from room j, then the air leaving room k to anywhere (including outdoors)
+    A = flows_between_rooms.T / volumes[:, None]
+    A[np.diag_indices_from(A)] = -(trans_matrix[1:, :].sum(axis=1) - np.diag(flows_between_rooms)) / volumes
+    b = trans_matrix[0, 1:] / volumes
+    return A, b
+
+
+def transport_propagators(A: np.ndarray, delta_time: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The exact solution operators of dC/dt = A C + B over a time interval, when B is constant
+
+        C(t+delta_time) = E C(t) + F B
+
+    Both are found from one matrix exponential of the augmented system [[A, I], [0, 0]].
+    A transport rate matrix has no negative off-diagonal entries, so E and F have no negative entries,
+    and non-negative concentrations stay non-negative however long the interval.
+    """
+    n = A.shape[0]
+    augmented = np.zeros((2*n, 2*n))
+    augmented[:n, :n] = A*delta_time
+    augmented[:n, n:] = np.eye(n)*delta_time
+    exponential = expm(augmented)
+    return exponential[:n, :n], exponential[:n, n:]
+
+
+def propagate_transport(trans_matrix: np.ndarray,
+                        volumes: List[float],
+                        delta_time: float,
+                        concentrations: np.ndarray,
+                        outdoor_concentrations: np.ndarray) -> np.ndarray:
+    """
+    Move species between all the rooms and the outdoors over a time interval,
+    integrating the transport exactly rather than as a single explicit step
+    Only the transport is exact, the chemistry of the rooms over the same interval is solved separately,
+    so the length of the interval is still limited by the error of splitting the two
+
+    inputs:
+        trans_matrix = the flows between the rooms and the outdoors, as returned by Simulation.trans_matrix
+        volumes = the volume of each room (m3)
+        delta_time = the interval of time being considered
+        concentrations = rooms x species concentrations at the start of the interval
+        outdoor_concentrations = rooms x species outdoor concentrations seen by each room (0 where undefined)
+
+    returns:
+        rooms x species concentrations at the end of the interval
+    """
+    A, b = transport_rate_matrix(trans_matrix, volumes)
+    E, F = transport_propagators(A, delta_time)
+    return E @ concentrations + F @ (b[:, None] * outdoor_concentrations)
@@ -0,0 +1,143 @@
+from typing import Dict, List
+import logging
+import numpy as np
+import pandas as pd
+
+
+class Diagnostics:
+    """
+        @brief Gathers the diagnostics of a run of the simulation, and reports them through a logger
+        Events are counted for each room as they happen, and reported with one message for each interval
+        they happen in (or only some of those intervals, when sampled), then summarised at the end of the run.
+        Nothing is formatted unless the logger would output it, and nothing is done for intervals without events.
+        The time each room's chemistry takes in each interval is also kept, with the time the workers sat idle
+        waiting for the slowest room, to show how well the run uses its processes.
+
+    """
+
+    def __init__(self,
+                 logger: logging.Logger = None,
+                 sample_every: int = 1,
+                 max_species_listed: int = 5):
+        """
+        @param logger: The logger to report to, by default the logger of this module ("multiroom_model.diagnostics").
+        Its level decides what is reported: warnings for the intervals with events, info for the summary of the run.
+        @param sample_every: Only report every this many intervals with events, they are all still counted.
+        @param max_species_listed: The most species to name for each room in a message.
+        """
+        if sample_every < 1:
+            raise ValueError("sample_every must be at least 1")
+        self.logger = logger if logger is not None else logging.getLogger(__name__)
+        self.sample_every = sample_every
+        self.max_species_listed = max_species_listed
+        self.open(0)
+
+    def open(self, room_count: int):
+        """
+        Start counting the events of a run with a number of rooms
+        """
+        # The number of intervals in which each room had a negative concentration,
+        # and the total number of negative concentrations over those intervals
+        self.negative_concentration_intervals = np.zeros(room_count, dtype=int)
+        self.negative_concentrations = np.zeros(room_count, dtype=int)
+        self._intervals_with_events = 0
+
+        # For each interval whose load is recorded: the time it started, how long the rooms took to solve,
+        # how long each room took, and how many workers solved them
+        self._load_times: List[float] = []
+        self._load_seconds: List[float] = []
+        self._load_room_seconds: List[np.ndarray] = []
+        self._load_workers: List[int] = []
+        self._room_count = room_count
+
+    def record_negative_concentrations(self, time: float, negative: np.ndarray, columns: pd.Index):
+        """
+        Count the negative concentrations left by the transport at the start of an interval
+
+        @param time: The time of the start of the interval.
+        @param negative: A rooms x columns array, true where the concentration is negative.
+        @param columns: The names of the columns.
+        """
+        counts = negative.sum(axis=1)
+        self.negative_concentration_intervals += counts > 0
+        self.negative_concentrations += counts
+        self._intervals_with_events += 1
+
+        if (self._intervals_with_events-1) % self.sample_every == 0 and self.logger.isEnabledFor(logging.WARNING):
+            rooms = np.flatnonzero(counts)
+            details = "; ".join(f"room {i}: {self._species_list(columns[negative[i]])}" for i in rooms)
+            self.logger.warning("Aperture effects resulted in negative concentrations at time %s in %d room(s). %s",
+                                time, len(rooms), details)
+
+    def record_incomplete_room(self, room_index: int, time_reached: float, time_expected: float):
+        """
+        Report a room whose chemistry stopped before the end of the interval
+        """
+        self.logger.error("Simulation incomplete for room %d, only ran to time %s, expected %s",
+                          room_index, time_reached, time_expected)
+
+    def record_interval_load(self, time: float, seconds: float, room_seconds: np.ndarray, workers: int):
+        """
+        Keep the time taken to solve the rooms for an interval
+
+        @param time: The time of the start of the interval.
+        @param seconds: How long (wall clock) the interval took, from giving out the first room to receiving the last.
+        @param room_seconds: How long the chemistry of each room took.
+        @param workers: How many workers the rooms were shared between.
+        """
+        self._load_times.append(time)
+        self._load_seconds.append(seconds)
+        self._load_room_seconds.append(np.asarray(room_seconds, dtype=float))
+        self._load_workers.append(workers)
+
+        if self.logger.isEnabledFor(logging.DEBUG):
+            busy = float(np.sum(room_seconds))
+            self.logger.debug("The rooms took %.3fs at time %s, the slowest was room %d (%.3fs), %d worker(s) were idle "
+                              "for %.3fs", seconds, time, int(np.argmax(room_seconds)), float(np.max(room_seconds)),
+                              workers, max(0.0, workers*seconds-busy))
+
+    def summary(self) -> Dict[str, np.ndarray]:
+        """
+        The counts of the events so far, and the load of each interval recorded
+        The idle seconds of an interval are the time the workers were available less the time they were solving rooms,
+        and the parallel efficiency of the whole run is the fraction of the time available they were solving rooms
+        """
+        seconds = np.array(self._load_seconds, dtype=float)
+        workers = np.array(self._load_workers, dtype=int)
+        room_seconds = (np.vstack(self._load_room_seconds) if self._load_room_seconds
+                        else np.zeros((0, self._room_count)))
+        busy = room_seconds.sum(axis=1)
+        available = workers*seconds
+        return {
+            'negative_concentration_intervals': self.negative_concentration_intervals.copy(),
+            'negative_concentrations': self.negative_concentrations.copy(),
+            'interval_times': np.array(self._load_times, dtype=float),
+            'interval_seconds': seconds,
+            'room_seconds': room_seconds,
+            'interval_workers': workers,
+            'idle_seconds': np.maximum(available-busy, 0.0),
+            'parallel_efficiency': np.array(min(1.0, busy.sum()/available.sum()) if available.sum() > 0 else np.nan),
+        }
+
+    def close(self) -> Dict[str, np.ndarray]:
+        """
+        Report the summary of the run, and return it
+        """
+        if self._intervals_with_events and self.logger.isEnabledFor(logging.INFO):
+            details = "; ".join(f"room {i}: {n} interval(s), {c} concentration(s)"
+                                for i, (n, c) in enumerate(zip(self.negative_concentration_intervals,
+                                                               self.negative_concentrations)) if n)
+            self.logger.info("Negative concentrations after transport in %d interval(s). %s",
+                             self._intervals_with_events, details)
+        summary = self.summary()
+        if self._load_seconds and self.logger.isEnabledFor(logging.INFO):
+            self.logger.info("Solving the rooms took %.3fs over %d interval(s), with a parallel efficiency of %.0f%% "
+                             "(%.3fs idle)", summary['interval_seconds'].sum(), len(self._load_seconds),
+                             100*summary['parallel_efficiency'], summary['idle_seconds'].sum())
+        return summary
+
+    def _species_list(self, species: pd.Index) -> str:
+        listed = ", ".join(species[:self.max_species_listed])
+        if len(species) > self.max_species_listed:
+            listed += f" and {len(species)-self.max_species_listed} more"
+        return listed
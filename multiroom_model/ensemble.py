@@ -0,0 +1,161 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from .adaptive_interval import AdaptiveInterval
+from .aperture import Aperture
+from .global_settings import GlobalSettings
+from .result_sinks import ResultSink
+from .room_chemistry import RoomChemistry
+from .simulation import Simulation
+from .executors import Executor, SerialExecutor
+from .wind_definition import WindDefinition
+from multiprocess import Pool, cpu_count
+
+
+@dataclass
+class Scenario:
+    """
+        @brief One variant of the inputs of a building, to be run as part of an Ensemble
+        @variable name: identifies the results of the scenario, unique within the ensemble
+        @variable rooms: variants of the rooms of the building, in the same order and with the same volumes,
+        but with their own occupancy, emissions, temperatures and so on. The building's rooms if not provided.
+        @variable wind_definition: the wind, the building's wind if not provided
+        @variable init_conditions: the starting state of each room, as a dictionary of text files keyed by
+        the scenario's rooms. The ensemble's initial conditions if not provided.
+        @variable result_sink: receives the results of the scenario, in the process which runs it,
+        by default they are kept in memory (a MemoryResultSink). Give each scenario its own sink (and folder).
+    """
+    name: str
+    rooms: Optional[List[RoomChemistry]] = None
+    wind_definition: Optional[WindDefinition] = None
+    init_conditions: Optional[Dict[RoomChemistry, str]] = None
+    result_sink: Optional[ResultSink] = None
+
+
+# The simulation of the building, held by each process of the pool which runs the scenarios
+_worker_simulation: Simulation = None
+
+
+def _start_scenario_worker(simulation: Simulation):
+    """
+    Keep the simulation of the building in this process, so the scenarios don't each send it again
+    """
+    global _worker_simulation
+    _worker_simulation = simulation
+
+
+def _run_scenario_in_worker(*args) -> List[Any]:
+    """
+    Run one scenario on the simulation of the building held by this process
+    """
+    return _run_scenario(_worker_simulation, *args)
+
+
+def _run_scenario(building: Simulation, rooms: Optional[List[RoomChemistry]], wind_definition: Optional[WindDefinition],
+                  init_conditions: List[str], result_sink: Optional[ResultSink],
+                  t0: float, t_total: float, t_interval: float,
+                  adaptive_interval: Optional[AdaptiveInterval]) -> List[Any]:
+    """
+    Run one scenario, in this process alone, on the simulation of the building
+    Return the results of each room, in the order of the rooms
+    """
+    simulation = building.with_inputs(rooms, wind_definition, executor=SerialExecutor())
+    results = simulation.run(dict(zip(simulation.rooms, init_conditions)), t0, t_total, t_interval,
+                             adaptive_interval=adaptive_interval, result_sink=result_sink)
+    return [results[r] for r in simulation.rooms]
+
+
+class Ensemble:
+    """
+        @brief Runs many scenarios (variants of the time dependent inputs) of one building
+        The InChemPy classes and aperture calculations are built once, for the building,
+        and each scenario is run whole by one process of a pool, so the scenarios run side by side.
+        The simulation of the building is sent to each process once, and only the scenario's inputs with each scenario.
+        Given an executor instead, the ensemble builds and runs on it, and leaves it open, so repeated runs
+        reuse its workers. The simulation of the building is then sent with each scenario.
+        A scenario's rooms only need an InChemPy class of their own if they would generate a different one,
+        such as with other emissions, and those are generated (in parallel) before the scenarios start.
+
+    """
+
+    def __init__(self,
+                 global_settings: GlobalSettings,
+                 rooms: List[RoomChemistry],
+                 apertures: List[Aperture],
+                 wind_definition: WindDefinition = None,
+                 cpu_count: int = cpu_count(),
+                 coupled_transport: bool = False,
+                 executor: Executor = None):
+        """
+        @param global_settings: Settings for the simulation which are independent of any one room or aperture.
+        @param rooms: Information about the rooms, the default inputs of the scenarios.
+        @param apertures: Information about the apertures.
+        @param wind_definition: The default wind of the scenarios.
+        @param cpu_count: Cap on the number of processes to use, to build the building and to run the scenarios.
+        @param coupled_transport: If True, the transport is integrated exactly over each interval, see Simulation.
+        @param executor: Builds the building and runs the scenarios, in place of cpu_count, each scenario is one task.
+        It is left open, so its workers are reused by every run of the ensemble. By default a pool is started
+        for each build and run.
+        """
+        self._cpu_count = cpu_count
+        self._executor = executor
+        self._rooms = list(rooms)
+        self._simulation = Simulation(global_settings, self._rooms, apertures, wind_definition,
+                                      cpu_count=cpu_count, coupled_transport=coupled_transport, executor=executor)
+
+    @property
+    def simulation(self) -> Simulation:
+        """
+        The simulation of the building, which every scenario is a variant of
+        """
+        return self._simulation
+
+    def run(self, scenarios: List[Scenario], t0: float, t_total: float, t_interval: float,
+            init_conditions: dict = None, adaptive_interval: AdaptiveInterval = None) -> Dict[str, dict]:
+        """
+        @brief run every scenario over the same time interval, as Simulation.run would.
+
+        @param scenarios: The scenarios to run.
+        @param t0: The time to start the scenarios at.
+        @param t_total: Duration to simulate.
+        @param t_interval: How often to apply the effect of windows.
+        @param init_conditions: The starting state of the building's rooms, as a dictionary of text files,
+        for the scenarios which don't provide their own. A scenario's rooms start from those of the building's rooms
+        in the same position.
+        @param adaptive_interval: If provided, the intervals are chosen adaptively, see Simulation.run.
+        @return: A dictionary, keyed by the name of each scenario, of the results of each of its rooms,
+        as returned by closing its result sink.
+        """
+        names = [s.name for s in scenarios]
+        if len(set(names)) != len(names):
+            raise ValueError("The names of the scenarios must be unique")
+
+        tasks = []
+        for scenario in scenarios:
+            # Dictionaries keyed by rooms don't survive being sent to another process, so send them in room order
+            if scenario.init_conditions is not None:
+                rooms = scenario.rooms if scenario.rooms is not None else self._rooms
+                conditions = [scenario.init_conditions[r] for r in rooms]
+            elif init_conditions is not None:
+                # Those of the building's rooms, which the scenario's rooms are variants of, in the same order
+                conditions = [init_conditions[r] for r in self._rooms]
+            else:
+                raise ValueError(f"The scenario {scenario.name} has no initial conditions")
+            tasks.append((scenario.rooms, scenario.wind_definition, conditions,
+                          scenario.result_sink, t0, t_total, t_interval, adaptive_interval))
+
+        # Generate the InChemPy classes needed by any of the scenarios (performed in parallel), before sending
+        # the simulation to the processes, so none of them generate a class, or generate the same one
+        self._simulation.build_mechanisms([r for s in scenarios if s.rooms is not None for r in s.rooms])
+
+        # Each process runs whole scenarios, one at a time
+        if self._executor is not None:
+            results = self._executor.starmap(_run_scenario, [(self._simulation,)+t for t in tasks])
+        elif self._cpu_count == 1 or len(tasks) <= 1:
+            results = [_run_scenario(self._simulation, *t) for t in tasks]
+        else:
+            with Pool(min(self._cpu_count, len(tasks)), initializer=_start_scenario_worker,
+                      initargs=(self._simulation,)) as pool:
+                results = pool.starmap(_run_scenario_in_worker, tasks, chunksize=1)
+
+        return {s.name: dict(zip(s.rooms if s.rooms is not None else self._rooms, r))
+                for s, r in zip(scenarios, results)}
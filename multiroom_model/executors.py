@@ -0,0 +1,213 @@
+from typing import Any, Callable, Iterable, Iterator, List, Sequence
+from abc import ABC, abstractmethod
+import importlib
+from multiprocess import Pool, cpu_count
+from multiprocess.pool import ThreadPool
+
+# The modules a process needs to build and run the rooms, imported when it starts instead of by its first task
+default_preload_modules = [f"{__package__}.inchem", f"{__package__}.simulation"]
+
+
+def _preload(modules: Sequence[str]):
+    """
+    Import the modules in a worker process
+    A module which can't be imported is left for the first task to fail on, with the error it would have anyway,
+    rather than failing here, where the pool would only replace the process with another which fails
+    """
+    for m in modules:
+        try:
+            importlib.import_module(m)
+        except ImportError:
+            pass
+
+
+class Executor(ABC):
+    """
+        @brief Runs the work a Simulation shares out, such as building the evolvers and solving the rooms
+        A Simulation given an executor uses it for every build and run, and never closes it,
+        so whoever creates it decides how long its workers live, across any number of runs and simulations.
+        Subclasses decide where the work runs: in processes, threads, this process alone, or elsewhere.
+        They can be used with a with statement, which closes them at the end.
+
+    """
+
+    # Whether the tasks are pickled and sent to other processes, which then keep the rooms' evolvers
+    # they are sent, so each is only sent to each process once rather than with every interval
+    sends_tasks: bool = True
+
+    @property
+    @abstractmethod
+    def workers(self) -> int:
+        """
+        How many tasks can run at once
+        """
+
+    @abstractmethod
+    def map(self, function: Callable[[Any], Any], iterable: Iterable) -> List[Any]:
+        """
+        The results of the function for each item, in order
+        """
+
+    @abstractmethod
+    def starmap(self, function: Callable[..., Any], iterable: Iterable) -> List[Any]:
+        """
+        The results of the function for each tuple of arguments, in order
+        """
+
+    @abstractmethod
+    def imap_unordered(self, function: Callable[[Any], Any], iterable: Iterable) -> Iterator[Any]:
+        """
+        The results of the function for each item, which are given out one at a time in order,
+        but may be returned in any order
+        """
+
+    def close(self):
+        """
+        Wait for any work given out to finish, then stop the workers
+        """
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class SerialExecutor(Executor):
+    """
+        @brief Runs every task one after another in this process
+        Nothing is pickled and no process is started, so it can be used where a pool cannot,
+        such as inside the worker processes of another pool.
+
+    """
+
+    sends_tasks = False
+
+    @property
+    def workers(self) -> int:
+        return 1
+
+    def map(self, function: Callable[[Any], Any], iterable: Iterable) -> List[Any]:
+        return [function(a) for a in iterable]
+
+    def starmap(self, function: Callable[..., Any], iterable: Iterable) -> List[Any]:
+        return [function(*a) for a in iterable]
+
+    def imap_unordered(self, function: Callable[[Any], Any], iterable: Iterable) -> Iterator[Any]:
+        return (function(a) for a in iterable)
+
+
+class PoolExecutor(Executor):
+    """
+        @brief Runs the tasks in a multiprocess pool, which is reused until the executor is closed
+
+    """
+
+    def __init__(self, pool, workers: int):
+        """
+        @param pool: The pool, which the executor closes.
+        @param workers: The number of workers in the pool.
+        """
+        self._pool = pool
+        self._workers = workers
+
+    @property
+    def workers(self) -> int:
+        return self._workers
+
+    def map(self, function: Callable[[Any], Any], iterable: Iterable) -> List[Any]:
+        return self._pool.map(function, iterable)
+
+    def starmap(self, function: Callable[..., Any], iterable: Iterable) -> List[Any]:
+        return self._pool.starmap(function, iterable)
+
+    def imap_unordered(self, function: Callable[[Any], Any], iterable: Iterable) -> Iterator[Any]:
+        # One task at a time, so each process takes the next task as soon as it is free
+        return self._pool.imap_unordered(function, iterable, chunksize=1)
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # After a failure don't wait for the rest of the work
+        if exc_type is not None:
+            self._pool.terminate()
+        else:
+            self.close()
+
+
+class ProcessExecutor(PoolExecutor):
+    """
+        @brief Runs the tasks in a pool of processes, which are started once and reused until it is closed
+        Each process imports the modules needed to build and run the rooms as it starts,
+        so the first run of a simulation doesn't wait for them. The rooms' evolvers (with their generated
+        InChemPy classes) are sent to a process with the first room task it takes for them, and kept there,
+        so later intervals and runs of the same simulation only send the concentrations.
+
+    """
+
+    def __init__(self, processes: int = cpu_count(), preload_modules: Sequence[str] = None):
+        """
+        @param processes: The number of processes.
+        @param preload_modules: The modules each process imports as it starts, by default those of this package
+        which build and run the rooms (which import InChemPy).
+        """
+        modules = list(default_preload_modules if preload_modules is None else preload_modules)
+        super().__init__(Pool(processes, initializer=_preload, initargs=(modules,)), processes)
+
+
+class ThreadExecutor(PoolExecutor):
+    """
+        @brief Runs the tasks in a pool of threads in this process
+        Nothing is pickled, but the tasks only run at the same time while they release the GIL,
+        as numpy does. Rooms which share one generated InChemPy class take turns to run it (see main_class_lock),
+        so only rooms with classes of their own run at the same time.
+
+    """
+
+    sends_tasks = False
+
+    def __init__(self, threads: int = cpu_count()):
+        """
+        @param threads: The number of threads.
+        """
+        super().__init__(ThreadPool(threads), threads)
+
+
+class FuturesExecutor(Executor):
+    """
+        @brief Runs the tasks on any executor with the interface of concurrent.futures, such as one for a cluster
+        For example, the executor of a dask.distributed Client, or an MPIPoolExecutor from mpi4py.futures.
+        Closing it shuts the executor down.
+
+    """
+
+    def __init__(self, executor, workers: int):
+        """
+        @param executor: Has submit(function, *args), returning futures with a result() method, and shutdown().
+        @param workers: How many tasks it can run at once.
+        """
+        self._executor = executor
+        self._workers = workers
+
+    @property
+    def workers(self) -> int:
+        return self._workers
+
+    def map(self, function: Callable[[Any], Any], iterable: Iterable) -> List[Any]:
+        futures = [self._executor.submit(function, a) for a in iterable]
+        return [f.result() for f in futures]
+
+    def starmap(self, function: Callable[..., Any], iterable: Iterable) -> List[Any]:
+        futures = [self._executor.submit(function, *a) for a in iterable]
+        return [f.result() for f in futures]
+
+    def imap_unordered(self, function: Callable[[Any], Any], iterable: Iterable) -> Iterator[Any]:
+        # Every task is submitted before waiting for any, the executor decides which run first
+        futures = [self._executor.submit(function, a) for a in iterable]
+        return (f.result() for f in futures)
+
+    def close(self):
+        self._executor.shutdown()
@@ -0,0 +1,299 @@
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from .room_chemistry import RoomChemistry
+from .result_sinks import ResultSink
+
+# WHO air quality guidelines (2021), in ug/m3, https://www.who.int/publications/i/item/9789240034228
+# The first is the long term guideline (annual, or peak season for O3), the second the short term one
+# (24-hour, or 8-hour for O3), None where there is no guideline
+who_guidelines: Dict[str, Tuple[Optional[float], Optional[float]]] = {
+    'PM25': (5, 15),
+    'PM10': (15, 45),
+    'O3': (60, 100),
+    'NO2': (10, 25),
+    'SO2': (None, 40),
+    'CO': (None, 4000),
+}
+
+# Variables which are already in ug/m3, the others are gas phase species in molecule cm-3
+unconverted_variables = ('tspx',)
+
+# Gas phase species are converted to ug/m3 assuming standard temperature and pressure,
+# according to the WHO guidelines 1 ppb = 2 ug/m3
+_gas_phase_to_ug_per_m3 = 2/2.46e10
+
+# The subsets of the times over which each metric is calculated
+_periods = ('', ' when adults are in the room', ' when children are in the room')
+
+
+def _guideline_labels(variable: str) -> Tuple[str, str]:
+    if variable == 'O3':
+        return 'Peak season', '8-hour'
+    return 'Annual', '24-hour'
+
+
+class ExposureMetrics:
+    """
+        @brief The exposure metrics of one room, which can be updated as the results of each interval are produced
+        For each variable it keeps running sums, maxima and counts of times above the WHO guidelines,
+        overall, when adults are in the room, and when children are in the room.
+        Every row of results counts as one timestep.
+
+    """
+
+    def __init__(self, variables: List[str]):
+        """
+        @param variables: The variables to calculate the metrics of.
+        """
+        self.variables = list(variables)
+        n = len(self.variables)
+
+        # Conversion of each variable to ug/m3
+        self._scale = np.array([1.0 if v in unconverted_variables else _gas_phase_to_ug_per_m3 for v in self.variables])
+
+        # The WHO guidelines of each variable (nan where there is none)
+        self._guidelines = np.array([[np.nan if g is None else g for g in who_guidelines.get(v, (None, None))]
+                                     for v in self.variables], dtype=float).reshape(n, 2)
+
+        # For each period: the number of steps, the sums and maxima of each variable,
+        # and the number of steps above each guideline
+        self.step_counts = np.zeros(len(_periods), dtype=int)
+        self.sums = np.zeros((len(_periods), n))
+        self.maxima = np.full((len(_periods), n), -np.inf)
+        self.exceedances = np.zeros((len(_periods), n, 2), dtype=int)
+        self.total_adults = 0.0
+        self.total_children = 0.0
+
+    def update(self, values: np.ndarray, n_adults: np.ndarray, n_children: np.ndarray):
+        """
+        Include more timesteps of results in the metrics
+
+        @param values: timesteps x variables, in the units of the results.
+        @param n_adults: The number of adults in the room at each timestep.
+        @param n_children: The number of children in the room at each timestep.
+        """
+        values = np.asarray(values, dtype=float)*self._scale
+        n_adults = np.asarray(n_adults, dtype=float)
+        n_children = np.asarray(n_children, dtype=float)
+        masks = (np.ones(len(values), dtype=bool), n_adults > 0, n_children > 0)
+
+        above = values[:, :, None] > self._guidelines[None, :, :]
+        for p, mask in enumerate(masks):
+            selected = values[mask]
+            self.step_counts[p] += len(selected)
+            if len(selected):
+                self.sums[p] += selected.sum(axis=0)
+                np.maximum(self.maxima[p], selected.max(axis=0), out=self.maxima[p])
+                self.exceedances[p] += above[mask].sum(axis=0)
+        self.total_adults += n_adults.sum()
+        self.total_children += n_children.sum()
+
+    def table(self) -> pd.DataFrame:
+        """
+        The metrics as a table with the columns Species, Metrics and Value, in the layout of MBM_metrics.R
+        Percentages of time are of all the timesteps of the room, means and maxima of no timesteps are nan
+        """
+        steps = self.step_counts[0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = self.sums/self.step_counts[:, None]
+            percentages = 100*self.exceedances/steps
+        maxima = np.where(self.step_counts[:, None] > 0, self.maxima, np.nan)
+
+        rows = [
+            (None, "Mean number of adults in the room", self.total_adults/steps if steps else np.nan),
+            (None, "Mean number of children in the room", self.total_children/steps if steps else np.nan),
+        ]
+        for i, v in enumerate(self.variables):
+            for p, period in enumerate(_periods):
+                rows.append((v, f"Mean concentration{period} (ug/m3)", means[p, i]))
+            for p, period in enumerate(_periods):
+                rows.append((v, f"Max concentration{period} (ug/m3)", maxima[p, i]))
+            for p, period in enumerate(_periods):
+                for g, label in enumerate(_guideline_labels(v)):
+                    guideline = self._guidelines[i, g]
+                    if not np.isnan(guideline):
+                        rows.append((v, f"Time exceeding WHO guideline of {guideline:g} ug/m3{period} ({label}) (%)",
+                                     percentages[p, i, g]))
+        return pd.DataFrame(rows, columns=['Species', 'Metrics', 'Value'])
+
+    def state(self) -> Dict[str, np.ndarray]:
+        """
+        The running totals, as arrays to save in a checkpoint
+        """
+        return {'step_counts': self.step_counts, 'sums': self.sums, 'maxima': self.maxima,
+                'exceedances': self.exceedances, 'people': np.array([self.total_adults, self.total_children])}
+
+    def restore(self, state: Dict[str, np.ndarray]):
+        """
+        Return to the running totals of a state
+        """
+        self.step_counts = np.array(state['step_counts'], dtype=int)
+        self.sums = np.array(state['sums'], dtype=float)
+        self.maxima = np.array(state['maxima'], dtype=float)
+        self.exceedances = np.array(state['exceedances'], dtype=int)
+        self.total_adults, self.total_children = (float(p) for p in state['people'])
+
+
+def default_metric_variables(columns: List[str]) -> List[str]:
+    """
+    The variables metrics are calculated for when none are specified, every column but the numbers of people
+    """
+    return [c for c in columns if c not in ('adults', 'children')]
+
+
+def _occupancy(times: np.ndarray, room: RoomChemistry = None, results: pd.DataFrame = None):
+    """
+    The numbers of adults and children at the times, from the schedules of the room if provided,
+    otherwise from the adults and children columns of the results
+    """
+    if room is not None:
+        return room.n_adults.values_at_times(times), room.n_children.values_at_times(times)
+    if results is None or 'adults' not in results.columns or 'children' not in results.columns:
+        raise ValueError("The numbers of people need a room, or results with adults and children")
+    return results['adults'].to_numpy(dtype=float), results['children'].to_numpy(dtype=float)
+
+
+def metrics_table(metrics: Dict[str, ExposureMetrics]) -> pd.DataFrame:
+    """
+    Combine the metrics of several rooms into one table, with the columns Species, Metrics and one for each room
+    """
+    result = None
+    for name, m in metrics.items():
+        table = m.table().rename(columns={'Value': name})
+        result = table if result is None else result.merge(table, on=['Species', 'Metrics'], how='outer', sort=False)
+    return result if result is not None else pd.DataFrame(columns=['Species', 'Metrics'])
+
+
+def exposure_metrics(results: Dict[str, pd.DataFrame],
+                     rooms: Dict[str, RoomChemistry] = None,
+                     variables: List[str] = None) -> pd.DataFrame:
+    """
+    Calculate the exposure metrics of results already in memory
+
+    @param results: The results of each room, by room name.
+    @param rooms: The room of each name, whose n_adults and n_children schedules give the numbers of people.
+    If not provided the adults and children columns of the results are used.
+    @param variables: The variables to calculate the metrics of, by default every column but the numbers of people.
+    @return: A table with the columns Species, Metrics and one for each room.
+    """
+    metrics = {}
+    for name, df in results.items():
+        room_variables = [v for v in (variables or default_metric_variables(df.columns)) if v in df.columns]
+        n_adults, n_children = _occupancy(df.index.to_numpy(dtype=float), (rooms or {}).get(name), df)
+        metrics[name] = ExposureMetrics(room_variables)
+        metrics[name].update(df[room_variables].to_numpy(dtype=float), n_adults, n_children)
+    return metrics_table(metrics)
+
+
+def exposure_metrics_from_reader(reader, rooms: Dict[str, RoomChemistry] = None,
+                                 variables: List[str] = None, chunk_rows: int = 100000) -> pd.DataFrame:
+    """
+    Calculate the exposure metrics of results saved by write_results, reading only the variables needed,
+    a block of rows at a time
+
+    @param reader: A ResultsReader of the results.
+    @param rooms: The room of each name, whose n_adults and n_children schedules give the numbers of people.
+    If not provided the adults and children columns of the results are used.
+    @param variables: The variables to calculate the metrics of, by default every column but the numbers of people.
+    @param chunk_rows: The number of rows to read at once.
+    @return: A table with the columns Species, Metrics and one for each room.
+    """
+    metrics = {}
+    for name in reader.room_names():
+        species = reader.species(name)
+        room_variables = [v for v in (variables or default_metric_variables(species)) if v in species]
+        room = (rooms or {}).get(name)
+        needed = room_variables if room is not None else room_variables + ['adults', 'children']
+        metrics[name] = ExposureMetrics(room_variables)
+        for start in range(0, reader.row_count(name), chunk_rows):
+            block = reader.dataframe(name, needed, slice(start, start+chunk_rows))
+            n_adults, n_children = _occupancy(block.index.to_numpy(dtype=float), room, block)
+            metrics[name].update(block[room_variables].to_numpy(dtype=float), n_adults, n_children)
+    return metrics_table(metrics)
+
+
+class ExposureMetricsSink(ResultSink):
+    """
+        @brief A result sink which updates the exposure metrics of each room as each interval completes
+        The metrics are available at any time from metrics(), the results themselves are passed on
+        to another sink if one is provided.
+
+    """
+
+    def __init__(self, rooms: List[RoomChemistry] = None, variables: List[str] = None,
+                 room_names: List[str] = None, results_sink: ResultSink = None):
+        """
+        @param rooms: The rooms of the simulation, in order, whose schedules give the numbers of people.
+        If not provided the adults and children columns of the results are used.
+        @param variables: The variables to calculate the metrics of, by default every column but the numbers of people.
+        @param room_names: The names of the rooms in the table of metrics, by default Room 1, Room 2, ...
+        @param results_sink: A sink to pass the results on to, closing this sink returns what closing it returns.
+        Without one, closing this sink returns the table of metrics of each room.
+        """
+        super().__init__()
+        self._rooms = rooms
+        self._variables = variables
+        self._room_names = room_names
+        self._results_sink = results_sink
+        self._metrics: List[ExposureMetrics] = []
+        self._indexers: List[np.ndarray] = []
+
+    def metrics(self) -> pd.DataFrame:
+        """
+        The metrics of the results received so far, as a table with the columns Species, Metrics and one for each room
+        """
+        names = self._room_names or [f"Room {i+1}" for i in range(len(self._metrics))]
+        return metrics_table(dict((names[i], m) for i, m in enumerate(self._metrics) if m is not None))
+
+    def _start(self, room_count: int):
+        self._metrics = [None]*room_count
+        self._indexers = [None]*room_count
+        if self._results_sink is not None:
+            self._results_sink.open(room_count)
+
+    def _append(self, room_index: int, results: pd.DataFrame):
+        if self._metrics[room_index] is None:
+            variables = [v for v in (self._variables or default_metric_variables(results.columns))
+                         if v in results.columns]
+            self._metrics[room_index] = ExposureMetrics(variables)
+        if self._indexers[room_index] is None:
+            self._indexers[room_index] = results.columns.get_indexer(self._metrics[room_index].variables)
+
+        room = self._rooms[room_index] if self._rooms is not None else None
+        n_adults, n_children = _occupancy(results.index.to_numpy(dtype=float), room, results)
+        values = results.to_numpy(dtype=float)[:, self._indexers[room_index]]
+        self._metrics[room_index].update(values, n_adults, n_children)
+
+        if self._results_sink is not None:
+            self._results_sink.append(room_index, results)
+
+    def _state(self, folder: str = None) -> Dict[str, np.ndarray]:
+        state = {}
+        for i, m in enumerate(self._metrics):
+            if m is not None:
+                state[f'room_{i}_variables'] = np.array(m.variables, dtype=str)
+                for k, v in m.state().items():
+                    state[f'room_{i}_{k}'] = v
+        if self._results_sink is not None:
+            for k, v in self._results_sink.checkpoint_state(folder).items():
+                state[f'results_{k}'] = v
+        return state
+
+    def _restore(self, room_count: int, state: Dict[str, np.ndarray]):
+        self._metrics = [None]*room_count
+        self._indexers = [None]*room_count
+        for i in range(room_count):
+            if f'room_{i}_variables' in state:
+                m = ExposureMetrics(state[f'room_{i}_variables'].tolist())
+                m.restore(dict((k, state[f'room_{i}_{k}'])
+                               for k in ('step_counts', 'sums', 'maxima', 'exceedances', 'people')))
+                self._metrics[i] = m
+        if self._results_sink is not None:
+            self._results_sink.restore(room_count, dict((k[len('results_'):], v) for k, v in state.items()
+                                                        if k.startswith('results_')))
+
+    def _finish(self) -> list:
+        if self._results_sink is not None:
+            return self._results_sink.close()
+        return [m.table() if m is not None else None for m in self._metrics]
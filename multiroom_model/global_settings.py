@@ -23,7 +23,11 @@ class GlobalSettings:
         building_direction_in_radians: float = 0.0,
         air_density: float = 0.0,
         upwind_pressure_coefficient: float = 0.3,
-        downwind_pressure_coefficient: float = -0.2
+        downwind_pressure_coefficient: float = -0.2,
+        mechanism_cache_folder: str = None,
+        max_route_length: int = None,
+        max_transport_paths: int = None,
+        airflow_model: str = 'transport_paths'
     ):
         """
         @param filename: Input FACSIMILE format filename.
@@ -44,6 +48,15 @@ class GlobalSettings:
         @param air_density: Density of the air for advection flow calculations.
         @param upwind_pressure_coefficient: for advection flow calculations.
         @param downwind_pressure_coefficient: for advection flow calculations.
+        @param mechanism_cache_folder: Folder in which to save the InChemPy classes built for each room,
+        so later runs with the same mechanism files and settings can load them instead of rebuilding them.
+        @param max_route_length: If provided, transport paths through more apertures than this are ignored.
+        @param max_transport_paths: If provided, only this many transport paths are used, those with the largest
+        effective area. Finding every path is only practical for smaller buildings.
+        @param airflow_model: How the advection flow through each aperture is found, either 'transport_paths',
+        adding up contributions from the paths through the building, or 'pressure_network',
+        solving for the pressure of every room so that the flows conserve mass (see PressureNetwork).
+        The pressure network needs the air density.
     """
         self.filename = filename
         self.INCHEM_additional = INCHEM_additional
@@ -65,3 +78,7 @@ class GlobalSettings:
         self.air_density = air_density
         self.upwind_pressure_coefficient = upwind_pressure_coefficient
         self.downwind_pressure_coefficient = downwind_pressure_coefficient
+        self.mechanism_cache_folder = mechanism_cache_folder
+        self.max_route_length = max_route_length
+        self.max_transport_paths = max_transport_paths
+        self.airflow_model = airflow_model
@@ -0,0 +1,120 @@
+from typing import Any, Dict, Optional
+from functools import lru_cache
+import hashlib
+import os
+import tempfile
+import dill
+import inchempy.modules.inchem_main_class
+from .inchem import generate_main_class, InChemPyMainClass
+
+# Bump this if the layout of the cache files changes
+_cache_format_version = 2
+
+
+def _hash_file(hasher, filename: Optional[str]):
+    """
+    Add the content of a file (if there is one) to a hash
+    """
+    if filename is None or not os.path.isfile(filename):
+        hasher.update(repr(filename).encode())
+        return
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            hasher.update(block)
+
+
+@lru_cache(maxsize=64)
+def _file_digest(filename: str, modified_time_ns: int, size: int) -> str:
+    """
+    A hash of the content of a file, read once for each version of the file (its modified time and size)
+    """
+    hasher = hashlib.sha256()
+    _hash_file(hasher, filename)
+    return hasher.hexdigest()
+
+
+def _hash_file_digest(hasher, filename: Optional[str]):
+    """
+    Add the hash of the content of a file (if there is one) to a hash,
+    without reading the file again while it is unchanged
+    """
+    if filename is None or not os.path.isfile(filename):
+        hasher.update(repr(filename).encode())
+        return
+    status = os.stat(filename)
+    hasher.update(_file_digest(os.path.abspath(filename), status.st_mtime_ns, status.st_size).encode())
+
+
+@lru_cache(maxsize=1)
+def _inchempy_fingerprint() -> str:
+    """
+    A hash of the INCHEM-Py sources, so that the cache is not reused by a different version of INCHEM-Py
+    """
+    hasher = hashlib.sha256()
+    folder = os.path.dirname(inchempy.modules.inchem_main_class.__file__)
+    for name in sorted(os.listdir(folder)):
+        if name.endswith(".py"):
+            hasher.update(name.encode())
+            _hash_file(hasher, os.path.join(folder, name))
+    return hasher.hexdigest()
+
+
+def mechanism_cache_key(arguments: Dict[str, Any]) -> str:
+    """
+    The key of a built InChemPyMainClass in the cache
+    It depends on the content of the mechanism (and custom and constraint) files, not just their names,
+    along with every other argument given to generate_main_class, and the version of INCHEM-Py
+
+    @param arguments: The keyword arguments which would be given to generate_main_class.
+    """
+    hasher = hashlib.sha256()
+    hasher.update(f"version {_cache_format_version}\n".encode())
+    hasher.update(_inchempy_fingerprint().encode())
+
+    # The files are identified by their content, each file is only read again when it changes
+    _hash_file_digest(hasher, arguments.get('filename'))
+    if arguments.get('custom'):
+        _hash_file_digest(hasher, arguments.get('custom_filename'))
+    _hash_file_digest(hasher, arguments.get('constrained_file'))
+
+    # Everything else by its value
+    for name in sorted(arguments.keys()):
+        hasher.update(f"{name}={arguments[name]!r}\n".encode())
+
+    return hasher.hexdigest()
+
+
+def cached_main_class(cache_folder: str, **arguments) -> InChemPyMainClass:
+    """
+    Generate an InChemPyMainClass, reusing one saved in the cache folder by an earlier run if possible
+    A newly generated class is saved in the cache folder for later runs
+
+    @param cache_folder: The folder the built classes are saved in, it is created if needed.
+    @param arguments: The keyword arguments to give to generate_main_class.
+    """
+    key = mechanism_cache_key(arguments)
+    cache_file = os.path.join(cache_folder, f"{key}.pkl")
+
+    if os.path.isfile(cache_file):
+        try:
+            with open(cache_file, 'rb') as f:
+                return dill.load(f)
+        except Exception:
+            # An unreadable cache file is rebuilt and replaced below
+            pass
+
+    main_class = generate_main_class(**arguments)
+
+    # Write to a temporary file and then rename, so that parallel builds never see a partial file
+    os.makedirs(cache_folder, exist_ok=True)
+    handle, temporary_file = tempfile.mkstemp(dir=cache_folder, suffix=".tmp")
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            dill.dump(main_class, f)
+        os.replace(temporary_file, cache_file)
+    except Exception:
+        if os.path.exists(temporary_file):
+            os.remove(temporary_file)
+        raise
+
+    return main_class
@@ -0,0 +1,253 @@
+from typing import List, Tuple, TypeVar
+import math
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.linalg import spsolve
+from .aperture import Aperture, Side
+from .aperture_calculations import _zero_advection_tolerance
+
+Room = TypeVar('Room')
+
+# The outside sides of the building, in the order their pressures are stored
+_sides = [Side.Front, Side.Left, Side.Back, Side.Right]
+
+# The angle (relative to the building direction) of the wind which blows straight onto each side
+# consistent with transport_path_angle_in_radians, where a wind of the building direction blows from back to front
+_side_wind_offsets = np.array([math.pi, math.pi/2.0, 0.0, -math.pi/2.0])
+
+# Pressure differences much smaller than this fraction of the largest wind pressure give a flow proportional
+# to the pressure difference, rather than to its square root, so the flow has a finite derivative at 0
+_relative_smoothing_pressure: float = 1.0e-9
+
+# Newton's method is used once no room has an imbalance of flow larger than this fraction of the largest flow
+_newton_imbalance: float = 1.0e-2
+
+
+class PressureNetwork:
+    """
+        @brief A class which finds the flow of air through every aperture by solving for the pressure of each room
+        The wind gives a pressure on each outside side of the building, from the pressure coefficients.
+        The flow through each aperture is Cd*area*sqrt(2*|dP|/air_density), from higher to lower pressure,
+        and the pressure of each room is found (by Newton's method) so that as much air leaves each room as enters it.
+        The apertures are held as arrays, so the work for each wind state grows with the number of apertures.
+
+    """
+
+    def __init__(self,
+                 rooms: List[Room],
+                 apertures: List[Aperture],
+                 building_direction_in_radians: float = 0,
+                 air_density: float = 0,
+                 building_pressure_coefficients: Tuple[float, float] = (0.3, -0.2),
+                 discharge_coefficient: float = 0.6,
+                 tolerance: float = 1.0e-10,
+                 max_iterations: int = 50):
+        """
+        @param rooms: The rooms, whose pressures are found in this order.
+        @param apertures: The apertures, whose flows are found in this order.
+        @param building_direction_in_radians: Orientation of the building to determine the pressure on each side.
+        @param air_density: Density of the air (kg/m3).
+        @param building_pressure_coefficients: The pressure coefficients of the upwind and downwind sides,
+        the sides at an angle to the wind are in between.
+        @param discharge_coefficient: The discharge coefficient of every aperture.
+        @param tolerance: The largest imbalance of flow into any room, relative to the largest flow, which is accepted.
+        @param max_iterations: The most Newton iterations before giving up.
+        """
+        if air_density <= 0:
+            raise ValueError("The pressure network needs a positive air density")
+        if (building_pressure_coefficients[0] < building_pressure_coefficients[1]):
+            raise Exception("The higher building pressure coefficient should come first")
+
+        self.rooms = list(rooms)
+        self.apertures = list(apertures)
+        self.building_direction_in_radians = building_direction_in_radians
+        self.air_density = air_density
+        self.building_pressure_coefficients = building_pressure_coefficients
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+
+        room_index = {id(r): i for i, r in enumerate(self.rooms)}
+        side_index = {s: i for i, s in enumerate(_sides)}
+
+        # For each aperture, the room it starts from, and either the room (or -1) or the side (or -1) it leads to
+        self._origins = np.array([room_index[id(a.origin)] for a in self.apertures], dtype=int)
+        self._destination_rooms = np.array([-1 if type(a.destination) is Side else room_index[id(a.destination)]
+                                            for a in self.apertures], dtype=int)
+        if any(type(a.destination) is Side and a.destination not in side_index for a in self.apertures):
+            raise ValueError("An aperture to the outside must be on the front, back, left or right")
+        self._destination_sides = np.array([side_index[a.destination] if type(a.destination) is Side else -1
+                                            for a in self.apertures], dtype=int)
+        self._to_outside = self._destination_rooms < 0
+
+        # flow = coefficient * sign(dP) * sqrt(|dP|)
+        areas = np.array([a.area for a in self.apertures], dtype=float)
+        self._flow_coefficients = discharge_coefficient * areas * math.sqrt(2.0/air_density)
+
+        # Only the pressures of rooms which air can reach from the outside are found, the others stay at 0
+        self._solved_rooms = self._rooms_open_to_outside()
+        self._unknown_index = np.full(len(self.rooms), -1, dtype=int)
+        self._unknown_index[self._solved_rooms] = np.arange(len(self._solved_rooms))
+
+    def _rooms_open_to_outside(self) -> np.ndarray:
+        """
+        The indices of the rooms connected to the outside through apertures with some area
+        """
+        neighbours = [[] for _ in self.rooms]
+        reached = np.zeros(len(self.rooms), dtype=bool)
+        for o, d, c in zip(self._origins, self._destination_rooms, self._flow_coefficients):
+            if c <= 0:
+                continue
+            if d < 0:
+                reached[o] = True
+            else:
+                neighbours[o].append(d)
+                neighbours[d].append(o)
+
+        to_visit = list(np.flatnonzero(reached))
+        while to_visit:
+            for n in neighbours[to_visit.pop()]:
+                if not reached[n]:
+                    reached[n] = True
+                    to_visit.append(n)
+        return np.flatnonzero(reached)
+
+    def side_pressure_coefficients(self, wind_direction_in_radians: float) -> np.ndarray:
+        """
+        The pressure coefficient of the front, left, back and right sides for a wind direction
+        The upwind coefficient for a side facing into the wind, the downwind one for a side facing away,
+        and in between (following the cosine of the angle) otherwise
+        """
+        upwind, downwind = self.building_pressure_coefficients
+        angles = wind_direction_in_radians - (self.building_direction_in_radians + _side_wind_offsets)
+        return 0.5*(upwind+downwind) + 0.5*(upwind-downwind)*np.cos(angles)
+
+    def _pressure_differences(self, room_pressures: np.ndarray, side_pressures: np.ndarray) -> np.ndarray:
+        """
+        The pressure at the origin of each aperture less the pressure at its destination
+        """
+        destination_pressures = np.where(self._to_outside,
+                                         side_pressures[self._destination_sides],
+                                         room_pressures[self._destination_rooms])
+        return room_pressures[self._origins] - destination_pressures
+
+    def _flows(self, differences: np.ndarray, smoothing: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        The flow through each aperture from its origin to its destination, given the pressure differences
+        The flow goes as dP/sqrt(|dP|+smoothing), so as sqrt(|dP|) except for pressure differences
+        comparable to the smoothing, where the square root would have an infinite derivative
+        Return the flows, their derivatives with respect to the pressure differences,
+        and the ratio of each flow to its pressure difference
+        """
+        magnitude = np.abs(differences) + smoothing
+        conductances = self._flow_coefficients / np.sqrt(magnitude)
+        derivatives = conductances * (0.5*np.abs(differences) + smoothing) / magnitude
+        return conductances * differences, derivatives, conductances
+
+    def _imbalance(self, flows: np.ndarray) -> np.ndarray:
+        """
+        The net flow into each room
+        """
+        into = np.bincount(self._destination_rooms[~self._to_outside], weights=flows[~self._to_outside],
+                           minlength=len(self.rooms))
+        out_of = np.bincount(self._origins, weights=flows, minlength=len(self.rooms))
+        return into - out_of
+
+    def _jacobian(self, derivatives: np.ndarray):
+        """
+        The sparse derivative of the net flow into each solved room, with respect to the solved room pressures
+        """
+        origins = self._unknown_index[self._origins]
+        destinations = np.where(self._to_outside, -1, self._unknown_index[np.maximum(self._destination_rooms, 0)])
+
+        # Raising the origin pressure sends more out of the origin and into the destination, and the reverse
+        rows = np.concatenate([origins, origins, destinations, destinations])
+        columns = np.concatenate([origins, destinations, origins, destinations])
+        values = np.concatenate([-derivatives, derivatives, derivatives, -derivatives])
+        used = (rows >= 0) & (columns >= 0)
+        n = len(self._solved_rooms)
+        return coo_matrix((values[used], (rows[used], columns[used])), shape=(n, n)).tocsc()
+
+    def side_pressures(self, wind_speed: float, wind_direction_in_radians: float) -> np.ndarray:
+        """
+        @brief The pressure (Pa, relative to the still air outside) the wind gives on the front, left, back and right sides
+        """
+        return 0.5 * self.air_density * wind_speed**2 * self.side_pressure_coefficients(wind_direction_in_radians)
+
+    def _solve(self, side_pressures: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The pressure of each room, and the flow through each aperture, given the pressures on the sides
+        """
+        pressures = np.zeros(len(self.rooms))
+        scale = np.max(np.abs(side_pressures))
+        if len(self._solved_rooms) == 0 or scale == 0:
+            return pressures, np.zeros(len(self.apertures))
+        smoothing = _relative_smoothing_pressure*scale
+
+        # The flow each aperture would have from the side pressures alone, with the rooms at 0
+        no_room_pressures = np.where(self._to_outside, -side_pressures[self._destination_sides], 0.0)
+
+        # To start, the flows are taken to be proportional to the pressure differences,
+        # matching the square root at the largest pressure on the building
+        conductances = self._flow_coefficients / np.sqrt(scale)
+        newton = False
+        for _ in range(self.max_iterations):
+            if newton:
+                # Newton's method, halving the step until the imbalance is reduced
+                step = spsolve(self._jacobian(derivatives), -imbalance)
+                for size in (1.0, 0.5, 0.25, 0.125):
+                    trial = pressures.copy()
+                    trial[self._solved_rooms] += size*step
+                    trial_flows, trial_derivatives, trial_conductances = self._flows(
+                        self._pressure_differences(trial, side_pressures), smoothing)
+                    trial_imbalance = self._imbalance(trial_flows)[self._solved_rooms]
+                    if np.linalg.norm(trial_imbalance) < np.linalg.norm(imbalance):
+                        break
+                else:
+                    # Newton's method isn't helping, so go back to the slower way for a step
+                    newton = False
+
+            if newton:
+                pressures, flows, derivatives, conductances = trial, trial_flows, trial_derivatives, trial_conductances
+            else:
+                # Solve with each flow proportional to its pressure difference, in the proportion
+                # given by the last pressure differences, which is robust but slow to converge
+                pressures[self._solved_rooms] = spsolve(self._jacobian(conductances),
+                                                        -self._imbalance(conductances*no_room_pressures)[self._solved_rooms])
+                flows, derivatives, conductances = self._flows(self._pressure_differences(pressures, side_pressures),
+                                                               smoothing)
+
+            imbalance = self._imbalance(flows)[self._solved_rooms]
+            largest_imbalance = np.max(np.abs(imbalance))
+            largest_flow = np.max(np.abs(flows))
+            if largest_imbalance <= self.tolerance*largest_flow:
+                return pressures, flows
+
+            # Newton's method converges quickly once close to the solution,
+            # but before then it overshoots badly where the flow through an aperture changes direction
+            newton = largest_imbalance < _newton_imbalance*largest_flow
+
+        raise Exception("The pressures of the rooms did not converge")
+
+    def room_pressures(self, wind_speed: float, wind_direction_in_radians: float) -> np.ndarray:
+        """
+        @brief The pressure of each room (Pa, relative to the still air outside) for given wind conditions
+        """
+        pressures, _ = self._solve(self.side_pressures(wind_speed, wind_direction_in_radians))
+        return pressures
+
+    def aperture_flows(self, wind_speed: float, wind_direction_in_radians: float) -> np.ndarray:
+        """
+        @brief The flow (m3/s) through each aperture from its origin to its destination, for given wind conditions
+        negative if the air flows from the destination to the origin
+        """
+        _, flows = self._solve(self.side_pressures(wind_speed, wind_direction_in_radians))
+        return flows
+
+    def ventilated_rooms(self, flows: np.ndarray, tolerance: float = _zero_advection_tolerance) -> np.ndarray:
+        """
+        @brief Whether air flows through each room, given the flows through the apertures
+        """
+        through = np.bincount(self._origins, weights=np.abs(flows), minlength=len(self.rooms))
+        through += np.bincount(self._destination_rooms[~self._to_outside], weights=np.abs(flows[~self._to_outside]),
+                               minlength=len(self.rooms))
+        return through > tolerance
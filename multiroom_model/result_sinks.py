@@ -0,0 +1,421 @@
+from typing import Dict, List
+from abc import ABC, abstractmethod
+import json
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from .results_store import RoomResultsStore
+
+# Bump this if the layout of the chunked results folders changes
+_chunked_format_version = 1
+
+
+class ResultSink(ABC):
+    """
+        @brief Receives the results of every room, interval by interval, as a Simulation produces them
+        Subclasses decide what happens to the results, for example keeping them in memory or writing them to disk.
+        Optionally only some of the columns are kept, and the rows are decimated
+        so that at most one is kept in each step of min_time_step seconds.
+
+    """
+
+    def __init__(self, columns: List[str] = None, min_time_step: float = None):
+        """
+        @param columns: The columns to keep, all of them are kept if not provided.
+        @param min_time_step: If provided, only the first row in each step of this many seconds is kept.
+        """
+        if min_time_step is not None and min_time_step <= 0:
+            raise ValueError("The min_time_step must be positive")
+        self._selected_columns: List[str] = None if columns is None else list(columns)
+        self._min_time_step = min_time_step
+        self._source_columns: pd.Index = None
+        self._column_indexer: np.ndarray = None
+        self._last_step: np.ndarray = None
+
+    def open(self, room_count: int):
+        """
+        Prepare to receive the results of a new run with room_count rooms
+        """
+        self._last_step = np.full(room_count, np.nan)
+        self._start(room_count)
+
+    def append(self, room_index: int, results: pd.DataFrame):
+        """
+        Receive the results of one interval of one room
+        """
+        if self._selected_columns is not None:
+            if self._source_columns is None or not results.columns.equals(self._source_columns):
+                indexer = results.columns.get_indexer(self._selected_columns)
+                if (indexer < 0).any():
+                    missing = [c for c, i in zip(self._selected_columns, indexer) if i < 0]
+                    raise ValueError(f"The results have no columns {missing}")
+                self._source_columns = results.columns
+                self._column_indexer = indexer
+            results = results.iloc[:, self._column_indexer]
+
+        if self._min_time_step is not None:
+            # Keep the first row in each step, including steps started in an earlier interval
+            steps = np.floor(results.index.to_numpy(dtype=float)/self._min_time_step + 1e-9)
+            previous = np.concatenate(([self._last_step[room_index]], steps[:-1]))
+            keep = steps != previous
+            if len(steps):
+                self._last_step[room_index] = steps[-1]
+            if not keep.all():
+                results = results.iloc[keep]
+
+        if len(results.index):
+            self._append(room_index, results)
+
+    def checkpoint_state(self, folder: str = None) -> Dict[str, np.ndarray]:
+        """
+        Everything needed to restore the sink to where it is now, as arrays to save in a checkpoint
+        Anything the sink has buffered is written out first
+        @param folder: If provided, a sink holding its results in memory saves the rows added since
+        its last checkpoint state to this folder, instead of putting all of its results in the state.
+        """
+        state = self._state(folder)
+        state['last_step'] = self._last_step.copy()
+        return state
+
+    def restore(self, room_count: int, state: Dict[str, np.ndarray]):
+        """
+        Return the sink to the point at which a checkpoint state was taken, to continue a run from there
+        """
+        self._last_step = np.array(state['last_step'], dtype=float)
+        self._restore(room_count, state)
+
+    def close(self) -> list:
+        """
+        Finish the run, returning the results of each room in a form which depends on the sink
+        """
+        return self._finish()
+
+    @abstractmethod
+    def _start(self, room_count: int):
+        """
+        Prepare to receive the results of a new run
+        """
+
+    @abstractmethod
+    def _append(self, room_index: int, results: pd.DataFrame):
+        """
+        Receive the selected columns and rows of the results of one interval of one room
+        """
+
+    @abstractmethod
+    def _state(self, folder: str = None) -> Dict[str, np.ndarray]:
+        """
+        The state of the subclass to save in a checkpoint, see checkpoint_state
+        """
+
+    @abstractmethod
+    def _restore(self, room_count: int, state: Dict[str, np.ndarray]):
+        """
+        Return the subclass to the point at which its state was taken
+        """
+
+    @abstractmethod
+    def _finish(self) -> list:
+        """
+        The results of each room, at the end of the run
+        """
+
+
+class MemoryResultSink(ResultSink):
+    """
+        @brief A result sink keeping the results of each room in memory, in a RoomResultsStore
+        Closing it returns a dataframe of the results of each room
+        Checkpoints given a folder save the results there one part at a time, each part holding
+        the rows added since the previous checkpoint, so a long run doesn't rewrite its whole history each time.
+
+    """
+
+    def __init__(self, columns: List[str] = None, min_time_step: float = None, initial_capacity: int = 1024):
+        """
+        @param columns: The columns to keep, all of them are kept if not provided.
+        @param min_time_step: If provided, only the first row in each step of this many seconds is kept.
+        @param initial_capacity: The number of timesteps each store allocates room for before the first growth.
+        """
+        super().__init__(columns, min_time_step)
+        self._initial_capacity = initial_capacity
+        self._stores: List[RoomResultsStore] = []
+        self._parts_folder: str = None
+        self._saved_rows: List[int] = []
+        self._saved_parts: List[int] = []
+
+    @property
+    def stores(self) -> List[RoomResultsStore]:
+        return self._stores
+
+    def _start(self, room_count: int):
+        self._stores = [RoomResultsStore(self._initial_capacity) for _ in range(room_count)]
+        self._parts_folder = None
+        self._saved_rows = [0]*room_count
+        self._saved_parts = [0]*room_count
+
+    def _append(self, room_index: int, results: pd.DataFrame):
+        self._stores[room_index].append(results)
+
+    @staticmethod
+    def _part_files(folder: str, room_index: int, part: int):
+        return (os.path.join(folder, f"room_{room_index}_times_{part:06d}.npy"),
+                os.path.join(folder, f"room_{room_index}_values_{part:06d}.npy"))
+
+    def _remove_parts(self, folder: str, saved_parts: List[int]):
+        """
+        Remove the parts in a folder beyond the number saved for each room, left by a run after its last checkpoint
+        """
+        for name in os.listdir(folder):
+            if name.startswith("room_") and name.endswith(".npy"):
+                room_index, _, part = name[len("room_"):-len(".npy")].split("_")
+                if int(room_index) >= len(saved_parts) or int(part) >= saved_parts[int(room_index)]:
+                    os.remove(os.path.join(folder, name))
+
+    def _save_parts(self, folder: str):
+        """
+        Save the rows of each room added since the last checkpoint as the room's next part
+        """
+        if folder != self._parts_folder:
+            # The first checkpoint in this folder, the results so far are saved from the start
+            os.makedirs(folder, exist_ok=True)
+            self._saved_rows = [0]*len(self._stores)
+            self._saved_parts = [0]*len(self._stores)
+            self._remove_parts(folder, self._saved_parts)
+            self._parts_folder = folder
+
+        for i, store in enumerate(self._stores):
+            if len(store) > self._saved_rows[i]:
+                times_file, values_file = self._part_files(folder, i, self._saved_parts[i])
+                np.save(times_file, store.times()[self._saved_rows[i]:])
+                np.save(values_file, store.values()[self._saved_rows[i]:])
+                self._saved_rows[i] = len(store)
+                self._saved_parts[i] += 1
+
+    def _state(self, folder: str = None) -> Dict[str, np.ndarray]:
+        state = {}
+        if folder is not None:
+            self._save_parts(folder)
+            state['parts_folder'] = np.array(folder, dtype=str)
+        for i, store in enumerate(self._stores):
+            has_results = store.columns is not None
+            state[f'room_{i}_columns'] = np.array(store.columns if has_results else [], dtype=str)
+            state[f'room_{i}_dtypes'] = np.array([d.str for d in store.dtypes] if has_results else [], dtype=str)
+            state[f'room_{i}_index_name'] = np.array([] if store.index_name is None else [store.index_name], dtype=str)
+            if folder is not None:
+                state[f'room_{i}_parts'] = np.array(self._saved_parts[i])
+            else:
+                state[f'room_{i}_times'] = store.times()
+                state[f'room_{i}_values'] = store.values()
+        return state
+
+    def _restore(self, room_count: int, state: Dict[str, np.ndarray]):
+        folder = str(state['parts_folder']) if 'parts_folder' in state else None
+        if folder is not None:
+            saved_parts = [int(state[f'room_{i}_parts']) for i in range(room_count)]
+            self._remove_parts(folder, saved_parts)
+
+        self._stores = []
+        for i in range(room_count):
+            columns = state[f'room_{i}_columns']
+            if len(columns) == 0:
+                self._stores.append(RoomResultsStore(self._initial_capacity))
+                continue
+            if folder is not None:
+                files = [self._part_files(folder, i, part) for part in range(saved_parts[i])]
+                times = np.concatenate([np.load(t) for t, _ in files])
+                values = np.concatenate([np.load(v) for _, v in files])
+            else:
+                times = state[f'room_{i}_times']
+                values = state[f'room_{i}_values']
+            index_name = state[f'room_{i}_index_name']
+            self._stores.append(RoomResultsStore.from_arrays(times,
+                                                             values,
+                                                             pd.Index(columns.tolist()),
+                                                             [np.dtype(d) for d in state[f'room_{i}_dtypes']],
+                                                             str(index_name[0]) if len(index_name) else None))
+
+        # Later checkpoints in the same folder carry on from the parts saved
+        self._parts_folder = folder
+        self._saved_rows = [len(s) for s in self._stores]
+        self._saved_parts = saved_parts if folder is not None else [0]*room_count
+
+    def _finish(self) -> List[pd.DataFrame]:
+        return [s.to_dataframe() for s in self._stores]
+
+
+class ChunkedResultSink(ResultSink):
+    """
+        @brief A result sink streaming the results of each room to disk, so memory use does not grow with the run
+        Each room has its own folder of chunks, and the rows of a room are buffered until there are chunk_rows of them,
+        then written as one .npy file of species x rows (so each species is contiguous) and one .npy file of times.
+        An index.json in the folder records the rooms, columns and chunks, it is rewritten after each chunk.
+        Closing it returns the folder of each room, read_chunked_results loads them back into dataframes.
+
+    """
+
+    def __init__(self, folder: str, columns: List[str] = None, min_time_step: float = None,
+                 chunk_rows: int = 1024, room_names: List[str] = None):
+        """
+        @param folder: The folder to write the results in, it is created if needed.
+        @param columns: The columns to keep, all of them are kept if not provided.
+        @param min_time_step: If provided, only the first row in each step of this many seconds is kept.
+        @param chunk_rows: The number of rows of each room to buffer before writing them as a chunk.
+        @param room_names: The names of the rooms to record in the index, by default room_0, room_1, ...
+        """
+        super().__init__(columns, min_time_step)
+        self._folder = folder
+        self._chunk_rows = max(1, chunk_rows)
+        self._room_names = room_names
+        self._columns: pd.Index = None
+        self._dtypes: List[np.dtype] = None
+        self._index_name = None
+        self._buffers: List[List[pd.DataFrame]] = []
+        self._buffered_rows: List[int] = []
+        self._chunks: List[List[dict]] = []
+
+    def room_folder(self, room_index: int) -> str:
+        return os.path.join(self._folder, f"room_{room_index}")
+
+    def _start(self, room_count: int):
+        self._buffers = [[] for _ in range(room_count)]
+        self._buffered_rows = [0]*room_count
+        self._chunks = [[] for _ in range(room_count)]
+        for i in range(room_count):
+            os.makedirs(self.room_folder(i), exist_ok=True)
+            # Remove the chunks of any earlier run written to the same folder
+            for name in os.listdir(self.room_folder(i)):
+                if name.endswith(".npy"):
+                    os.remove(os.path.join(self.room_folder(i), name))
+        self._write_index()
+
+    def _append(self, room_index: int, results: pd.DataFrame):
+        if self._columns is None:
+            self._columns = results.columns
+            self._dtypes = list(results.dtypes)
+            self._index_name = results.index.name
+        elif not results.columns.equals(self._columns):
+            raise ValueError("The columns of the results changed between intervals")
+        else:
+            self._dtypes = [np.result_type(a, b) for a, b in zip(self._dtypes, results.dtypes)]
+
+        self._buffers[room_index].append(results)
+        self._buffered_rows[room_index] += len(results.index)
+        if self._buffered_rows[room_index] >= self._chunk_rows:
+            self._write_chunk(room_index)
+            self._write_index()
+
+    def flush(self):
+        """
+        Write the rows buffered for every room, as a (possibly short) chunk
+        """
+        written = False
+        for i in range(len(self._buffers)):
+            if self._buffered_rows[i]:
+                self._write_chunk(i)
+                written = True
+        if written:
+            self._write_index()
+
+    def _write_chunk(self, room_index: int):
+        """
+        Write the rows buffered for a room as its next chunk
+        """
+        buffer = self._buffers[room_index]
+        times = np.concatenate([b.index.to_numpy(dtype=float) for b in buffer])
+        values = np.concatenate([b.to_numpy(dtype=float) for b in buffer])
+
+        number = len(self._chunks[room_index])
+        values_file = f"chunk_{number:06d}.npy"
+        times_file = f"times_{number:06d}.npy"
+        np.save(os.path.join(self.room_folder(room_index), values_file), np.ascontiguousarray(values.T))
+        np.save(os.path.join(self.room_folder(room_index), times_file), times)
+
+        self._chunks[room_index].append({
+            'values': values_file,
+            'times': times_file,
+            'rows': len(times),
+            'first_time': float(times[0]),
+            'last_time': float(times[-1]),
+        })
+        self._buffers[room_index] = []
+        self._buffered_rows[room_index] = 0
+
+    def _write_index(self):
+        """
+        Rewrite the index, under a temporary name and then renamed, so a reader never sees a partial one
+        """
+        room_count = len(self._chunks)
+        names = self._room_names or [f"room_{i}" for i in range(room_count)]
+        index = {
+            'format_version': _chunked_format_version,
+            'layout': 'species x rows',
+            'columns': None if self._columns is None else [str(c) for c in self._columns],
+            'dtypes': None if self._dtypes is None else [np.dtype(d).str for d in self._dtypes],
+            'index_name': self._index_name,
+            'rooms': [{'name': str(names[i]), 'folder': f"room_{i}", 'chunks': self._chunks[i]}
+                      for i in range(room_count)],
+        }
+        handle, temporary_file = tempfile.mkstemp(dir=self._folder, suffix=".tmp")
+        try:
+            with os.fdopen(handle, 'w') as f:
+                json.dump(index, f, indent=1)
+            os.replace(temporary_file, os.path.join(self._folder, "index.json"))
+        except Exception:
+            if os.path.exists(temporary_file):
+                os.remove(temporary_file)
+            raise
+
+    def _state(self, folder: str = None) -> Dict[str, np.ndarray]:
+        # The results are already on disk, only the rows still buffered need writing out
+        self.flush()
+        return {'chunk_counts': np.array([len(c) for c in self._chunks], dtype=int)}
+
+    def _restore(self, room_count: int, state: Dict[str, np.ndarray]):
+        with open(os.path.join(self._folder, "index.json")) as f:
+            index = json.load(f)
+        if len(index['rooms']) != room_count:
+            raise ValueError(f"The results in {self._folder} are for {len(index['rooms'])} rooms, not {room_count}")
+
+        self._columns = None if index['columns'] is None else pd.Index(index['columns'])
+        self._dtypes = None if index['dtypes'] is None else [np.dtype(d) for d in index['dtypes']]
+        self._index_name = index['index_name']
+        self._buffers = [[] for _ in range(room_count)]
+        self._buffered_rows = [0]*room_count
+
+        # Forget the chunks written after the checkpoint, they will be written again
+        self._chunks = []
+        for i, count in enumerate(state['chunk_counts']):
+            chunks = index['rooms'][i]['chunks']
+            for chunk in chunks[count:]:
+                for name in (chunk['values'], chunk['times']):
+                    if os.path.exists(os.path.join(self.room_folder(i), name)):
+                        os.remove(os.path.join(self.room_folder(i), name))
+            self._chunks.append(chunks[:count])
+        self._write_index()
+
+    def _finish(self) -> List[str]:
+        self.flush()
+        self._write_index()
+        return [self.room_folder(i) for i in range(len(self._chunks))]
+
+
+def read_chunked_results(folder: str) -> Dict[str, pd.DataFrame]:
+    """
+    Load the results written by a ChunkedResultSink, as a dataframe for each room, by room name
+    """
+    with open(os.path.join(folder, "index.json")) as f:
+        index = json.load(f)
+
+    results = {}
+    for room in index['rooms']:
+        room_folder = os.path.join(folder, room['folder'])
+        if not room['chunks'] or index['columns'] is None:
+            results[room['name']] = pd.DataFrame()
+            continue
+        times = np.concatenate([np.load(os.path.join(room_folder, c['times'])) for c in room['chunks']])
+        values = np.concatenate([np.load(os.path.join(room_folder, c['values'])) for c in room['chunks']], axis=1)
+        df = pd.DataFrame(values.T, index=pd.Index(times, name=index['index_name']), columns=index['columns'])
+        non_float = dict((c, np.dtype(d)) for c, d in zip(index['columns'], index['dtypes']) if np.dtype(d) != np.float64)
+        results[room['name']] = df.astype(non_float) if non_float else df
+    return results
@@ -0,0 +1,121 @@
+from typing import Callable, Dict, List
+import os
+import pickle
+import pandas as pd
+from multiprocess import Pool, cpu_count
+from .results_format import ResultsReader
+
+# The variables extracted when none are specified
+default_variables = [
+    'O3', 'NO', 'NO2', 'HONO', 'HNO3', 'CO', 'APINENE', 'BPINENE', 'LIMONENE',
+    'BENZENE', 'TOLUENE', 'TCE', 'OH', 'HO2', 'CH3O2', 'RO2', 'H2O', 'M',
+    'H2O2', 'adults', 'children',
+    'OH_reactivity', 'OH_production', 'J4', 'temp', 'ACRate', 'tsp', 'tspx',
+]
+
+
+def _selected_columns(available: List[str], variables: List[str]):
+    """
+    The variables which exist indoors, and the outdoor counterparts of the variables which exist outdoors
+    """
+    available = set(available)
+    indoor = [v for v in variables if v in available]
+    outdoor = [v+'OUT' for v in variables if v+'OUT' in available]
+    return indoor, outdoor
+
+
+def _write_csv(filename: str, read_rows: Callable[[slice], pd.DataFrame], row_count: int, chunk_rows: int):
+    """
+    Write a csv file a block of rows at a time, so only one block is ever held in memory
+    """
+    with open(filename, 'w', newline='') as f:
+        for start in range(0, max(row_count, 1), chunk_rows):
+            read_rows(slice(start, start+chunk_rows)).to_csv(f, header=(start == 0), index_label='Time')
+
+
+def _extract_room_from_folder(results_location: str, room_name: str, variables: List[str],
+                              output_folder: str, chunk_rows: int) -> List[str]:
+    """
+    Write the csv files of one room of a results folder, reading only the selected variables
+    """
+    reader = ResultsReader(results_location)
+    files = []
+    for suffix, columns in zip(("", "_outdoor"), _selected_columns(reader.species(room_name), variables)):
+        filename = os.path.join(output_folder, f"{room_name}{suffix}.csv")
+        _write_csv(filename, lambda rows: reader.dataframe(room_name, columns, rows),
+                   reader.row_count(room_name), chunk_rows)
+        files.append(filename)
+    return files
+
+
+def _extract_room_from_dataframe(room_name: str, room_pd: pd.DataFrame, variables: List[str],
+                                 output_folder: str, chunk_rows: int) -> List[str]:
+    """
+    Write the csv files of one room whose results are already loaded
+    """
+    files = []
+    for suffix, columns in zip(("", "_outdoor"), _selected_columns(room_pd.columns, variables)):
+        filename = os.path.join(output_folder, f"{room_name}{suffix}.csv")
+        _write_csv(filename, lambda rows: room_pd.iloc[rows][columns], len(room_pd.index), chunk_rows)
+        files.append(filename)
+    return files
+
+
+def extract_results(results_location: str,
+                    variables: List[str] = None,
+                    output_folder: str = 'extracted_outputs',
+                    excel_filename: str = None,
+                    processes: int = None,
+                    chunk_rows: int = 100000) -> List[str]:
+    """
+    Save the selected variables of each room to a csv file, and those which exist outdoors to a separate csv file
+
+    From a results folder written by write_results only the selected variables are read,
+    and the rooms are extracted in parallel. A pickle file of a dictionary of dataframes,
+    as written by earlier versions, has to be loaded whole, and its rooms are extracted one after another.
+
+    @param results_location: A results folder, or a pickle file.
+    @param variables: The variables to extract, there is no need to include the outdoor variables.
+    @param output_folder: The folder to write the csv files in, it is created if needed.
+    @param excel_filename: If provided, the indoor variables are also written to this excel file (without the .xlsx)
+    in the output folder, with one sheet per room. This needs an excel writer for pandas, such as openpyxl.
+    @param processes: The number of rooms to extract at once, by default the number of cpus.
+    @param chunk_rows: The number of rows to read and write at once.
+    @return: The files written.
+    """
+    variables = list(variables or default_variables)
+    os.makedirs(output_folder, exist_ok=True)
+
+    if ResultsReader.is_results_folder(results_location):
+        reader = ResultsReader(results_location)
+        room_names = reader.room_names()
+        args = [(results_location, r, variables, output_folder, chunk_rows) for r in room_names]
+        processes = min(processes or cpu_count(), len(args))
+        if processes > 1:
+            with Pool(processes) as pool:
+                room_files = pool.starmap(_extract_room_from_folder, args)
+        else:
+            room_files = [_extract_room_from_folder(*a) for a in args]
+
+        def read_room(room_name: str) -> pd.DataFrame:
+            return reader.dataframe(room_name, _selected_columns(reader.species(room_name), variables)[0])
+    else:
+        with open(results_location, 'rb') as handle:
+            data: Dict[str, pd.DataFrame] = pickle.load(handle)
+        room_names = list(data.keys())
+        room_files = [_extract_room_from_dataframe(r, data[r], variables, output_folder, chunk_rows) for r in room_names]
+
+        def read_room(room_name: str) -> pd.DataFrame:
+            return data[room_name][_selected_columns(data[room_name].columns, variables)[0]]
+
+    files = [f for r in room_files for f in r]
+
+    # Optional: the indoor variables in one excel file, one room at a time with one sheet per room
+    if excel_filename:
+        excel_file = os.path.join(output_folder, f"{excel_filename}.xlsx")
+        with pd.ExcelWriter(excel_file) as writer:
+            for room_name in room_names:
+                read_room(room_name).to_excel(writer, index_label='Time', sheet_name=room_name)
+        files.append(excel_file)
+
+    return files
@@ -0,0 +1,185 @@
+from typing import Dict, List
+import json
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Bump this if the layout of the results folders changes
+_results_format_version = 1
+
+
+def _write_index(folder: str, index: dict):
+    """
+    Write the index of a results folder, under a temporary name and then renamed, so a reader never sees a partial one
+    """
+    handle, temporary_file = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    try:
+        with os.fdopen(handle, 'w') as f:
+            json.dump(index, f, indent=1)
+        os.replace(temporary_file, os.path.join(folder, "index.json"))
+    except Exception:
+        if os.path.exists(temporary_file):
+            os.remove(temporary_file)
+        raise
+
+
+def _room_entry(name: str, i: int, columns, dtypes, index_name, rows: int) -> dict:
+    return {
+        'name': str(name),
+        'folder': f"room_{i}",
+        'rows': int(rows),
+        'columns': [str(c) for c in columns],
+        'dtypes': [np.dtype(d).str for d in dtypes],
+        'index_name': index_name,
+    }
+
+
+def write_results(folder: str, results: Dict[str, pd.DataFrame]):
+    """
+    Save the results of a run, as returned by Simulation.run with its rooms replaced by names
+    Each room has a folder with times.npy, and values.npy holding species x rows,
+    so the time series of one species is contiguous and can be read through a memory map without the rest.
+    An index.json in the folder records the rooms and their species.
+
+    @param folder: The folder to write the results in, it is created if needed.
+    @param results: The results of each room, by room name.
+    """
+    os.makedirs(folder, exist_ok=True)
+    rooms = []
+    for i, (name, df) in enumerate(results.items()):
+        room_folder = os.path.join(folder, f"room_{i}")
+        os.makedirs(room_folder, exist_ok=True)
+        np.save(os.path.join(room_folder, "times.npy"), df.index.to_numpy(dtype=float))
+        values = np.lib.format.open_memmap(os.path.join(room_folder, "values.npy"), mode='w+',
+                                           dtype=float, shape=(len(df.columns), len(df.index)))
+        values[:, :] = df.to_numpy(dtype=float).T
+        values.flush()
+        del values
+        rooms.append(_room_entry(name, i, df.columns, df.dtypes, df.index.name, len(df.index)))
+
+    _write_index(folder, {'format_version': _results_format_version, 'layout': 'species x rows', 'rooms': rooms})
+
+
+def write_results_from_chunks(chunked_folder: str, folder: str):
+    """
+    Save the results written by a ChunkedResultSink in the same format as write_results
+    The chunks are copied one at a time, so no room is ever held in memory whole.
+
+    @param chunked_folder: The folder the ChunkedResultSink wrote to.
+    @param folder: The folder to write the results in, it is created if needed, it can be the same folder.
+    """
+    with open(os.path.join(chunked_folder, "index.json")) as f:
+        chunked_index = json.load(f)
+    columns = chunked_index['columns'] or []
+    dtypes = chunked_index['dtypes'] or []
+
+    os.makedirs(folder, exist_ok=True)
+    rooms = []
+    for i, room in enumerate(chunked_index['rooms']):
+        chunk_folder = os.path.join(chunked_folder, room['folder'])
+        room_folder = os.path.join(folder, f"room_{i}")
+        os.makedirs(room_folder, exist_ok=True)
+        rows = sum(c['rows'] for c in room['chunks'])
+
+        times = np.lib.format.open_memmap(os.path.join(room_folder, "times.npy"), mode='w+', dtype=float, shape=(rows,))
+        values = np.lib.format.open_memmap(os.path.join(room_folder, "values.npy"), mode='w+',
+                                           dtype=float, shape=(len(columns), rows))
+        start = 0
+        for chunk in room['chunks']:
+            end = start+chunk['rows']
+            times[start:end] = np.load(os.path.join(chunk_folder, chunk['times']))
+            values[:, start:end] = np.load(os.path.join(chunk_folder, chunk['values']))
+            start = end
+        times.flush()
+        values.flush()
+        del times, values
+        rooms.append(_room_entry(room['name'], i, columns, dtypes, chunked_index['index_name'], rows))
+
+    _write_index(folder, {'format_version': _results_format_version, 'layout': 'species x rows', 'rooms': rooms})
+
+
+class ResultsReader:
+    """
+        @brief Reads results saved by write_results, only loading what is asked for
+        The arrays are opened as memory maps, so reading one species of one room
+        only reads that species' time series from the disk.
+
+    """
+
+    def __init__(self, folder: str):
+        """
+        @param folder: The folder the results were written in.
+        """
+        self._folder = folder
+        with open(os.path.join(folder, "index.json")) as f:
+            index = json.load(f)
+        if index.get('format_version') != _results_format_version:
+            raise ValueError(f"{folder} does not hold results of a supported format")
+        self._rooms: Dict[str, dict] = dict((r['name'], r) for r in index['rooms'])
+        self._column_positions: Dict[str, Dict[str, int]] = dict(
+            (r['name'], dict((c, j) for j, c in enumerate(r['columns']))) for r in index['rooms'])
+
+    @staticmethod
+    def is_results_folder(folder: str) -> bool:
+        """
+        Whether a folder holds results written by write_results
+        """
+        return os.path.isfile(os.path.join(folder, "index.json")) and \
+            os.path.isfile(os.path.join(folder, "room_0", "values.npy"))
+
+    def room_names(self) -> List[str]:
+        return list(self._rooms.keys())
+
+    def row_count(self, room_name: str) -> int:
+        return self._rooms[room_name]['rows']
+
+    def species(self, room_name: str) -> List[str]:
+        """
+        The columns of the results of a room
+        """
+        return list(self._rooms[room_name]['columns'])
+
+    def times(self, room_name: str) -> np.ndarray:
+        """
+        The times of the results of a room, as a read only memory map
+        """
+        return np.load(self._file(room_name, "times.npy"), mmap_mode='r')
+
+    def values(self, room_name: str) -> np.ndarray:
+        """
+        All the results of a room as species x rows, as a read only memory map
+        """
+        return np.load(self._file(room_name, "values.npy"), mmap_mode='r')
+
+    def series(self, room_name: str, species: str) -> np.ndarray:
+        """
+        The time series of one species in one room, as a read only memory map
+        """
+        position = self._column_positions[room_name].get(species)
+        if position is None:
+            raise KeyError(f"{room_name} has no results for {species}")
+        return self.values(room_name)[position]
+
+    def dataframe(self, room_name: str, species: List[str] = None, rows: slice = slice(None)) -> pd.DataFrame:
+        """
+        The results of a room as a dataframe, of only the species and rows requested if provided
+        Species which the room does not have are skipped.
+        """
+        room = self._rooms[room_name]
+        positions = self._column_positions[room_name]
+        columns = room['columns'] if species is None else [s for s in species if s in positions]
+        indexer = [positions[c] for c in columns]
+
+        times = np.array(self.times(room_name)[rows])
+        values = self.values(room_name)
+        data = np.array(values[indexer, rows]).T if indexer else np.empty((len(times), 0))
+        df = pd.DataFrame(data, index=pd.Index(times, name=room['index_name']), columns=columns)
+
+        # Restore any columns which were not floats in the original dataframes
+        non_float = dict((c, np.dtype(room['dtypes'][positions[c]])) for c in columns
+                         if np.dtype(room['dtypes'][positions[c]]) != np.float64)
+        return df.astype(non_float) if non_float else df
+
+    def _file(self, room_name: str, name: str) -> str:
+        return os.path.join(self._folder, self._rooms[room_name]['folder'], name)
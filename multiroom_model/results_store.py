@@ -0,0 +1,127 @@
+from typing import List
+import numpy as np
+import pandas as pd
+
+
+class RoomResultsStore:
+    """
+        @brief Accumulates the results of one room, interval by interval, without repeated concatenation
+        The values are held in a preallocated numpy block of timesteps x species, which grows geometrically,
+        each new interval is copied into it in place.
+        A dataframe is only built when requested
+
+    """
+
+    def __init__(self, initial_capacity: int = 1024):
+        """
+        @param initial_capacity: The number of timesteps to allocate room for before the first growth.
+        """
+        self._capacity: int = max(1, initial_capacity)
+        self._length: int = 0
+        self._columns: pd.Index = None
+        self._dtypes: List[np.dtype] = None
+        self._index_name = None
+        self._times: np.ndarray = None
+        self._values: np.ndarray = None
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def columns(self) -> pd.Index:
+        return self._columns
+
+    @property
+    def dtypes(self) -> List[np.dtype]:
+        return self._dtypes
+
+    @property
+    def index_name(self):
+        return self._index_name
+
+    @classmethod
+    def from_arrays(cls, times: np.ndarray, values: np.ndarray, columns: pd.Index,
+                    dtypes: List[np.dtype] = None, index_name=None) -> 'RoomResultsStore':
+        """
+        Make a store holding results which were already stored, for example in a checkpoint
+        """
+        n = len(times)
+        store = cls(initial_capacity=n)
+        store._columns = pd.Index(columns)
+        store._dtypes = list(dtypes) if dtypes is not None else [np.dtype(float)]*len(columns)
+        store._index_name = index_name
+        store._times = np.empty(store._capacity, dtype=float)
+        store._values = np.empty((store._capacity, len(columns)), dtype=float)
+        store._times[:n] = times
+        store._values[:n, :] = values
+        store._length = n
+        return store
+
+    def times(self) -> np.ndarray:
+        """
+        A read only view of the times stored so far
+        """
+        view = self._times[:self._length] if self._times is not None else np.empty(0)
+        view.flags.writeable = False
+        return view
+
+    def values(self) -> np.ndarray:
+        """
+        A read only view of the values stored so far, as timesteps x species
+        """
+        view = self._values[:self._length] if self._values is not None else np.empty((0, 0))
+        view.flags.writeable = False
+        return view
+
+    def append(self, df: pd.DataFrame):
+        """
+        Copy the rows of a dataframe onto the end of the store
+        Every dataframe must have the same columns as the first one appended
+        """
+        if self._columns is None:
+            self._columns = df.columns
+            self._dtypes = list(df.dtypes)
+            self._index_name = df.index.name
+            self._times = np.empty(self._capacity, dtype=float)
+            self._values = np.empty((self._capacity, len(df.columns)), dtype=float)
+        elif not (df.columns is self._columns or df.columns.equals(self._columns)):
+            raise ValueError("The columns of the results changed between intervals")
+        else:
+            # Follow the dtype promotion pd.concat would have applied
+            self._dtypes = [np.result_type(a, b) for a, b in zip(self._dtypes, df.dtypes)]
+
+        n = len(df.index)
+        self._reserve(self._length+n)
+        self._times[self._length:self._length+n] = df.index.to_numpy(dtype=float)
+        self._values[self._length:self._length+n, :] = df.to_numpy(dtype=float)
+        self._length += n
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Build a dataframe of all the results stored so far
+        """
+        if self._columns is None:
+            return pd.DataFrame()
+        index = pd.Index(self._times[:self._length].copy(), name=self._index_name)
+        result = pd.DataFrame(self._values[:self._length].copy(), index=index, columns=self._columns)
+
+        # Restore any columns which were not floats in the original dataframes
+        non_float = dict((c, d) for c, d in zip(self._columns, self._dtypes) if d != np.float64)
+        if non_float:
+            result = result.astype(non_float)
+        return result
+
+    def _reserve(self, size: int):
+        """
+        Grow the storage (by doubling) so that it can hold at least size timesteps
+        """
+        if size <= self._capacity:
+            return
+        while self._capacity < size:
+            self._capacity *= 2
+        times = np.empty(self._capacity, dtype=float)
+        times[:self._length] = self._times[:self._length]
+        values = np.empty((self._capacity, self._values.shape[1]), dtype=float)
+        values[:self._length] = self._values[:self._length]
+        self._times = times
+        self._values = values
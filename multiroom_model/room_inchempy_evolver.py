@@ -1,23 +1,109 @@
 from typing import List, Tuple
+import threading
+import weakref
+import numpy as np
+import pandas as pd
 from .global_settings import GlobalSettings
 from .room_chemistry import RoomChemistry
 from .inchem import generate_main_class, run_main_class
+from .mechanism_cache import cached_main_class
 from .time_dep_value import TimeDependentValue
 
 
+# A lock for each generated InChemPy class run in this process, forgotten along with the class
+_main_class_locks: "weakref.WeakKeyDictionary[object, threading.Lock]" = weakref.WeakKeyDictionary()
+_main_class_locks_guard = threading.Lock()
+
+
+def main_class_lock(inchem) -> threading.Lock:
+    """
+    The lock to hold while running a generated InChemPy class
+    Rooms generated from the same arguments share one class, and nothing shows that running it is thread safe,
+    so rooms sharing a class run by threads take turns, while rooms with classes of their own still run together.
+    Each process has its own locks, so rooms run by processes never wait for each other.
+    """
+    with _main_class_locks_guard:
+        return _main_class_locks.setdefault(inchem, threading.Lock())
+
+
 def interpret_light_on_times(room_mrlswitch: List[Tuple[float, float]], end_of_total_integration: float) -> List[List[int]]:
 
     light_on_times = []
+    times = room_mrlswitch.times()
+    values = room_mrlswitch.values()
 
-    for i in range(len(room_mrlswitch.values())-1):
-        if (room_mrlswitch.values()[i] == 1):
-            light_on_times.append([room_mrlswitch.times()[i], room_mrlswitch.times()[i+1]])
-    if (room_mrlswitch.values()[-1] == 1):
-        light_on_times.append([room_mrlswitch.times()[-1], room_mrlswitch.values()[0]+3600.0])
+    for i in range(len(values)-1):
+        if (values[i] == 1):
+            light_on_times.append([times[i], times[i+1]])
+    if (values[-1] == 1):
+        light_on_times.append([times[-1], values[0]+3600.0])
 
     return light_on_times
 
 
+def state_dataframe(template: pd.DataFrame, time: float, state: np.ndarray) -> pd.DataFrame:
+    """
+    The one row dataframe of the state of a room at a time, to start the next interval from
+    The template is an empty dataframe with the columns and index of the room's results (eg. their first 0 rows),
+    so only the state itself needs to be sent to a process each interval
+    """
+    index = pd.Index([time], dtype=template.index.dtype, name=template.index.name)
+    return pd.DataFrame(np.asarray(state, dtype=float)[None, :], index=index, columns=template.columns)
+
+
+def same_state_layout(template_1: pd.DataFrame, template_2: pd.DataFrame) -> bool:
+    """
+    Whether two templates give the same dataframes for the same state
+    """
+    return (template_1.columns.equals(template_2.columns)
+            and template_1.index.dtype == template_2.index.dtype
+            and template_1.index.name == template_2.index.name)
+
+
+def default_const_dict() -> dict:
+    """
+    The species held constant when no const dict is provided
+    """
+    return {
+        'O2': 0.2095,
+        'N2': 0.7809,
+        'H2': 550e-9,
+        'saero': 1.3e-2  # aerosol surface area concentration
+    }
+
+
+def main_class_arguments(room: RoomChemistry, global_settings: GlobalSettings, const_dict: dict = None) -> dict:
+    """
+    The arguments used to generate the InChemPy class of a room
+    Rooms with equal arguments can share one generated class
+    """
+
+    # Change the rooms emisions into the format of dictionary which inchempy understands 
+    timed_emissions = hasattr(room, "emissions")
+    if timed_emissions:
+        timed_inputs = {k: v.values() for k, v in room.emissions.items()}
+    else:
+        timed_inputs = None
+
+    return dict(
+        filename=global_settings.filename,
+        INCHEM_additional=global_settings.INCHEM_additional,
+        particles=global_settings.particles,
+        constrained_file=global_settings.constrained_file,
+        output_folder=global_settings.output_folder,
+        dt=global_settings.dt,
+        volume=room.volume_in_m3,
+        surface_area=room.surface_area_dictionary(),
+        const_dict=const_dict or default_const_dict(),
+        H2O2_dep=global_settings.H2O2_dep,
+        O3_dep=global_settings.O3_dep,
+        custom=global_settings.custom,
+        timed_emissions=timed_emissions,
+        timed_inputs=timed_inputs,
+        custom_filename=global_settings.custom_filename
+    )
+
+
 class RoomInchemPyEvolver:
     """
         @brief A class which can evolve the state of species in a room using Inchem py
@@ -30,45 +116,34 @@ class RoomInchemPyEvolver:
     global_settings: GlobalSettings = None
     const_dict: dict = None
 
-    def __init__(self, room: RoomChemistry, global_settings: GlobalSettings, const_dict: dict = None):
+    def __init__(self, room: RoomChemistry, global_settings: GlobalSettings, const_dict: dict = None,
+                 inchem=None):
+        """
+        @param room: The room to evolve.
+        @param global_settings: Settings for the simulation which are independent of any one room or aperture.
+        @param const_dict: The species to hold constant, a default is used if not provided.
+        @param inchem: An InChemPy class already generated from the same arguments as this room would use,
+        to share it instead of generating another one.
+        """
 
         # Store the room and settings
         self.room = room
         self.global_settings = global_settings
 
         # If the const dict is not provided, use this default one
-        self.const_dict = const_dict or {
-            'O2': 0.2095,
-            'N2': 0.7809,
-            'H2': 550e-9,
-            'saero': 1.3e-2  # aerosol surface area concentration
-        }
+        self.const_dict = const_dict or default_const_dict()
 
-        # Change the rooms emisions into the format of dictionary which inchempy understands 
-        timed_emissions = hasattr(room, "emissions")
-        if timed_emissions:
-            timed_inputs = {k: v.values() for k, v in room.emissions.items()}
-        else:
-            timed_inputs = None
+        if inchem is not None:
+            self.inchem = inchem
+            return
 
         #Generate an inchempy instance, (including calculating the jacobians for later use)
-        self.inchem = generate_main_class(
-            filename=self.global_settings.filename,
-            INCHEM_additional=self.global_settings.INCHEM_additional,
-            particles=self.global_settings.particles,
-            constrained_file=self.global_settings.constrained_file,
-            output_folder=self.global_settings.output_folder,
-            dt=self.global_settings.dt,
-            volume=room.volume_in_m3,
-            surface_area=room.surface_area_dictionary(),
-            const_dict=self.const_dict,
-            H2O2_dep=self.global_settings.H2O2_dep,
-            O3_dep=self.global_settings.O3_dep,
-            custom=self.global_settings.custom,
-            timed_emissions=timed_emissions,
-            timed_inputs=timed_inputs,
-            custom_filename=self.global_settings.custom_filename
-        )
+        #If there is a mechanism cache, a class built by an earlier run may be reused instead
+        arguments = main_class_arguments(room, global_settings, self.const_dict)
+        if self.global_settings.mechanism_cache_folder is not None:
+            self.inchem = cached_main_class(self.global_settings.mechanism_cache_folder, **arguments)
+        else:
+            self.inchem = generate_main_class(**arguments)
 
     def run(self, t0, seconds_to_integrate, initial_dataframe=None, initial_text_file=None, const_dict: dict = None):
         '''
@@ -108,8 +183,8 @@ class RoomInchemPyEvolver:
 
         # Change the rooms time dependent properties to lists and dictionaries which inchempy understands 
         light_on_times = interpret_light_on_times(self.room.light_switch, t0+seconds_to_integrate)
-        temperatures = list(zip(self.room.temp_in_kelvin.times(), self.room.temp_in_kelvin.values()))
-        ACRate_dict = dict(zip(self.room.airchange_in_per_second.times(), self.room.airchange_in_per_second.values()))
+        temperatures = self.room.temp_in_kelvin.pairs()
+        ACRate_dict = dict(self.room.airchange_in_per_second.pairs())
 
         # Change the rooms emisions into the format of dictionary which inchempy understands 
         timed_emissions = hasattr(self.room, "emissions")
@@ -119,32 +194,33 @@ class RoomInchemPyEvolver:
             timed_inputs = None
 
         # Run the inchempy instance with these properties, times and initial conditions
-        result = run_main_class(self.inchem,
-                                t0=t0,
-                                seconds_to_integrate=seconds_to_integrate,
-                                dt=self.global_settings.dt,
-                                timed_emissions=timed_emissions,
-                                timed_inputs=timed_inputs,
-                                spline=spline,
-                                temperatures=temperatures,
-                                rel_humidity=rel_humidity,
-                                const_dict=cd,
-                                M=M,
-                                light_type=self.room.light_type,
-                                glass=self.room.glass_type,
-                                diurnal=self.global_settings.diurnal,
-                                city=self.global_settings.city,
-                                date=self.global_settings.date,
-                                lat=self.global_settings.lat,
-                                ACRate_dict=ACRate_dict,
-                                light_on_times=light_on_times,
-                                initial_conditions_gas=initial_conditions_gas,
-                                initials_from_run=initials_from_run,
-                                path=self.global_settings.path,
-                                adults=adults,
-                                children=children,
-                                output_folder=self.global_settings.output_folder,
-                                reactions_output=self.global_settings.reactions_output,
-                                initial_dataframe=initial_dataframe
-                                )
+        with main_class_lock(self.inchem):
+            result = run_main_class(self.inchem,
+                                    t0=t0,
+                                    seconds_to_integrate=seconds_to_integrate,
+                                    dt=self.global_settings.dt,
+                                    timed_emissions=timed_emissions,
+                                    timed_inputs=timed_inputs,
+                                    spline=spline,
+                                    temperatures=temperatures,
+                                    rel_humidity=rel_humidity,
+                                    const_dict=cd,
+                                    M=M,
+                                    light_type=self.room.light_type,
+                                    glass=self.room.glass_type,
+                                    diurnal=self.global_settings.diurnal,
+                                    city=self.global_settings.city,
+                                    date=self.global_settings.date,
+                                    lat=self.global_settings.lat,
+                                    ACRate_dict=ACRate_dict,
+                                    light_on_times=light_on_times,
+                                    initial_conditions_gas=initial_conditions_gas,
+                                    initials_from_run=initials_from_run,
+                                    path=self.global_settings.path,
+                                    adults=adults,
+                                    children=children,
+                                    output_folder=self.global_settings.output_folder,
+                                    reactions_output=self.global_settings.reactions_output,
+                                    initial_dataframe=initial_dataframe
+                                    )
         return result
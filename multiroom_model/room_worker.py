@@ -0,0 +1,136 @@
+from multiprocess import Process, Pipe
+import time
+from .global_settings import GlobalSettings
+from .room_chemistry import RoomChemistry
+from .room_inchempy_evolver import RoomInchemPyEvolver, state_dataframe, same_state_layout
+import numpy as np
+import pandas as pd
+
+
+def _room_worker_loop(connection, room: RoomChemistry, global_settings: GlobalSettings):
+    """
+    The body of a room worker process
+    Builds the evolver once, then serves run requests until told to close
+    Every reply is a tuple of (success, value), where value is the exception on failure,
+    and for a run the results with the seconds the evolver took
+    """
+    try:
+        evolver = RoomInchemPyEvolver(room, global_settings)
+    except Exception as e:
+        connection.send((False, e))
+        connection.close()
+        return
+    connection.send((True, None))
+
+    # The columns and index of the states sent, which is only sent again when it changes
+    template = None
+
+    while True:
+        command, args = connection.recv()
+        if command == "close":
+            break
+        if command == "template":
+            template = args
+            continue
+        try:
+            start = time.perf_counter()
+            if command == "run_state":
+                t0, t_interval, state = args
+                df, _ = evolver.run(t0=t0, seconds_to_integrate=t_interval,
+                                    initial_dataframe=state_dataframe(template, t0, state))
+            else:
+                t0, t_interval, initial_condition, txt_file = args
+                if (txt_file):
+                    df, _ = evolver.run(t0=t0, seconds_to_integrate=t_interval, initial_text_file=initial_condition)
+                else:
+                    df, _ = evolver.run(t0=t0, seconds_to_integrate=t_interval, initial_dataframe=initial_condition)
+            connection.send((True, (df, time.perf_counter()-start)))
+        except Exception as e:
+            connection.send((False, e))
+
+    connection.close()
+
+
+class RoomWorker:
+    """
+        @brief A process which keeps one RoomInchemPyEvolver resident for its whole lifetime
+        The evolver (and its jacobians) is built inside the worker process and never leaves it,
+        only the initial conditions and the results of each interval cross the process boundary
+
+    """
+
+    def __init__(self, room: RoomChemistry, global_settings: GlobalSettings):
+        """
+        @brief Start the worker process, which begins building its evolver straight away.
+        Use wait_until_built before submitting work to surface any build errors.
+
+        @param room: The room this worker evolves.
+        @param global_settings: Settings for the simulation which are independent of any one room or aperture.
+        """
+        self._connection, child_connection = Pipe()
+        self._process = Process(target=_room_worker_loop,
+                                args=(child_connection, room, global_settings),
+                                daemon=True)
+        self._process.start()
+        child_connection.close()
+        self._built = False
+        self._template: pd.DataFrame = None
+
+        # How long the evolver took over the last interval, in the worker process
+        self.last_seconds: float = None
+
+    def wait_until_built(self):
+        """
+        Block until the evolver has been built inside the worker process
+        """
+        if not self._built:
+            self._receive()
+            self._built = True
+
+    def submit(self, t0: float, t_interval: float, initial_condition, txt_file: bool = False):
+        """
+        Ask the worker to evolve its room for one interval, without waiting for the result
+        The initial condition is either a text file name or a dataframe of concentrations
+        """
+        self.wait_until_built()
+        self._connection.send(("run", (t0, t_interval, initial_condition, txt_file)))
+
+    def submit_state(self, t0: float, t_interval: float, state: np.ndarray, template: pd.DataFrame):
+        """
+        Ask the worker to evolve its room for one interval from a state, without waiting for the result
+        The template (an empty dataframe with the columns and index of the results) is only sent when it changes,
+        so otherwise only the values of the state cross the process boundary
+        """
+        self.wait_until_built()
+        if self._template is None or not same_state_layout(self._template, template):
+            self._connection.send(("template", template))
+            self._template = template
+        self._connection.send(("run_state", (t0, t_interval, state)))
+
+    def result(self):
+        """
+        Wait for, and return, the dataframe from the last submitted interval
+        """
+        df, self.last_seconds = self._receive()
+        return df
+
+    def close(self):
+        """
+        Stop the worker process
+        """
+        if self._process.is_alive():
+            try:
+                self._connection.send(("close", None))
+            except (BrokenPipeError, OSError):
+                pass
+            self._process.join()
+        self._connection.close()
+
+    def _receive(self):
+        try:
+            success, value = self._connection.recv()
+        except EOFError:
+            raise Exception("Room worker process exited unexpectedly")
+        if not success:
+            raise value
+        return value
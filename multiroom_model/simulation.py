@@ -1,21 +1,40 @@
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Union
+from collections import OrderedDict
+import contextlib
+import copy
+import logging
 import math
+import time
+import uuid
 
-from .aperture_flow_calculations import ApertureFlowCalculator
 from .room_chemistry import RoomChemistry
 from .aperture import Aperture, Side
-from .room_inchempy_evolver import RoomInchemPyEvolver
+from .room_inchempy_evolver import RoomInchemPyEvolver, main_class_arguments, state_dataframe
+from .mechanism_cache import mechanism_cache_key
+from .room_worker import RoomWorker
+from .executors import Executor, SerialExecutor, ProcessExecutor
+from .result_sinks import ResultSink, MemoryResultSink
+from .transport_engine import TransportEngine
+from .adaptive_interval import AdaptiveInterval, schedule_change_times, next_change_after
+from .checkpoint import Checkpoint, save_checkpoint, load_checkpoint, checkpoint_results_folder
 from .aperture_calculations import ApertureCalculation
+from .trans_matrix_cache import TransMatrixCache
+from .pressure_network import PressureNetwork
+from .diagnostics import Diagnostics
 from .transport_paths import paths_through_building
 from .global_settings import GlobalSettings
 from .wind_definition import WindDefinition
 import pandas as pd
 import numpy as np
-from multiprocess import Pool, cpu_count
+from multiprocess import cpu_count
 
 
-def yellow_text(str):
-    return f"\033[93m{str}\033[0m"
+logger = logging.getLogger(__name__)
+
+# The evolvers held by a worker process of an executor, keyed by the simulation they belong to and the index
+# of the room, so each is only sent to a process once. The least recently used are forgotten first.
+_resident_evolvers: "OrderedDict[Tuple[str, int], RoomInchemPyEvolver]" = OrderedDict()
+_max_resident_evolvers = 256
 
 
 class Simulation:
@@ -29,7 +48,12 @@ class Simulation:
                  rooms: List[RoomChemistry],
                  apertures: List[Aperture],
                  wind_definition: WindDefinition = None,
-                 cpu_count: int = cpu_count()):
+                 cpu_count: int = cpu_count(),
+                 persistent_workers: bool = False,
+                 coupled_transport: bool = False,
+                 trans_matrix_cache: TransMatrixCache = None,
+                 diagnostics: Diagnostics = None,
+                 executor: Executor = None):
         """
         @brief Initialize the Simulation with
         details about the building, rooms and apertures.
@@ -38,29 +62,200 @@ class Simulation:
         @param rooms: Information about the rooms.
         @param apertures: Information about the apertures.
         @param cpu_count: Cap on the number of processes to use when solving with multiprocess.
+        With 1, everything is run in this process instead, without starting any others.
+        There may be more rooms than processes, each room is a task of its own, and the rooms
+        which took longest over the last interval are given out first, so the processes finish together.
+        @param persistent_workers: If True, each room's evolver is built once inside its own worker process
+        and stays resident there, so only concentrations cross the process boundary at each interval.
+        This uses one process per room regardless of cpu_count. Call close() when finished.
+        @param coupled_transport: If True, the transport between all the rooms and the outdoors is integrated
+        exactly over each interval as one linear system, instead of one explicit jump per aperture.
+        The transport step is then exact, and concentrations cannot go negative. The chemistry of each room is still
+        solved separately from the transport, so the error of splitting them still grows with t_interval,
+        which still limits how long it can be.
+        @param trans_matrix_cache: Keeps the trans matrices already assembled for each wind state,
+        by default a TransMatrixCache which only reuses a matrix for exactly the same wind state.
+        @param diagnostics: Gathers and reports (through logging) any problems during a run,
+        such as negative concentrations, by default a Diagnostics reporting to the "multiroom_model.diagnostics" logger.
+        @param executor: Runs the builds and the rooms of every run, in place of cpu_count.
+        It is left open, so its workers (and the modules and room evolvers they have loaded) are reused by every run,
+        and by other simulations given the same executor. By default a pool is started for each build and run.
         """
 
-        # Number of cores to use in multiprocessing
+        # Number of cores to use in multiprocessing, unless an executor is provided
         self._cpu_count = cpu_count
+        self._executor = executor
 
         self._global_settings = global_settings
-        self._rooms = rooms
+        self._rooms = list(rooms)
         self._apertures = apertures
         self._wind_definition = wind_definition
-
-        with Pool(self._cpu_count) as pool:
-
-            # For each room, build a room_evolver (performed in parallel)
-            args = [(r, self._global_settings) for r in self._rooms]
-            self._room_evolvers: List[RoomInchemPyEvolver] = pool.starmap(self.build_room_evolver_starmap, args)
+        self._coupled_transport = coupled_transport
+        self._room_volumes = np.array([r.volume_in_m3 for r in rooms], dtype=float)
+        self._transport_engine: TransportEngine = None
+        self._trans_matrix_cache = trans_matrix_cache if trans_matrix_cache is not None else TransMatrixCache()
+
+        self._diagnostics = diagnostics if diagnostics is not None else Diagnostics()
+        self._pressure_network: PressureNetwork = None
+        if global_settings.airflow_model == 'pressure_network':
+            self._pressure_network = PressureNetwork(self._rooms,
+                                                     self._apertures,
+                                                     global_settings.building_direction_in_radians,
+                                                     global_settings.air_density,
+                                                     (global_settings.upwind_pressure_coefficient,
+                                                      global_settings.downwind_pressure_coefficient))
+        elif global_settings.airflow_model != 'transport_paths':
+            raise ValueError(f"Unknown airflow model: {global_settings.airflow_model}")
+
+        self._room_evolvers: List[RoomInchemPyEvolver] = None
+        self._room_workers: List[RoomWorker] = None
+        # Identifies the evolvers of this simulation to the worker processes which keep them
+        self._evolvers_key = uuid.uuid4().hex
+
+        # The InChemPy class generated for each distinct mechanism signature, shared with the variants of the simulation
+        self._mechanism_classes: Dict[str, Any] = {}
+
+        # How long each room's chemistry took over the last interval, to give out the slowest rooms first
+        self._room_seconds = np.zeros(len(self._rooms))
+
+        if persistent_workers:
+            # For each room, start a worker which builds its own room_evolver (performed in parallel)
+            self._room_workers = [RoomWorker(r, self._global_settings) for r in self._rooms]
+            try:
+                for w in self._room_workers:
+                    w.wait_until_built()
+            except Exception:
+                self.close()
+                raise
+
+        with self._open_executor() as executor:
+
+            if not persistent_workers:
+                self._room_evolvers = self._build_room_evolvers(self._rooms, executor)
 
             # For each aperture, build an ApertureCalculation (performed in parallel)
-            transport_paths = paths_through_building(self._rooms, self._apertures)
+            # The pressure network finds the advection flows itself, so then the transport paths aren't needed
+            if self._pressure_network is None:
+                transport_paths = paths_through_building(self._rooms, self._apertures,
+                                                         max_route_length=self._global_settings.max_route_length,
+                                                         max_paths=self._global_settings.max_transport_paths)
+            else:
+                transport_paths = []
             args = [(w, transport_paths, self._apertures, self._rooms, self._global_settings) for w in self._apertures]
-            self._aperture_calculators: List[ApertureCalculation] = pool.starmap(
+            self._aperture_calculators: List[ApertureCalculation] = executor.starmap(
                 self.build_aperture_calculator_starmap, args)
 
-    def run(self, init_conditions: dict, t0: float, t_total: float, t_interval: float):
+    def __getstate__(self):
+        """
+        The executor stays behind when the simulation is sent to another process, it can't be sent with it
+        """
+        state = self.__dict__.copy()
+        state['_executor'] = None
+        return state
+
+    def _open_executor(self):
+        """
+        The executor provided, which is left open, otherwise a pool of cpu_count processes,
+        or an executor which runs everything in this process for a cpu_count of 1
+        """
+        if self._executor is not None:
+            return contextlib.nullcontext(self._executor)
+        return SerialExecutor() if self._cpu_count == 1 else ProcessExecutor(self._cpu_count)
+
+    def _build_room_evolvers(self, rooms: List[RoomChemistry], executor: Executor = None) -> List[RoomInchemPyEvolver]:
+        """
+        An evolver for each room, generating (in parallel) only the InChemPy classes not already generated
+        Rooms whose InChemPy classes would be generated from identical arguments share one class,
+        which they take turns to run when run by threads
+        An executor is only opened if none is provided and there are classes to generate
+        """
+        # The signatures hash each mechanism file only once, however many rooms use it
+        signatures = [mechanism_cache_key(main_class_arguments(r, self._global_settings)) for r in rooms]
+        first_room_with_signature: Dict[str, int] = {}
+        for i, signature in enumerate(signatures):
+            if signature not in self._mechanism_classes:
+                first_room_with_signature.setdefault(signature, i)
+
+        # For each new signature, build a room_evolver (performed in parallel)
+        args = [(rooms[i], self._global_settings) for i in first_room_with_signature.values()]
+        if not args:
+            built_evolvers = {}
+        elif executor is None:
+            with self._open_executor() as new_executor:
+                built_evolvers = dict(zip(first_room_with_signature.keys(),
+                                          new_executor.starmap(self.build_room_evolver_starmap, args)))
+        else:
+            built_evolvers = dict(zip(first_room_with_signature.keys(),
+                                      executor.starmap(self.build_room_evolver_starmap, args)))
+        for signature, evolver in built_evolvers.items():
+            self._mechanism_classes[signature] = evolver.inchem
+
+        # The other rooms get an evolver which shares the class already built
+        return [built_evolvers[signature] if first_room_with_signature.get(signature) == i
+                else RoomInchemPyEvolver(r, self._global_settings, inchem=self._mechanism_classes[signature])
+                for i, (r, signature) in enumerate(zip(rooms, signatures))]
+
+    @property
+    def rooms(self) -> List[RoomChemistry]:
+        """
+        @brief The rooms of the simulation, in the order of its results
+        """
+        return list(self._rooms)
+
+    def build_mechanisms(self, rooms: List[RoomChemistry]):
+        """
+        @brief Generate (in parallel) the InChemPy classes which variants of the rooms would need,
+        and which aren't generated already, so with_inputs doesn't need to generate them.
+        """
+        self._build_room_evolvers(rooms)
+
+    def with_inputs(self, rooms: List[RoomChemistry] = None, wind_definition: WindDefinition = None,
+                    executor: Executor = None) -> 'Simulation':
+        """
+        @brief A simulation of the same building with other time dependent inputs,
+        reusing the InChemPy classes and aperture calculations already built.
+        Only rooms needing an InChemPy class which isn't built yet (such as those with other emissions) cost a build.
+
+        @param rooms: Variants of the rooms, in the same order, with the same volumes,
+        but their own occupancy, emissions, temperatures and so on. By default the same rooms.
+        @param wind_definition: The wind, by default the same wind.
+        @param executor: Runs the builds and the rooms of the variant, by default the same as for this simulation.
+        """
+        if self._room_workers is not None:
+            raise ValueError("A simulation with persistent workers cannot be varied, the workers hold its rooms")
+
+        # Only the InChemPy classes and aperture calculations are shared, which are not changed by a run,
+        # the variant gathers its own diagnostics and trans matrices, with the same settings
+        variant = copy.copy(self)
+        variant._transport_engine = None
+        variant._trans_matrix_cache = TransMatrixCache(self._trans_matrix_cache.max_size,
+                                                       self._trans_matrix_cache.wind_speed_tolerance,
+                                                       self._trans_matrix_cache.wind_direction_tolerance_in_radians)
+        variant._diagnostics = Diagnostics(self._diagnostics.logger,
+                                           self._diagnostics.sample_every,
+                                           self._diagnostics.max_species_listed)
+        variant._room_seconds = np.zeros(len(self._rooms))
+        if wind_definition is not None:
+            variant._wind_definition = wind_definition
+        if executor is not None:
+            variant._executor = executor
+
+        if rooms is not None:
+            rooms = list(rooms)
+            if len(rooms) != len(self._rooms):
+                raise ValueError(f"The simulation has {len(self._rooms)} rooms, {len(rooms)} were provided")
+            # The aperture calculations depend on the volumes of the rooms
+            if any(r.volume_in_m3 != v for r, v in zip(rooms, self._room_volumes)):
+                raise ValueError("The rooms must have the same volumes as the rooms of the simulation")
+            variant._rooms = rooms
+            variant._room_evolvers = variant._build_room_evolvers(rooms)
+            variant._evolvers_key = uuid.uuid4().hex
+        return variant
+
+    def run(self, init_conditions: dict, t0: float, t_total: float, t_interval: float,
+            adaptive_interval: AdaptiveInterval = None,
+            checkpoint_file: str = None, checkpoint_every: int = None, checkpoint_seconds: float = 600.0,
+            result_sink: ResultSink = None):
         """
         @brief run the simulation over a time interval.
 
@@ -68,49 +263,202 @@ class Simulation:
         @param t0: The time to start the simulation at.
         @param t_total: Duration to simulate.
         @param t_interval: How often to apply the effect of windows.
+        @param adaptive_interval: If provided, t_interval is only the first interval,
+        later intervals are chosen from the concentration changes caused by the windows,
+        within the bounds it sets, and end exactly on any abrupt change of the rooms' inputs.
+        @param checkpoint_file: If provided, the state of the run is saved to this file as it progresses,
+        and the run can be continued from it with resume. Results held in memory are saved beside it,
+        in a folder named after it, only the rows added since the last checkpoint are written each time.
+        @param checkpoint_every: If provided, a checkpoint is saved after every this many intervals.
+        @param checkpoint_seconds: If provided, a checkpoint is saved once this many seconds (of wall clock time)
+        have passed since the last one, by default every 10 minutes.
+        @param result_sink: Receives the results of each interval as they are produced,
+        by default they are kept in memory (a MemoryResultSink).
+        @return: A dictionary of the results of each room, as returned by closing the result sink,
+        for the default sink these are dataframes of the results at all times.
         """
 
         t_final: float = t0+t_total
+        sink = result_sink if result_sink is not None else MemoryResultSink()
+        sink.open(len(self._rooms))
+        self._diagnostics.open(len(self._rooms))
+
+        if adaptive_interval is not None:
+            t_interval = adaptive_interval.clamp(t_interval)
+            next_change = next_change_after(schedule_change_times(self._rooms), t0)
+            if next_change is not None and t0+t_interval > next_change:
+                t_interval = next_change-t0
 
-        with Pool(self._cpu_count) as pool:
+        with self._open_executor() as executor:
 
             # First step
             # using the init_conditions, perform a solve on each room (performed in parallel)
-            room_results, solved_time = self._evolve_rooms(pool, t0, t_interval,
+            room_results, solved_time = self._evolve_rooms(executor, t0, t_interval,
                                                            [init_conditions[r] for r in self._rooms], True)
 
-            # Cumulate the results for this step and others into a cumulative results dictionary
-            cumulative_room_results: Dict[RoomChemistry, pd.DataFrame] = dict(
-                [(r, room_results[i].copy()) for i, r in enumerate(self._rooms)])
-
-            # Use the aperture results to adjust the room results into the input for the next iteration
-            initial_condition = self._apply_wind(pool, solved_time, t_interval, room_results)
-
-            # Loop of incrementing time by t_interval and performing the operations
-            # Stop when another increment would take it over the total
-            while (solved_time+t_interval <= t_final):
+            # Give the results of this step, and later others, to the sink
+            for i, r in enumerate(room_results):
+                sink.append(i, r)
 
-                # Use the initial conditions and solve for the next time interval  (performed in parallel)
-                room_results, solved_time = self._evolve_rooms(pool, solved_time, t_interval, initial_condition)
-                # Add the new results to the cumulative result for all times
-                cumulative_room_results = dict(
-                    [(r, pd.concat([cumulative_room_results[r], room_results[i]], axis=0)) for i, r in enumerate(self._rooms)])
+            self._continue_run(executor, sink, room_results, solved_time, t_final, t_interval, adaptive_interval,
+                               checkpoint_file, checkpoint_every, checkpoint_seconds, 1)
 
-                # Use the aperture results to adjust the room results into appropriate initial conditions for the next iteration
-                initial_condition = self._apply_wind(pool, solved_time, t_interval, room_results)
+        self._diagnostics.close()
 
-            # Final step  if there is any time smaller than a single interval left to be solved
-            if solved_time < t_final:
+        # Only now let the sink finish the results for all times
+        return dict(zip(self._rooms, sink.close()))
 
-                final_t_interval = t_final-solved_time
-
-                room_results, solved_time = self._evolve_rooms(pool, solved_time, final_t_interval, initial_condition)
+    def resume(self, checkpoint: Union[str, Checkpoint], checkpoint_file: str = None, checkpoint_every: int = None,
+               checkpoint_seconds: float = 600.0, result_sink: ResultSink = None):
+        """
+        @brief continue a run of the simulation from a checkpoint saved by run (or by an earlier resume).
+        The results are the same as if the run had not been interrupted, including all the results before the checkpoint.
+        The simulation must be built from the same settings, rooms and apertures as the one which saved the checkpoint,
+        with a mechanism cache folder in the global settings, building it again reuses the generated InChemPy classes.
+
+        @param checkpoint: The checkpoint, or the file it was saved to.
+        @param checkpoint_file: If provided, the state of the run continues to be saved to this file as it progresses.
+        @param checkpoint_every: If provided, a checkpoint is saved after every this many intervals.
+        @param checkpoint_seconds: If provided, a checkpoint is saved once this many seconds (of wall clock time)
+        have passed since the last one, by default every 10 minutes.
+        @param result_sink: A sink of the same type, with the same settings, as the one given to the interrupted run.
+        It is restored to where it was at the checkpoint.
+        """
+        if not isinstance(checkpoint, Checkpoint):
+            checkpoint = load_checkpoint(checkpoint)
+        if len(checkpoint.states) != len(self._rooms):
+            raise ValueError(f"The checkpoint has {len(checkpoint.states)} rooms, the simulation has {len(self._rooms)}")
+
+        sink = result_sink if result_sink is not None else MemoryResultSink()
+        if type(sink).__name__ != checkpoint.sink_type:
+            raise ValueError(f"The checkpoint was saved with a {checkpoint.sink_type}, not a {type(sink).__name__}")
+        sink.restore(len(self._rooms), checkpoint.sink_state)
+        self._diagnostics.open(len(self._rooms))
+
+        with self._open_executor() as executor:
+            self._continue_run(executor, sink, checkpoint.room_states(), checkpoint.solved_time,
+                               checkpoint.t_final, checkpoint.t_interval, checkpoint.adaptive_interval,
+                               checkpoint_file, checkpoint_every, checkpoint_seconds, 0)
+
+        self._diagnostics.close()
+
+        # Only now let the sink finish the results for all times
+        return dict(zip(self._rooms, sink.close()))
+
+    def _continue_run(self, executor: Executor, sink: ResultSink, room_results, solved_time: float,
+                      t_final: float, t_interval: float, adaptive_interval: AdaptiveInterval,
+                      checkpoint_file: str, checkpoint_every: int, checkpoint_seconds: float,
+                      intervals_since_checkpoint: int):
+        """
+        Loop of incrementing time and performing the operations, from the solved time until the final time is reached
+        The results of each interval are given to the sink
+        """
+        if adaptive_interval is not None:
+            change_times = schedule_change_times(self._rooms)
+
+        # The results only share their columns and index with the rooms, not their rows,
+        # so the initial conditions of each interval are built from this and the new states
+        template = room_results[0].iloc[:0]
+        last_checkpoint = time.perf_counter()
+
+        while solved_time < t_final:
+
+            # Save the state reached, before the next interval changes anything
+            if checkpoint_file is not None and intervals_since_checkpoint > 0 and (
+                    (checkpoint_every is not None and intervals_since_checkpoint >= checkpoint_every) or
+                    (checkpoint_seconds is not None and time.perf_counter()-last_checkpoint >= checkpoint_seconds)):
+                sink_state = sink.checkpoint_state(checkpoint_results_folder(checkpoint_file))
+                save_checkpoint(checkpoint_file,
+                                Checkpoint.from_room_results(solved_time, t_final, t_interval, adaptive_interval,
+                                                             room_results, type(sink).__name__, sink_state))
+                intervals_since_checkpoint = 0
+                last_checkpoint = time.perf_counter()
+
+            # Gather the state of every room at the solved time into a rooms x species array, once for the interval
+            states = np.vstack([r.iloc[-1].to_numpy(dtype=float) for r in room_results])
+            columns = self._transport_engine_for([r.columns for r in room_results]).columns
+
+            if adaptive_interval is None:
+                # Use the aperture results to adjust the room states into appropriate initial conditions for the next iteration
+                new_states = self._apply_wind(solved_time, t_interval, states, columns)
+
+                # Increment by t_interval, unless that would take it over the total
+                # in which case this is the final step, for the time smaller than a single interval left
+                is_final_step = solved_time+t_interval > t_final
+                step = t_final-solved_time if is_final_step else t_interval
+            else:
+                # Choose the next interval, and apply the aperture results over it
+                step, new_states, t_interval = self._adaptive_step(
+                    adaptive_interval, change_times, solved_time, t_final, t_interval, states, columns)
+                is_final_step = step >= t_final-solved_time
+
+            # Use the initial conditions and solve for the next time interval  (performed in parallel)
+            room_results, solved_time = self._evolve_rooms(executor, solved_time, step, new_states, template=template)
+            intervals_since_checkpoint += 1
+
+            # Give the new results to the sink
+            for i, r in enumerate(room_results):
+                sink.append(i, r)
+
+            if is_final_step:
+                break
+
+    def _adaptive_step(self, adaptive_interval: AdaptiveInterval, change_times: np.ndarray,
+                       solved_time: float, t_final: float, t_interval: float,
+                       states: np.ndarray, columns: pd.Index):
+        """
+        Choose the next interval, starting from the proposed t_interval
+        The interval is cut short to land on the final time or on the next change of the rooms' inputs,
+        and shrunk (re-applying the wind, which is cheap compared to the chemistry) until
+        the concentration changes caused by the apertures are within the tolerance
+        Return the interval, the states of the rooms to start it from, and the interval to propose next
+        """
+        step = min(t_interval, t_final-solved_time)
+
+        # Don't leave a remainder shorter than the minimum interval before the final time,
+        # take it all in one interval if that isn't too long, otherwise split it evenly in two
+        remainder = t_final-solved_time-step
+        if 0 < remainder < adaptive_interval.min_interval:
+            step = step+remainder if step+remainder <= adaptive_interval.max_interval else (step+remainder)/2
+
+        # Land exactly on the next abrupt change of the rooms' inputs
+        next_change = next_change_after(change_times, solved_time)
+        lands_on_change = next_change is not None and solved_time+step >= next_change
+        if lands_on_change:
+            step = next_change-solved_time
+
+        while True:
+            new_states = self._apply_wind(solved_time, step, states, columns, record_diagnostics=False)
+            change = self._transport_engine.relative_change(states, new_states,
+                                                            adaptive_interval.concentration_floor)
+            if change <= adaptive_interval.tolerance or step <= adaptive_interval.min_interval:
+                break
+            step = max(adaptive_interval.min_interval, step*max(adaptive_interval.shrink_factor,
+                                                                adaptive_interval.safety_factor*adaptive_interval.tolerance/change))
+
+        # Only the interval chosen is of interest to the diagnostics
+        if not self._coupled_transport:
+            self._record_negative_concentrations(solved_time, new_states, columns)
+
+        # After an abrupt change the rooms may respond quickly, so start again from the shortest interval
+        if lands_on_change:
+            return step, new_states, adaptive_interval.min_interval
+        return step, new_states, adaptive_interval.next_interval(step, change)
+
+    def close(self):
+        """
+        @brief Stop any persistent room workers. The simulation cannot be run afterwards.
+        """
+        if self._room_workers is not None:
+            for w in self._room_workers:
+                w.close()
+            self._room_workers = None
 
-                # Add the new results to the cumulative result for all times
-                cumulative_room_results = dict(
-                    [(r, pd.concat([cumulative_room_results[r], room_results[i]], axis=0)) for i, r in enumerate(self._rooms)])
+    def __enter__(self):
+        return self
 
-        return cumulative_room_results
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def wind_state(self, time):
         """
@@ -125,38 +473,112 @@ class Simulation:
                 wind_direction)
             return wind_speed, wind_direction_in_radians
 
-    def _apply_wind(self, pool, time, t_interval, room_results):
+    def _apply_wind(self, time, t_interval, states: np.ndarray, columns: pd.Index, record_diagnostics=True):
         """
         Applies the effect of the wind, to alter the state of the rooms
-        Uses the pool to calculate the impact of each aperture on the room concentrations
-        Applies these changes to the concentrations
-        Return the new room concentrations
+        Moves species between every room and the outdoors at once, through the trans matrix
+        The states are a rooms x species array, in the order of the columns
+        Return the new room concentrations, as an array of the same shape
         """
-        # Determine the properties of the wind at this time
-        wind_speed, wind_direction_in_radians = self.wind_state(time)
-        # For each aperture  calculate a aperture result  (performed in parallel)
-        args = [(w, wind_speed, wind_direction_in_radians, t_interval, room_results, time)
-                for w in self._aperture_calculators]
-        aperture_results = pool.starmap(self.run_aperture_calculation_starmap, args)
-        # Use the aperture results to adjust the room results into the input for the next iteration
-        return self.apply_aperture_results(room_results, aperture_results, time)
+        engine = self._transport_engine_for([columns])
+
+        # Every aperture contributes to the one trans matrix, which is reused for a wind state seen before
+        trans_matrix = self._cached_trans_matrix(time)
 
-    def _evolve_rooms(self, pool, t0, t_interval, initial_condition, txt_file=False):
+        if self._coupled_transport:
+            new_states = engine.coupled_step(trans_matrix, self._room_volumes, t_interval, states)
+        else:
+            new_states = engine.explicit_step(trans_matrix, self._room_volumes, t_interval, states)
+
+            # TODO: Do something here about the risk of negative concentrations
+            # for example: `new_states = new_states.clip(min=0)`
+
+            # If a room concentration fell below 0, let the diagnostics know
+            if record_diagnostics:
+                self._record_negative_concentrations(time, new_states, engine.columns)
+
+        # Return the augmented states, as the initial conditions of the next interval
+        return new_states
+
+    def _record_negative_concentrations(self, time, new_states: np.ndarray, columns: pd.Index):
+        """
+        Pass any negative concentrations to the diagnostics
+        """
+        negative = new_states < 0
+        if negative.any():
+            self._diagnostics.record_negative_concentrations(time, negative, columns)
+
+    def _transport_engine_for(self, all_columns: List[pd.Index]) -> TransportEngine:
+        """
+        The transport engine for the columns of the room results, only rebuilt if the columns change
+        """
+        columns = all_columns[0]
+        if any(not c.equals(columns) for c in all_columns[1:]):
+            raise ValueError("Transport between rooms needs every room to have the same species")
+        if self._transport_engine is None or not columns.equals(self._transport_engine.columns):
+            self._transport_engine = TransportEngine(columns)
+        return self._transport_engine
+
+    def _evolve_rooms(self, executor: Executor, t0, t_interval, initial_condition, txt_file=False, template: pd.DataFrame = None):
         """
         Evolves each of the rooms independently for one interval of time
-        Uses the pool to calculate the new concentration in each room
+        Uses the executor to calculate the new concentration in each room
+        The initial conditions are a text file for each room, or a rooms x species array of states
+        laid out as the (empty) template dataframe, so only the numbers are sent to the other processes
         Return the new room concentrations, and the time at which these are true
         """
-        # Use the initial conditions (text or dataframe) to produce new room results using the room evolvers
-        args = [(self._room_evolvers[i], t0, t_interval, initial_condition[i], txt_file) for i in range(len(self._rooms))]
-        room_results = pool.starmap(self.run_room_evolver_starmap, args)
+        # Use the initial conditions (text or state) to produce new room results using the room evolvers
+        start = time.perf_counter()
+        if self._room_workers is not None:
+            # Persistent workers already hold the evolvers, so only send them the initial conditions
+            for i, w in enumerate(self._room_workers):
+                if txt_file:
+                    w.submit(t0, t_interval, initial_condition[i], txt_file)
+                else:
+                    w.submit_state(t0, t_interval, initial_condition[i], template)
+            # Collect every reply before raising, so no worker is left with an unread result
+            room_results, errors = [], []
+            for w in self._room_workers:
+                try:
+                    room_results.append(w.result())
+                except Exception as e:
+                    errors.append(e)
+            if errors:
+                raise errors[0]
+            room_seconds = np.array([w.last_seconds for w in self._room_workers])
+            workers = len(self._room_workers)
+        else:
+            # Give out one room at a time, the slowest first, so a slow room doesn't start last
+            # and the other processes take the next room as soon as they finish one
+            order = np.argsort(-self._room_seconds, kind='stable')
+            # Processes keep the evolvers they are sent, so at first only the key of each evolver is sent,
+            # and the evolver only follows to a process which doesn't have it yet
+            send_evolvers = not executor.sends_tasks
+            room_results = [None]*len(self._rooms)
+            room_seconds = np.zeros(len(self._rooms))
+            while len(order):
+                tasks = [(i, self._room_evolvers[i] if send_evolvers else None,
+                          (self._evolvers_key, i) if executor.sends_tasks else None,
+                          t0, t_interval, initial_condition[i], txt_file, template) for i in order]
+                missing = []
+                for i, r, seconds in executor.imap_unordered(self.run_room_task, tasks):
+                    if r is None:
+                        missing.append(i)
+                    room_results[i] = r
+                    room_seconds[i] = seconds
+                order = np.array(missing, dtype=int)
+                send_evolvers = True
+            workers = min(executor.workers, len(self._rooms))
+
+        self._room_seconds = room_seconds
+        self._diagnostics.record_interval_load(t0, time.perf_counter()-start, room_seconds, workers)
         # Check that each room resulted in a result at the final time
         # If a room failed to complete, then raise the exception
         success = True
         for i, r in enumerate(room_results):
             if r.index[-1] != t0+t_interval:
                 success = False
-                print(yellow_text(f"Simulation incomplete for room {i}, only ran to time {r.index[-1]}, expected {t0+t_interval}"))
+                self._diagnostics.record_incomplete_room(i, r.index[-1], t0+t_interval)
         if not success:
             raise Exception(f"Simulation incomplete")
         # This results in a new time which we have solved to
@@ -168,60 +590,49 @@ class Simulation:
 
         @param time: The time to calculate at.
         """
+        return self._cached_trans_matrix(time).copy()
+
+    def _cached_trans_matrix(self, time: float):
+        """
+        The trans matrix at a given time, shared with the cache so it must not be altered
+        """
         # Determine the properties of the wind at this time
         wind_speed, wind_direction_in_radians = self.wind_state(time)
+        return self._trans_matrix_cache.get(wind_speed, wind_direction_in_radians, self._assemble_trans_matrix)
+
+    def _assemble_trans_matrix(self, wind_speed: float, wind_direction_in_radians: float):
+        """
+        Assemble the trans matrix from the fluxes through every aperture, for given wind conditions
+        """
         size = len(self._rooms)+1
 
         # Make a result numpy matrix
         result = np.zeros((size, size))
 
+        # The pressure network finds the advection flow through every aperture at once
+        if self._pressure_network is not None:
+            flows = self._pressure_network.aperture_flows(wind_speed, wind_direction_in_radians)
+            ventilated = self._pressure_network.ventilated_rooms(flows)
+
         # For each aperture calculate the flux and add it to the resultant matrix
-        for c in self._aperture_calculators:
+        for k, c in enumerate(self._aperture_calculators):
             aperture_calculator, origin_index, destination_index, _, _ = c
             is_outdoor_aperture = destination_index is None
             i = origin_index+1
             j = 0 if is_outdoor_aperture else destination_index+1
-            f = aperture_calculator.trans_matrix_contributions(wind_speed, wind_direction_in_radians)
+            if self._pressure_network is None:
+                f = aperture_calculator.trans_matrix_contributions(wind_speed, wind_direction_in_radians)
+            else:
+                cross_ventilated = ventilated[origin_index] or (not is_outdoor_aperture and ventilated[destination_index])
+                f = aperture_calculator.trans_matrix_contributions_from_flow(flows[k], cross_ventilated)
             result[i, j] += f.from_1_to_2
             result[j, i] += f.from_2_to_1
 
-        return result
+        # Only assembled once for each wind state, so this is the place to look at the flows in detail
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Trans matrix for a wind speed of %s and direction of %s radians:\n%s",
+                         wind_speed, wind_direction_in_radians, result)
 
-    @staticmethod
-    def apply_aperture_results(room_results, aperture_results, solved_time):
-        """
-        Applies the effect of the aperture results, to alter the state of the rooms
-        Return the new room concentrations at the final time
-        """
-        # Make a new result from the current result at the solved time
-        result = [result.loc[[solved_time], :].astype(float) for result in room_results]
-        # Go through all the aperture results
-        for room_1_concentration_change, room_2_concentration_change, origin_index, destination_index in aperture_results:
-            # Adjust the concentrations of room_1 int the new results
-            new_room_1_value = result[origin_index].loc[solved_time, :].add(
-                room_1_concentration_change, fill_value=0.0)
-            result[origin_index].loc[solved_time, :] = new_room_1_value
-            # If there is a room 2, adjust the concentrations of room_2 int the new results
-            if (destination_index is not None):
-                new_room_2_value = result[destination_index].loc[solved_time, :].add(
-                    room_2_concentration_change, fill_value=0.0)
-                result[destination_index].loc[solved_time, :] = new_room_2_value
-
-        # TODO: Do something here about the risk of negative concentrations
-        # for example: `result = [r.clip(lower=0).fillna(0) for r in result]`
-
-        # If a room concentration fell below 0, print a warning
-        for i, r in enumerate(result):
-            solved_time_result = r.loc[solved_time, :]
-            negative_solved_time_result = solved_time_result[solved_time_result < 0]
-            negative_species = negative_solved_time_result.index.tolist()
-            if negative_species:
-                species_str = ", ".join(negative_species)
-                print(
-                    yellow_text(f"Warning: Aperture effects resulted in a negative concentration in room {i} at time {solved_time}. Species: {species_str}")
-                )
-
-        # return the augmented results
         return result
 
     @staticmethod
@@ -243,6 +654,42 @@ class Simulation:
             df, _ = evolver.run(t0=t0, seconds_to_integrate=t_interval, initial_dataframe=initial_condition)
         return df
 
+    @staticmethod
+    def run_room_task(task):
+        """
+        Evolve one room for one interval, as a task given out by the executor
+        The evolver is kept by this process once it is sent, so a task may give only its key
+        Return the index of the room, its new concentrations, and the seconds they took,
+        or no concentrations if this process doesn't hold the evolver, which must then be sent
+        """
+        i, evolver, key, t0, t_interval, initial_condition, txt_file, template = task
+        if evolver is None:
+            evolver = _resident_evolvers.get(key)
+            if evolver is None:
+                return i, None, 0.0
+            _resident_evolvers.move_to_end(key)
+        elif key is not None:
+            _resident_evolvers[key] = evolver
+            while len(_resident_evolvers) > _max_resident_evolvers:
+                _resident_evolvers.popitem(last=False)
+
+        start = time.perf_counter()
+        if txt_file:
+            df = Simulation.run_room_evolver_starmap(evolver, t0, t_interval, initial_condition, txt_file)
+        else:
+            df = Simulation.run_room_evolver_from_state_starmap(evolver, t0, t_interval, initial_condition, template)
+        return i, df, time.perf_counter()-start
+
+    @staticmethod
+    def run_room_evolver_from_state_starmap(evolver, t0, t_interval, state, template):
+        """
+        Use the room evolver to calculate new room concentrations
+        Start from a state, laid out as the template dataframe
+        """
+        df, _ = evolver.run(t0=t0, seconds_to_integrate=t_interval,
+                            initial_dataframe=state_dataframe(template, t0, state))
+        return df
+
     @staticmethod
     def build_aperture_calculator_starmap(aperture, transport_paths, apertures, rooms, global_settings):
         """
@@ -260,51 +707,3 @@ class Simulation:
                                          (global_settings.upwind_pressure_coefficient,
                                           global_settings.downwind_pressure_coefficient))
         return calculator, origin_index, destination_index, origin_volume, destination_volume
-
-    @staticmethod
-    def run_aperture_calculation_starmap(aperture_calculator_data,
-                                         wind_speed, wind_direction,
-                                         delta_time,
-                                         room_results,
-                                         solved_time):
-        """
-        Use the aperture calculation to:
-        - calculate a flux based on the current wind
-        - use an ApertureFlowCalculator to calculate the concentration changes
-        - return the concentration changes, and the room indices they need to be applied to
-
-        This does not apply the concentration changes, the changes can't be done in parallel
-        """
-        aperture_calculator, origin_index, destination_index, origin_volume, destination_volume = aperture_calculator_data
-
-        # Calculate the flux relating to this aperture
-        flux = aperture_calculator.trans_matrix_contributions(wind_speed, wind_direction)
-
-        # build a flow calculator
-        calculator = ApertureFlowCalculator(room_results[origin_index].columns)
-
-        # switch depending on whether the aperture goes outside
-        is_outdoor_aperture = (destination_index is None)
-        if (is_outdoor_aperture):
-            # For an outside aperture, only one concentration is used as an input
-            origin_concentration = room_results[origin_index].loc[solved_time, :]
-            origin_concentration_change = calculator.outdoor_concentration_changes(
-                flux,
-                delta_time,
-                origin_concentration,
-                origin_volume)
-            # For an outside aperture, only one concentration change is calculated
-            return origin_concentration_change, None, origin_index, None
-        else:
-            # For an indoor aperture, one concentration per room is used as an input
-            origin_concentration = room_results[origin_index].loc[solved_time, :]
-            destination_concentration = room_results[destination_index].loc[solved_time, :]
-            origin_concentration_change, destination_concentration_change = calculator.concentration_changes(
-                flux,
-                delta_time,
-                origin_concentration,
-                destination_concentration,
-                origin_volume,
-                destination_volume)
-            # For an indoor aperture, one concentration change per room is calculated
-            return origin_concentration_change, destination_concentration_change, origin_index, destination_index
@@ -1,12 +1,25 @@
 from typing import List, Tuple
+from bisect import bisect_right
+import numpy as np
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    """
+    A view of an array which can't be written to
+    """
+    view = array.view()
+    view.flags.writeable = False
+    return view
 
 
 class TimeDependentValue:
     """
         @brief A class recording a variable which varies in time
-        Stored in the form of a list of tuples,
-        each  tuple has a time and a value 
+        Provided in the form of a list of tuples,
+        each  tuple has a time and a value
         it can be continuous which means that linear interpolation will be performed between defined times
+        The times and values are stored as numpy arrays (and lists, for single lookups),
+        and times are looked up by binary search. The arrays are given out as read-only views, never copied.
 
     """
 
@@ -16,48 +29,90 @@ class TimeDependentValue:
         if len(values) == 0:
             raise Exception("no times provided")
 
+        self._time_list: List[float] = [v[0] for v in values]
+        self._value_list: List[float] = [v[1] for v in values]
+        self._times: np.ndarray = np.asarray(self._time_list, dtype=float)
+        self._values: np.ndarray = np.asarray(self._value_list, dtype=float)
+        # The (time, value) pairs, as InChemPy takes its schedules
+        self._pairs: List[Tuple[float, float]] = list(zip(self._time_list, self._value_list))
+
         # Check that time provided were in strictly increasing order
-        for i in range(len(values)-1):
-            if (values[i][0] >= values[i+1][0]):
-                raise Exception("times were not in order")
+        if np.any(self._times[1:] <= self._times[:-1]):
+            raise Exception("times were not in order")
 
-        self._values: List[Tuple[float, float]] = values
         self._continuous = continuous
 
-    def times(self) -> List[float]:
-        return [v[0] for v in self._values]
+    @property
+    def continuous(self) -> bool:
+        return self._continuous
 
-    def values(self) -> List[float]:
-        return [v[1] for v in self._values]
+    def times(self) -> np.ndarray:
+        """
+        The times, as a read-only array
+        """
+        return _read_only(self._times)
+
+    def values(self) -> np.ndarray:
+        """
+        The values at each of the times, as a read-only array
+        """
+        return _read_only(self._values)
+
+    def pairs(self) -> List[Tuple[float, float]]:
+        """
+        The (time, value) pairs, as provided, built once and shared, so they must not be altered
+        """
+        return self._pairs
 
     def value_at_time(self, t: float) -> float:
         """
         Returns the value at time t using linear interpolation.
         """
         # Check if the time is before any datapoint
-        if t < self._values[0][0]:
+        if t < self._time_list[0]:
             raise Exception("Time is too early")
 
         # Check if the time is after the last datapoint
-        if t > self._values[-1][0]:
+        if t > self._time_list[-1]:
             raise Exception("Time is too late")
 
-        # Compare with the exact times
-        for t0, v0 in self._values:
-            if t == t0:
-                return v0
-
-        # Value if between 2 times
-        for i in range(len(self._values) - 1):
-            t0, v0 = self._values[i]
-            t1, v1 = self._values[i + 1]
-
-            if t0 <= t <= t1:
-                if(self._continuous):
-                    # Linear interpolation if between 2 times
-                    return v0 + (v1 - v0) * (t - t0) / (t1 - t0)
-                else:
-                    # Discrete step if between 2 times
-                    return v0
-
-        raise Exception("Invalid time")
+        if t != t:
+            raise Exception("Invalid time")
+
+        # The last time at or before t
+        i = bisect_right(self._time_list, t) - 1
+        t0, v0 = self._time_list[i], self._value_list[i]
+
+        # Compare with the exact time, otherwise a discrete step
+        if t == t0 or not self._continuous:
+            return v0
+
+        # Linear interpolation if between 2 times
+        t1, v1 = self._time_list[i + 1], self._value_list[i + 1]
+        return v0 + (v1 - v0) * (t - t0) / (t1 - t0)
+
+    def values_at_times(self, times: np.ndarray) -> np.ndarray:
+        """
+        Returns the values at many times at once, as value_at_time would for each of them.
+        """
+        times = np.asarray(times, dtype=float)
+        if times.size:
+            if times.min() < self._times[0]:
+                raise Exception("Time is too early")
+            if times.max() > self._times[-1]:
+                raise Exception("Time is too late")
+            if np.isnan(times).any():
+                raise Exception("Invalid time")
+
+        # The last time at or before each time
+        i = np.searchsorted(self._times, times, side='right') - 1
+        if not self._continuous:
+            return self._values[i]
+
+        # Linear interpolation, except at the last time which has nothing after it
+        following = np.minimum(i + 1, len(self._times) - 1)
+        t0, v0 = self._times[i], self._values[i]
+        t1, v1 = self._times[following], self._values[following]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            interpolated = v0 + (v1 - v0) * (times - t0) / (t1 - t0)
+        return np.where(times == t0, v0, interpolated)
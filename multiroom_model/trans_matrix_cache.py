@@ -0,0 +1,89 @@
+from collections import OrderedDict
+from typing import Callable, Tuple
+import math
+import numpy as np
+
+
+class TransMatrixCache:
+    """
+        @brief A least recently used cache of trans matrices, keyed on the wind state which produced them
+        The trans matrix only depends on the wind speed and direction, so intervals which share a wind state
+        (such as periods of no wind, which all use the exchange flows) can reuse the matrix already assembled.
+        With tolerances of 0 the key is the exact wind state, so the matrices are exactly those calculated.
+        Otherwise the wind state is rounded to a multiple of the tolerances, and the matrix is calculated
+        for the rounded wind state, so it doesn't depend on which of the nearby wind states came first.
+
+    """
+
+    def __init__(self,
+                 max_size: int = 256,
+                 wind_speed_tolerance: float = 0.0,
+                 wind_direction_tolerance_in_radians: float = 0.0):
+        """
+        @param max_size: The most matrices to keep, the least recently used is forgotten first. 0 disables the cache.
+        @param wind_speed_tolerance: The wind speed is rounded to a multiple of this (m/s), 0 for no rounding.
+        @param wind_direction_tolerance_in_radians: The wind direction is rounded to a multiple of this, 0 for no rounding.
+        """
+        if max_size < 0:
+            raise ValueError("The cache size cannot be negative")
+        if wind_speed_tolerance < 0 or wind_direction_tolerance_in_radians < 0:
+            raise ValueError("The tolerances cannot be negative")
+
+        self.max_size = max_size
+        self.wind_speed_tolerance = wind_speed_tolerance
+        self.wind_direction_tolerance_in_radians = wind_direction_tolerance_in_radians
+        self.hits = 0
+        self.misses = 0
+        self._matrices: "OrderedDict[Tuple[float, float], np.ndarray]" = OrderedDict()
+
+    def key(self, wind_speed: float, wind_direction_in_radians: float) -> Tuple[float, float]:
+        """
+        The wind state a matrix is cached under (and calculated for)
+        """
+        if self.wind_speed_tolerance > 0:
+            wind_speed = round(wind_speed/self.wind_speed_tolerance)*self.wind_speed_tolerance
+        if self.wind_direction_tolerance_in_radians > 0:
+            # Directions a whole turn apart are the same direction
+            wind_direction_in_radians = round((wind_direction_in_radians % (2*math.pi)) /
+                                              self.wind_direction_tolerance_in_radians)*self.wind_direction_tolerance_in_radians
+        # Without any wind the direction makes no difference
+        if wind_speed == 0:
+            wind_direction_in_radians = 0.0
+        return float(wind_speed), float(wind_direction_in_radians)
+
+    def get(self,
+            wind_speed: float,
+            wind_direction_in_radians: float,
+            calculate: Callable[[float, float], np.ndarray]) -> np.ndarray:
+        """
+        The trans matrix for a wind state, from the cache if it is there, otherwise from calculate
+        The matrix returned is shared with the cache, so it is read-only
+
+        @param calculate: Calculates the trans matrix for a wind speed and direction (in radians).
+        """
+        key = self.key(wind_speed, wind_direction_in_radians)
+        matrix = self._matrices.get(key)
+        if matrix is not None:
+            self.hits += 1
+            self._matrices.move_to_end(key)
+            return matrix
+
+        self.misses += 1
+        matrix = calculate(*key)
+        matrix.flags.writeable = False
+        if self.max_size > 0:
+            self._matrices[key] = matrix
+            if len(self._matrices) > self.max_size:
+                self._matrices.popitem(last=False)
+        return matrix
+
+    def clear(self):
+        """
+        Forget every matrix, and reset the counts of hits and misses
+        """
+        self._matrices.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._matrices)
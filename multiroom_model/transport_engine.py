@@ -0,0 +1,107 @@
+from typing import List
+import numpy as np
+import pandas as pd
+from .aperture_flow_calculations import ApertureFlowCalculator
+from .coupled_transport import transport_rate_matrix, propagate_transport
+
+
+class TransportEngine:
+    """
+        @brief A class which moves species between all the rooms at once, using numpy arrays
+        The species which can be transported are worked out once, from the columns of the results,
+        and stored as integer index arrays. Each interval, every aperture is then applied together
+        through the (rooms+1)x(rooms+1) trans matrix, to a rooms x species array of concentrations
+
+    """
+
+    columns: pd.Index
+    indoor_index: np.ndarray
+    outdoor_source_index: np.ndarray
+    outdoor_destination_index: np.ndarray
+
+    def __init__(self, columns: pd.Index):
+        """
+        @param columns: The columns of the results of every room.
+        """
+        self.columns = columns
+
+        # The species which leave a room and move between rooms, and the outdoor species
+        self.indoor_index, outdoor_index = ApertureFlowCalculator.trans_var_indices(columns)
+
+        # The outdoor species which enter a room, and the species of the room they become
+        destination_index = columns.get_indexer([v[:-3] for v in columns[outdoor_index]])
+        has_destination = destination_index >= 0
+        self.outdoor_source_index = outdoor_index[has_destination]
+        self.outdoor_destination_index = destination_index[has_destination]
+
+        # Every column which the transport can change
+        self._changed_index = np.union1d(self.indoor_index, self.outdoor_destination_index)
+
+        # For the coupled step, the outdoor counterpart of each transported species (-1 if there isn't one)
+        self._coupled_outdoor_index = columns.get_indexer([v+'OUT' for v in columns[self.indoor_index]])
+
+    def explicit_step(self, trans_matrix: np.ndarray, volumes: np.ndarray, delta_time: float, states: np.ndarray) -> np.ndarray:
+        '''
+        Apply the flows through every aperture as a single explicit step over the interval
+
+        inputs:
+            trans_matrix = the flows between the rooms and the outdoors, as returned by Simulation.trans_matrix
+            volumes = the volume of each room (m3)
+            delta_time = the interval of time being considered
+            states = rooms x columns values at the start of the interval
+
+        returns:
+            rooms x columns values after the flows have been applied
+        '''
+        A, b = transport_rate_matrix(trans_matrix, volumes)
+        result = states.copy()
+
+        # Exchange between rooms, and loss to the outdoors
+        concentrations = states[:, self.indoor_index]
+        result[:, self.indoor_index] += delta_time*(A @ concentrations)
+
+        # Gain from the outdoors
+        result[:, self.outdoor_destination_index] += delta_time*b[:, None]*states[:, self.outdoor_source_index]
+
+        return result
+
+    def coupled_step(self, trans_matrix: np.ndarray, volumes: np.ndarray, delta_time: float, states: np.ndarray) -> np.ndarray:
+        '''
+        Integrate the flows through every aperture exactly over the interval
+
+        inputs:
+            trans_matrix = the flows between the rooms and the outdoors, as returned by Simulation.trans_matrix
+            volumes = the volume of each room (m3)
+            delta_time = the interval of time being considered
+            states = rooms x columns values at the start of the interval
+
+        returns:
+            rooms x columns values after the flows have been applied
+        '''
+        result = states.copy()
+        concentrations = states[:, self.indoor_index]
+        has_outdoor = self._coupled_outdoor_index >= 0
+        outdoor_concentrations = np.zeros_like(concentrations)
+        outdoor_concentrations[:, has_outdoor] = states[:, self._coupled_outdoor_index[has_outdoor]]
+
+        result[:, self.indoor_index] = propagate_transport(trans_matrix, volumes, delta_time,
+                                                           concentrations, outdoor_concentrations)
+        return result
+
+    def relative_change(self, states: np.ndarray, new_states: np.ndarray, concentration_floor: float = 0.0) -> float:
+        """
+        The largest relative change of any transported species in any room, between two sets of states
+        Concentrations smaller than the floor are compared to the floor instead
+        """
+        before = states[:, self._changed_index]
+        after = new_states[:, self._changed_index]
+        scale = np.maximum(np.abs(before), concentration_floor)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = np.where(after == before, 0.0, np.abs(after-before)/scale)
+        return float(np.max(change, initial=0.0))
+
+    def negative_species(self, state: np.ndarray) -> List[str]:
+        """
+        The names of any species with a negative value in the state of one room
+        """
+        return self.columns[state < 0].tolist()
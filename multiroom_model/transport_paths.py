@@ -1,6 +1,7 @@
-from typing import List,  Dict, Union, TypeVar
+from typing import List, Dict, Union, TypeVar, Tuple, Optional, Set
 from dataclasses import dataclass
-from itertools import combinations
+from itertools import combinations, count
+from heapq import heappush, heappop
 from .aperture import Aperture, Side
 
 Room = TypeVar('Room')
@@ -27,69 +28,210 @@ class TransportPath:
     route: List[TransportPathParticipation]
 
 
-def paths_through_building(rooms: List[Room], apertures: List[Aperture]) -> List[TransportPath]:
+# The outside sides of the building, which transport paths start and end at
+_outsides = [Side.Front, Side.Left, Side.Back, Side.Right]
+
+
+def paths_through_building(rooms: List[Room],
+                           apertures: List[Aperture],
+                           max_route_length: int = None,
+                           max_paths: int = None) -> List[TransportPath]:
     """
         @brief Given a list of rooms and a list of apertures joining them (either to each other or the outside)
         Produces a list of the unique transport paths from one outside side of the house to another
         Each path goes through each room only once, preventing cycles
         Note that a path and its exact reversal are NOT both in the list, this is to prevent double-counting paths.
+
+        Finding every path takes time growing exponentially with how connected the rooms are,
+        which is fine for a house but not for a large building, so it can be limited:
+        @param max_route_length: If provided, paths through more apertures than this are not followed.
+        @param max_paths: If provided, only this many paths are found, those with the largest effective area
+        (see transport_path_effective_area), in order of decreasing effective area.
+        They are found one at a time (Yen's algorithm), so the time taken grows polynomially with the number of rooms.
+        Paths through an aperture with no area carry no flow, so are not among them.
     """
+    graph = _aperture_graph(rooms, apertures)
+
+    if max_paths is not None:
+        return _best_paths(graph, max_paths, max_route_length)
+
+    # Use this method 6 times to accumulate all routes between the 4 outside nodes, and not their exact reversals
+    result: List[TransportPath] = []
 
-    # build a graph where nodes are either rooms or outsides, and edges are apertures
-    @dataclass
-    class Node:
-        item: Union[Room | Side]
-        edges: List
+    # Use all combinations of 2 of the outside nodes (there are 6 combinations of 2 outside nodes: 4C2=6)
+    # We don't use permutations, because that would double-count the paths by reversing the start and end
+    for start, end in combinations(_outsides, 2):
+        result.extend(_all_paths_between(graph, start, end, max_route_length))
 
-    @dataclass
-    class Edge:
-        source: Node
-        destination: Node
-        aperture: TransportPathParticipation
+    return result
 
-    outsides = [Side.Front, Side.Left, Side.Back, Side.Right]
 
-    graph: Dict[Union[Room | Side], Node] = {}
-    for s in outsides:
-        graph[s] = Node(item=s, edges=[])
+def transport_path_effective_area(transport_path: TransportPath) -> float:
+    """
+        @brief The area of the single aperture which would let the same flow through as the apertures of the path in series
+        For the flow through each of them to be the same, the pressure drops, which go as (flow/area)^2, add up
+        so the effective area is (sum of 1/area^2)^-1/2, which is never more than the smallest area along the path
+    """
+    areas = [p.aperture.area for p in transport_path.route]
+    if any(a <= 0 for a in areas):
+        return 0.0
+    return sum(1.0/a**2 for a in areas)**-0.5
+
+
+def _aperture_graph(rooms: List[Room], apertures: List[Aperture]) -> Dict[Union[Room | Side], List[Tuple[Union[Room | Side], TransportPathParticipation]]]:
+    """
+    A graph where nodes are either rooms or outsides, and edges are apertures
+    Each node has a list of where its apertures lead, and how the aperture is passed through going there
+    """
+    graph = {}
+    for s in _outsides:
+        graph[s] = []
     for r in rooms:
-        graph[r] = Node(item=r, edges=[])
+        graph[r] = []
 
     for a in apertures:
-        node_1: Node = graph[a.origin]
-        node_2: Node = graph[a.destination]
-        node_1.edges.append(Edge(source=node_1, destination=node_2, aperture=TransportPathParticipation(a, False)))
-        node_2.edges.append(Edge(source=node_2, destination=node_1, aperture=TransportPathParticipation(a, True)))
-
-    # method to find all the paths from one start node to an end node
-
-    def all_paths_between(start_node, end_node) -> List[TransportPath]:
-        result: List[TransportPath] = []
-
-        # recursive utility function
-        def find_all_paths(current_node: Node, final_destination: Node, visited: List[Node], path: List[TransportPathParticipation]):
-            new_visited = visited + [current_node]
-            for edge in current_node.edges:
-                new_path = path + [edge.aperture]
-                if (edge.destination == final_destination):
-                    result.append(TransportPath(start=start_node.item, end=end_node.item, route=new_path))
-                elif (edge.destination not in visited):
-                    find_all_paths(edge.destination, final_destination, new_visited, new_path)
-
-        # we don't want to be able to leave the building and reenter it
-        # exclude the outside nodes from path
-        excluded_nodes = list(graph[s] for s in outsides)
-
-        # invoke the recursive function
-        find_all_paths(start_node, end_node, excluded_nodes, [])
-        return result
+        graph[a.origin].append((a.destination, TransportPathParticipation(a, False)))
+        graph[a.destination].append((a.origin, TransportPathParticipation(a, True)))
+    return graph
 
-    # Use this method 6 times to accumulate all routes between the 4 outside nodes, and not their exact reversals
+
+def _all_paths_between(graph, start: Side, end: Side, max_route_length: int = None) -> List[TransportPath]:
+    """
+    Every path from one outside node to another, found by a depth first search
+    The route and the visited rooms are added to and removed from as the search goes, rather than copied
+    """
     result: List[TransportPath] = []
+    route: List[TransportPathParticipation] = []
+
+    # we don't want to be able to leave the building and reenter it
+    # exclude the outside nodes from path
+    visited = set(id(s) for s in _outsides)
+
+    def find_all_paths(current_node):
+        if max_route_length is not None and len(route) >= max_route_length:
+            return
+        for destination, participation in graph[current_node]:
+            route.append(participation)
+            if destination is end:
+                result.append(TransportPath(start=start, end=end, route=list(route)))
+            elif id(destination) not in visited:
+                visited.add(id(destination))
+                find_all_paths(destination)
+                visited.remove(id(destination))
+            route.pop()
+
+    find_all_paths(start)
+    return result
 
-    # Use all combinations of 2 of the outside nodes (there are 6 combinations of 2 outside nodes: 4C2=6)
-    # We don't use permutations, because that would double-count the paths by reversing the start and end
-    for start, end in combinations(outsides, 2):
-        result.extend(all_paths_between(graph[start], graph[end]))
 
-    return result
+def _resistance(participation: TransportPathParticipation) -> float:
+    """
+    How much an aperture resists the flow along a path, these add up along the path
+    """
+    return 1.0/participation.aperture.area**2
+
+
+def _cheapest_route(graph, start, end: Side, blocked_nodes: Set[int], blocked_edges: Set[int],
+                    max_route_length: int = None) -> Optional[Tuple[float, List[TransportPathParticipation]]]:
+    """
+    The route from start to end with the least resistance (Dijkstra's algorithm)
+    which doesn't pass through the outside, the blocked nodes, or the blocked edges (both given by id)
+    If the route length is limited, a route reaching a node is only abandoned if an earlier route
+    with less resistance reached it in no more steps
+    Return the resistance and route, or None if there isn't one
+    """
+    counter = count()
+    queue = [(0.0, 0, next(counter), start, ())]
+    fewest_steps: Dict[int, int] = {}
+    while queue:
+        resistance, steps, _, node, route = heappop(queue)
+        if node is end:
+            return resistance, list(route)
+
+        # Routes come off the queue in order of resistance, so one reaching a node already reached
+        # in as few steps is no better (this includes any route which comes back to a node it passed through)
+        if id(node) in fewest_steps and fewest_steps[id(node)] <= steps:
+            continue
+        fewest_steps[id(node)] = steps
+        if max_route_length is not None and steps >= max_route_length:
+            continue
+
+        for destination, participation in graph[node]:
+            if (id(participation) in blocked_edges or id(destination) in blocked_nodes
+                    or participation.aperture.area <= 0):
+                continue
+            # we don't want to be able to leave the building and reenter it
+            if destination is not end and type(destination) is Side:
+                continue
+            if id(destination) in fewest_steps and fewest_steps[id(destination)] <= steps+1:
+                continue
+            heappush(queue, (resistance+_resistance(participation), steps+1, next(counter),
+                             destination, route+(participation,)))
+    return None
+
+
+def _route_nodes(start: Side, route: List[TransportPathParticipation]) -> List[Union[Room | Side]]:
+    """
+    The nodes visited along a route, starting with the start node
+    """
+    nodes = [start]
+    for participation in route:
+        a = participation.aperture
+        nodes.append(a.origin if participation.reversed else a.destination)
+    return nodes
+
+
+def _best_paths_between(graph, start: Side, end: Side, k: int,
+                        max_route_length: int = None) -> List[Tuple[float, List[TransportPathParticipation]]]:
+    """
+    The k routes from one outside node to another with the least resistance, in order (Yen's algorithm)
+    Each route after the first is found by following one of the routes already found to some node,
+    then taking the least resistance route from there which doesn't repeat a way already taken
+    """
+    first = _cheapest_route(graph, start, end, set(), set(), max_route_length)
+    if first is None:
+        return []
+    found = [first]
+    seen = {tuple(id(p) for p in first[1])}
+    candidates = []
+    counter = count()
+
+    while len(found) < k:
+        _, last_route = found[-1]
+        nodes = _route_nodes(start, last_route)
+        for i in range(len(last_route)):
+            root = last_route[:i]
+            root_ids = [id(p) for p in root]
+
+            # Don't take the next step of any route found which shares this root, nor go back through the root
+            blocked_edges = set(id(r[i]) for _, r in found if len(r) > i and [id(p) for p in r[:i]] == root_ids)
+            blocked_nodes = set(id(n) for n in nodes[:i])
+
+            spur = _cheapest_route(graph, nodes[i], end, blocked_nodes, blocked_edges,
+                                   None if max_route_length is None else max_route_length-i)
+            if spur is None:
+                continue
+            route = root + spur[1]
+            key = tuple(id(p) for p in route)
+            if key not in seen:
+                seen.add(key)
+                heappush(candidates, (sum(_resistance(p) for p in root)+spur[0], next(counter), route))
+
+        if not candidates:
+            break
+        resistance, _, route = heappop(candidates)
+        found.append((resistance, route))
+
+    return found
+
+
+def _best_paths(graph, max_paths: int, max_route_length: int = None) -> List[TransportPath]:
+    """
+    The paths between any two outside nodes with the largest effective area, best first
+    """
+    ranked = []
+    for pair, (start, end) in enumerate(combinations(_outsides, 2)):
+        for rank, (resistance, route) in enumerate(_best_paths_between(graph, start, end, max_paths, max_route_length)):
+            ranked.append((resistance, pair, rank, TransportPath(start=start, end=end, route=route)))
+    ranked.sort(key=lambda r: r[:3])
+    return [r[3] for r in ranked[:max_paths]]
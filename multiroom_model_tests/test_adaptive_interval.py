@@ -0,0 +1,105 @@
+import unittest
+import numpy as np
+from multiroom_model.adaptive_interval import AdaptiveInterval, schedule_change_times, next_change_after
+from multiroom_model.time_dep_value import TimeDependentValue
+from multiroom_model.room_factory import (
+    build_rooms,
+    populate_room_with_emissions_file,
+    populate_room_with_tvar_file,
+    populate_room_with_expos_file
+)
+
+
+class TestAdaptiveInterval(unittest.TestCase):
+
+    def test_invalid_bounds(self):
+        with self.assertRaises(ValueError):
+            AdaptiveInterval(min_interval=0.0, max_interval=10.0)
+        with self.assertRaises(ValueError):
+            AdaptiveInterval(min_interval=10.0, max_interval=1.0)
+        with self.assertRaises(ValueError):
+            AdaptiveInterval(min_interval=1.0, max_interval=10.0, tolerance=0.0)
+
+    def test_clamp(self):
+        controller = AdaptiveInterval(min_interval=1.0, max_interval=10.0)
+        self.assertEqual(controller.clamp(0.5), 1.0)
+        self.assertEqual(controller.clamp(5.0), 5.0)
+        self.assertEqual(controller.clamp(50.0), 10.0)
+
+    def test_next_interval(self):
+        controller = AdaptiveInterval(min_interval=1.0, max_interval=100.0, tolerance=0.1,
+                                      growth_factor=2.0, shrink_factor=0.2, safety_factor=0.9)
+
+        # No change, or a small one, grows by at most the growth factor
+        self.assertEqual(controller.next_interval(10.0, 0.0), 20.0)
+        self.assertEqual(controller.next_interval(10.0, 0.001), 20.0)
+
+        # Otherwise the interval is scaled towards the tolerance
+        self.assertAlmostEqual(controller.next_interval(10.0, 0.09), 10.0)
+        self.assertAlmostEqual(controller.next_interval(10.0, 0.18), 5.0)
+
+        # But never shrinks by more than the shrink factor, or beyond the bounds
+        self.assertAlmostEqual(controller.next_interval(10.0, 100.0), 2.0)
+        self.assertEqual(controller.next_interval(2.0, 100.0), 1.0)
+        self.assertEqual(controller.next_interval(80.0, 0.0), 100.0)
+
+    def test_next_change_after(self):
+        change_times = np.array([0.0, 3600.0, 7200.0])
+        self.assertEqual(next_change_after(change_times, -1.0), 0.0)
+        self.assertEqual(next_change_after(change_times, 0.0), 3600.0)
+        self.assertEqual(next_change_after(change_times, 100.0), 3600.0)
+        self.assertIsNone(next_change_after(change_times, 7200.0))
+
+
+class TestScheduleChangeTimes(unittest.TestCase):
+
+    def setUp(self):
+        self.rooms = build_rooms("config_rooms/mr_tcon_room_params.csv")
+        for i, room in self.rooms.items():
+            populate_room_with_emissions_file(room, f"config_rooms/mr_room_emis_params_{i}.csv")
+            populate_room_with_tvar_file(room, f"config_rooms/mr_tvar_room_params_{i}.csv")
+            populate_room_with_expos_file(room, f"config_rooms/mr_tvar_expos_params_{i}.csv")
+        self.rooms = list(self.rooms.values())
+
+    def test_change_times(self):
+        change_times = schedule_change_times(self.rooms)
+
+        self.assertTrue(np.all(np.diff(change_times) > 0))
+
+        # The times at which the step-wise values change are included
+        for room in self.rooms:
+            for value in (room.light_switch, room.n_adults, room.n_children):
+                times, values = value.times(), value.values()
+                for t, before, after in zip(times[1:], values[:-1], values[1:]):
+                    if after != before:
+                        self.assertIn(t, change_times)
+
+            # and the start and end of every emission
+            for emission in room.emissions.values():
+                for start, end, _ in emission.values():
+                    self.assertIn(start, change_times)
+                    self.assertIn(end, change_times)
+
+    def test_flat_hourly_schedule(self):
+        room = self.rooms[0]
+        room.emissions = {}
+        hours = [3600.0*h for h in range(25)]
+        room.light_switch = TimeDependentValue([(t, 0) for t in hours], continuous=False)
+        room.n_children = TimeDependentValue([(t, 0) for t in hours], continuous=False)
+        room.n_adults = TimeDependentValue([(t, 2 if 7200 <= t < 10800 else 0) for t in hours], continuous=False)
+
+        # Only the hours at which the number of adults changes, not every hour of the schedules
+        self.assertEqual(list(schedule_change_times([room])), [7200.0, 10800.0])
+
+    def test_continuous_values_are_ignored(self):
+        room = self.rooms[0]
+        room.emissions = {}
+        room.light_switch = room.temp_in_kelvin
+        room.n_adults = room.temp_in_kelvin
+        room.n_children = room.temp_in_kelvin
+
+        self.assertEqual(len(schedule_change_times([room])), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
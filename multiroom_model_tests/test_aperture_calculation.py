@@ -5,6 +5,7 @@ from unittest.mock import Mock, patch
 from multiroom_model.aperture_calculations import (
     transport_path_contains_room,
     room_has_outdoor_aperture,
+    is_room_cross_ventilated,
     transport_path_angle_in_radians,
     transport_path_windspeed,
     flow_advection,
@@ -102,18 +103,19 @@ class TestApertureCalculationsWithWind(unittest.TestCase):
         room2 = MockRoom()
         room3 = MockRoom()
         room4 = MockRoom()
-        aperture1 = Aperture(origin=room1, destination=Side.Front)
-        aperture2 = Aperture(origin=room1, destination=room2)
-        aperture3 = Aperture(origin=room2, destination=room3)
-        aperture4 = Aperture(origin=room3, destination=room4)
-        aperture5 = Aperture(origin=room4, destination=Side.Back)
+        aperture1 = Aperture(origin=room1, destination=Side.Front, area=1)
+        aperture2 = Aperture(origin=room1, destination=room2, area=2)
+        aperture3 = Aperture(origin=room2, destination=room3, area=3)
+        aperture4 = Aperture(origin=room3, destination=room4, area=4)
+        aperture5 = Aperture(origin=room4, destination=Side.Back, area=5)
 
         self.rooms = [room1, room2, room3, room4]
         self.apertures = [aperture1, aperture2, aperture3, aperture4, aperture5]
         self.transport_path = paths_through_building(self.rooms, self.apertures)[0]
 
         self.calculations = list(
-            ApertureCalculation(a, [self.transport_path], self.apertures, building_direction_in_radians= math.radians(0))
+            ApertureCalculation(a, [self.transport_path], self.apertures, building_direction_in_radians= math.radians(0),
+                                air_density=1.2, building_pressure_coefficients=(0.3, -0.2))
             for a in self.apertures)
 
     def test_calculation_construction(self):
@@ -130,148 +132,34 @@ class TestApertureCalculationsWithWind(unittest.TestCase):
             self.assertFalse(c.has_advection_flow(wind_speed=10, wind_direction=math.pi/2.0))
             self.assertFalse(c.has_advection_flow(wind_speed=10, wind_direction=-math.pi/2.0))
 
-    @patch('multiroom_model.aperture_calculations.flow_advection')
-    def test_advection_flow_rate(self, mock):
-        mock.return_value = 1.234
-
-
-        with self.subTest("flow angle 0 start"):
-            rate = self.calculations[0].advection_flow_rate(10.0, 0)
-            self.assertAlmostEqual(rate, 1.234)
-
-            args, _ = mock.call_args
-            windspeed, _, Cd, _, _ = args
-
-            self.assertAlmostEqual(windspeed, -10)
-            self.assertEqual(Cd, 0.7/(1+1))
-
-        with self.subTest("flow angle 45 start"):
-            rate = self.calculations[0].advection_flow_rate(10.0, math.pi/4.0)
-            self.assertAlmostEqual(rate, 1.234)
-
-            args, _ = mock.call_args
-            windspeed, _, Cd, _, _ = args
-
-            self.assertAlmostEqual(windspeed, -10/math.sqrt(2))
-            self.assertEqual(Cd, 0.7/(1+1))
-
-        with self.subTest("flow angle 135 start"):
-            rate = self.calculations[0].advection_flow_rate(10.0, 3.0*math.pi/4.0)
-            self.assertAlmostEqual(rate, -1.234)
-
-            args, _ = mock.call_args
-            windspeed, _, Cd, _, _ = args
-
-            self.assertAlmostEqual(windspeed, 10/math.sqrt(2))
-            self.assertEqual(Cd, 0.7/(1+0))
-
-        with self.subTest("flow angle 90 start"):
-            rate = self.calculations[0].advection_flow_rate(10.0, math.pi/2.0)
-            self.assertAlmostEqual(rate, -1.234)
-
-            args, _ = mock.call_args
-            windspeed, _, Cd, _, _ = args
-
-            self.assertAlmostEqual(windspeed, 0)
-            self.assertEqual(Cd, 0.7/(1+0))
-
-        with self.subTest("flow angle 180 start"):
-            rate = self.calculations[0].advection_flow_rate(10.0, math.pi)
-            self.assertAlmostEqual(rate, -1.234)
-
-            args, _ = mock.call_args
-            windspeed, _, Cd, _, _ = args
-
-            self.assertEqual(windspeed, 10)
-            self.assertEqual(Cd, 0.7/(1+0))
-
-        with self.subTest("flow angle 0 mid"):
-            mock.return_value = 1.234
-
-            rate = self.calculations[2].advection_flow_rate(10.0, 0)
-            self.assertAlmostEqual(rate, -1.234)
-
-            args, _ = mock.call_args
-            windspeed, _, Cd, _, _ = args
-
-            self.assertEqual(windspeed, -10)
-            self.assertEqual(Cd, 0.7/(1+0.5))
-
-        with self.subTest("flow angle 45 mid"):
-            rate = self.calculations[2].advection_flow_rate(10.0, math.pi/4.0)
-            self.assertAlmostEqual(rate, -1.234)
-
-            args, _ = mock.call_args
-            windspeed, _, Cd, _, _ = args
-
-            self.assertAlmostEqual(windspeed, -10/math.sqrt(2))
-            self.assertEqual(Cd, 0.7/(1+0.5))
-
-        with self.subTest("flow angle 90 mid"):
-            rate = self.calculations[2].advection_flow_rate(10.0, math.pi/2.0)
-            self.assertAlmostEqual(rate, 1.234)
-
-            args, _ = mock.call_args
-            windspeed, _, Cd, _, _ = args
-
-            self.assertAlmostEqual(windspeed, 0)
-            self.assertEqual(Cd, 0.7/(1+0.5))
-
-        with self.subTest("flow angle 180 mid"):
-            rate = self.calculations[2].advection_flow_rate(10.0, math.pi)
-            self.assertAlmostEqual(rate, 1.234)
-
-            args, _ = mock.call_args
-            windspeed, _, Cd, _, _ = args
-
-            self.assertEqual(windspeed, 10)
-            self.assertEqual(Cd, 0.7/(1+0.5))
-
-        with self.subTest("flow angle 0 end"):
-            mock.return_value = 1.234
-
-            rate = self.calculations[4].advection_flow_rate(10.0, 0)
-            self.assertAlmostEqual(rate, -1.234)
-
-            args, _ = mock.call_args
-            windspeed, _, Cd, _, _ = args
-
-            self.assertEqual(windspeed, -10)
-            self.assertEqual(Cd, 0.7/(1+0))
-
-        with self.subTest("flow angle 45 end"):
-            rate = self.calculations[4].advection_flow_rate(10.0, math.pi/4.0)
-            self.assertAlmostEqual(rate, -1.234)
-
-            args, _ = mock.call_args
-            windspeed, _, Cd, _, _ = args
-
-            self.assertAlmostEqual(windspeed, -10/math.sqrt(2))
-            self.assertEqual(Cd, 0.7/(1+0))
-
-        with self.subTest("flow angle 90 end"):
-            rate = self.calculations[4].advection_flow_rate(10.0, math.pi/2.0)
-            self.assertAlmostEqual(rate, 1.234)
-
-            args, _ = mock.call_args
-            windspeed, _, Cd, _, _ = args
-
-            self.assertAlmostEqual(windspeed, 0)
-            self.assertEqual(Cd, 0.7/(1+1))
-
-        with self.subTest("flow angle 180 end"):
-            rate = self.calculations[4].advection_flow_rate(10.0, math.pi)
-            self.assertAlmostEqual(rate, 1.234)
-
-            args, _ = mock.call_args
-            windspeed, _, Cd, _, _ = args
-
-            self.assertEqual(windspeed, 10)
-            self.assertEqual(Cd, 0.7/(1+1))
-
-    @patch('multiroom_model.aperture_calculations.flow_advection')
-    def test_advection_flow_rate_2(self, mock):
-        mock.return_value = 1.234
+    def test_advection_flow_rate(self):
+        # The sign of the flow, and the wind speed and discharge coefficient of its only contribution
+        cases = [
+            ("flow angle 0 start", 0, 0.0, 1, -10, 0.7/(1+1)),
+            ("flow angle 45 start", 0, math.pi/4.0, 1, -10/math.sqrt(2), 0.7/(1+1)),
+            ("flow angle 135 start", 0, 3.0*math.pi/4.0, -1, 10/math.sqrt(2), 0.7/(1+0)),
+            ("flow angle 90 start", 0, math.pi/2.0, -1, 0, 0.7/(1+0)),
+            ("flow angle 180 start", 0, math.pi, -1, 10, 0.7/(1+0)),
+            ("flow angle 0 mid", 2, 0.0, -1, -10, 0.7/(1+0.5)),
+            ("flow angle 45 mid", 2, math.pi/4.0, -1, -10/math.sqrt(2), 0.7/(1+0.5)),
+            ("flow angle 90 mid", 2, math.pi/2.0, 1, 0, 0.7/(1+0.5)),
+            ("flow angle 180 mid", 2, math.pi, 1, 10, 0.7/(1+0.5)),
+            ("flow angle 0 end", 4, 0.0, -1, -10, 0.7/(1+0)),
+            ("flow angle 45 end", 4, math.pi/4.0, -1, -10/math.sqrt(2), 0.7/(1+0)),
+            ("flow angle 90 end", 4, math.pi/2.0, 1, 0, 0.7/(1+1)),
+            ("flow angle 180 end", 4, math.pi, 1, 10, 0.7/(1+1)),
+        ]
+        for name, index, angle, sign, windspeed, Cd in cases:
+            with self.subTest(name):
+                calculation = self.calculations[index]
+                rate = calculation.advection_flow_rate(10.0, angle)
+
+                # The same as the scalar flow_advection gives for the contribution
+                expected = flow_advection(windspeed, calculation.aperture.area, Cd,
+                                          calculation.building_pressure_coefficients, calculation.air_density)
+                self.assertAlmostEqual(rate, sign*expected)
+
+    def test_advection_flow_rate_2(self):
 
         def test(aperture_index, angle, position):
             reversed_sign = -1 if aperture_index==0 else 1
@@ -281,14 +169,10 @@ class TestApertureCalculationsWithWind(unittest.TestCase):
             expected_wind = 10 * math.cos(angle-math.pi)
 
             wind_sign = -1 if expected_wind<0 else 1
-                
-            self.assertAlmostEqual(rate, reversed_sign*wind_sign*1.234)
 
-            args, _ = mock.call_args
-            windspeed, _, Cd, _, _ = args
-
-            self.assertEqual(windspeed, expected_wind)
-            self.assertEqual(Cd, 0.7/(1+position))
+            expected = flow_advection(expected_wind, calculation.aperture.area, 0.7/(1+position),
+                                      calculation.building_pressure_coefficients, calculation.air_density)
+            self.assertAlmostEqual(rate, reversed_sign*wind_sign*expected)
 
 
         with self.subTest("flow angle 0 start"):
@@ -368,48 +252,35 @@ class TestApertureCalculationsWithWind(unittest.TestCase):
         self.assertEqual(self.calculations[2].exchange_flow_rate(wind_speed=10, wind_direction=math.pi/2), 1.234)
         self.assertEqual(mock.call_args[0][0], 4)
 
-    @patch('multiroom_model.aperture_calculations.flow_advection')
     @patch('multiroom_model.aperture_calculations.flow_exchange')
-    def test_trans_matrix_contributions(self, mock_flow_exchange, mock_flow_advection):
-        mock_flow_advection.side_effect = lambda *args, **kwargs: args[0]*1.234
+    def test_trans_matrix_contributions(self, mock_flow_exchange):
         mock_flow_exchange.return_value = 0.123
 
-        with self.subTest("positive advection flow"):
-            result = self.calculations[0].trans_matrix_contributions(1,0)
+        def advection(calculation, Cd):
+            return flow_advection(1, calculation.aperture.area, Cd,
+                                  calculation.building_pressure_coefficients, calculation.air_density)
 
-            windspeed, _, Cd, _, _ = mock_flow_advection.call_args[0]
-            self.assertEqual(windspeed, -1)
-            self.assertEqual(Cd, 0.7/(1+1))
+        with self.subTest("wind from the back"):
+            # The air leaves through the front window, out of its room, and enters through the back window
+            result = self.calculations[0].trans_matrix_contributions(1,0)
 
-            self.assertEqual(result.from_1_to_2, 0)
-            self.assertEqual(result.from_2_to_1, 1.234)
+            self.assertAlmostEqual(result.from_1_to_2, advection(self.calculations[0], 0.7/(1+1)))
+            self.assertEqual(result.from_2_to_1, 0)
 
             result = self.calculations[4].trans_matrix_contributions(1,0)
 
-            windspeed, _, Cd, _, _ = mock_flow_advection.call_args[0]
-            self.assertEqual(windspeed, -1)
-            self.assertEqual(Cd, 0.7/(1+0))
-
-            self.assertEqual(result.from_1_to_2, 1.234)
-            self.assertEqual(result.from_2_to_1, 0)
+            self.assertEqual(result.from_1_to_2, 0)
+            self.assertAlmostEqual(result.from_2_to_1, advection(self.calculations[4], 0.7/(1+0)))
 
-        with self.subTest("negative advection flow"):
+        with self.subTest("wind from the front"):
             result = self.calculations[0].trans_matrix_contributions(1, math.pi)
 
-            windspeed, _, Cd, _, _ = mock_flow_advection.call_args[0]
-            self.assertEqual(windspeed, 1)
-            self.assertEqual(Cd, 0.7/(1+0))
-
             self.assertEqual(result.from_1_to_2, 0)
-            self.assertEqual(result.from_2_to_1, 1.234)
+            self.assertAlmostEqual(result.from_2_to_1, advection(self.calculations[0], 0.7/(1+0)))
 
             result = self.calculations[4].trans_matrix_contributions(1, math.pi)
 
-            windspeed, _, Cd, _, _ = mock_flow_advection.call_args[0]
-            self.assertEqual(windspeed, 1)
-            self.assertEqual(Cd, 0.7/(1+1))
-
-            self.assertEqual(result.from_1_to_2, 1.234)
+            self.assertAlmostEqual(result.from_1_to_2, advection(self.calculations[4], 0.7/(1+1)))
             self.assertEqual(result.from_2_to_1, 0)
 
         with self.subTest("exchange flow"):
@@ -443,3 +314,53 @@ class TestApertureCalculationsWithWind(unittest.TestCase):
             self.assertEqual(catagory, 2)
             self.assertEqual(result.from_1_to_2, 0.123)
             self.assertEqual(result.from_2_to_1, 0.123)
+
+
+class TestApertureCalculationsWithManyPaths(unittest.TestCase):
+    """
+    The precomputed geometry should give the same results as working along each transport path
+    """
+    def setUp(self):
+        self.rooms = [MockRoom() for _ in range(4)]
+        r = self.rooms
+        self.apertures = [
+            Aperture(origin=r[0], destination=Side.Front, area=1),
+            Aperture(origin=r[0], destination=r[1], area=2),
+            Aperture(origin=r[0], destination=r[2], area=3),
+            Aperture(origin=r[1], destination=r[3], area=4),
+            Aperture(origin=r[2], destination=r[3], area=5),
+            Aperture(origin=r[3], destination=Side.Back, area=6),
+            Aperture(origin=r[1], destination=Side.Left, area=7),
+            Aperture(origin=r[2], destination=Side.Right, area=8),
+        ]
+        self.transport_paths = paths_through_building(self.rooms, self.apertures)
+        self.building_direction = math.radians(30)
+        self.calculations = [
+            ApertureCalculation(a, self.transport_paths, self.apertures, self.building_direction, 1.2, (0.3, -0.2))
+            for a in self.apertures]
+
+    def expected_advection_flow_rate(self, c: ApertureCalculation, wind_speed, wind_direction):
+        total = 0
+        for contribution in c.contributions:
+            path_windspeed = transport_path_windspeed(contribution.path, wind_speed,
+                                                      wind_direction, self.building_direction)
+            position = contribution.position_down_path if path_windspeed > 0 else 1.0-contribution.position_down_path
+            sign = (-1 if path_windspeed < 0 else 1) * (-1 if contribution.reversed else 1)
+            total += sign * flow_advection(path_windspeed, c.aperture.area, 0.7/(1.0 + position),
+                                           (0.3, -0.2), 1.2)
+        return total
+
+    def test_matches_path_by_path_calculation(self):
+        for c in self.calculations:
+            self.assertGreater(len(c.contributions), 0)
+            for wind_direction in range(0, 360, 15):
+                wind_direction_in_radians = math.radians(wind_direction)
+                with self.subTest(wind_direction=wind_direction):
+                    self.assertAlmostEqual(c.advection_flow_rate(3.0, wind_direction_in_radians),
+                                           self.expected_advection_flow_rate(c, 3.0, wind_direction_in_radians))
+                    cross_ventilated = any(
+                        is_room_cross_ventilated(room, self.transport_paths, 3.0,
+                                                 wind_direction_in_radians, self.building_direction)
+                        for room in (c.aperture.origin, c.aperture.destination))
+                    self.assertEqual(c.exchange_category(3.0, wind_direction_in_radians) == 1, cross_ventilated)
+                    self.assertFalse(c.has_advection_flow(0, wind_direction_in_radians))
@@ -87,6 +87,21 @@ class TestApertureFlowCalculations(unittest.TestCase):
             pass
             # self.assertIn(s, calculator.indoor_var_list)
 
+    def test_trans_var_indices(self):
+        columns = self.dataframe.columns
+        indoor_var_list, outdoor_var_list = ApertureFlowCalculator.get_trans_vars(columns)
+        indoor_index, outdoor_index = ApertureFlowCalculator.trans_var_indices(columns)
+
+        self.assertEqual(list(columns[indoor_index]), indoor_var_list)
+        self.assertEqual(list(columns[outdoor_index]), outdoor_var_list)
+
+        # The classification is cached, and the cached values can't be altered by a caller
+        self.assertIs(ApertureFlowCalculator.trans_var_indices(list(columns))[0], indoor_index)
+        with self.assertRaises(ValueError):
+            indoor_index[0] = 0
+        indoor_var_list.clear()
+        self.assertEqual(ApertureFlowCalculator.get_trans_vars(columns)[0], list(columns[indoor_index]))
+
     def test_exchange_transfer_between_rooms_with_matching_concentration(self):
         calculator = ApertureFlowCalculator(self.dataframe.columns)
 
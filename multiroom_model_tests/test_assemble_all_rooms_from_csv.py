@@ -21,6 +21,9 @@ class CustomEncoder(json.JSONEncoder):
         
         if isinstance(obj, np.int64):
             return int(obj)
+
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
         
         return super().default(obj)
 
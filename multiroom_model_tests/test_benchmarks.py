@@ -0,0 +1,81 @@
+import unittest
+import os
+import tempfile
+from multiroom_model.benchmarks import (
+    BenchmarkResult,
+    BuildingBenchmarks,
+    time_repeated,
+    synthetic_building,
+    history_record,
+    append_history,
+    read_history,
+    find_regressions
+)
+from multiroom_model.transport_paths import paths_through_building
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def record(self, machine="a", **bests):
+        return {'machine': machine, 'cpu_count': 4,
+                'results': {name: {'best': best, 'median': best, 'repeat': 3} for name, best in bests.items()}}
+
+    def test_time_repeated(self):
+        calls = []
+        result = time_repeated("append", lambda: calls.append(1), 3)
+        self.assertEqual(result.name, "append")
+        self.assertEqual(len(result.seconds), 3)
+        # A quick function is called many times in each repeat
+        self.assertGreater(len(calls), 3)
+        self.assertLessEqual(result.best, result.median)
+
+    def test_history(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, "history.jsonl")
+            self.assertEqual(read_history(filename), [])
+
+            record = history_record([BenchmarkResult("x", [2.0, 1.0, 3.0])])
+            append_history(filename, record)
+            append_history(filename, record)
+
+            history = read_history(filename)
+            self.assertEqual(len(history), 2)
+            self.assertEqual(history[0]['results']['x'], {'best': 1.0, 'median': 2.0, 'repeat': 3})
+            self.assertEqual(history[0]['machine'], record['machine'])
+
+    def test_regressions(self):
+        history = [self.record(x=1.0, y=1.0), self.record(x=1.1, y=1.0), self.record(x=0.9),
+                   self.record("b", x=0.1, y=0.1)]
+
+        # The baseline of x is 1.0, the median of its times on the same machine
+        self.assertEqual(find_regressions(self.record(x=1.2, y=1.0), history), {})
+        self.assertEqual(find_regressions(self.record(x=1.3, y=1.0), history), {'x': (1.3, 1.0)})
+        self.assertEqual(find_regressions(self.record(x=1.3, y=1.0), history, tolerance=0.5), {})
+
+        # Only the latest times make up the baseline
+        self.assertEqual(find_regressions(self.record(x=1.05), history, tolerance=0, window=1), {'x': (1.05, 0.9)})
+
+        # A new benchmark, or one from a new machine, has no baseline to be slower than
+        self.assertEqual(find_regressions(self.record(z=100.0), history), {})
+        self.assertEqual(find_regressions(self.record("c", x=100.0), history), {})
+
+    def test_synthetic_building(self):
+        rooms, apertures = synthetic_building(3, 4)
+        self.assertEqual(len(rooms), 12)
+        # Every pair of neighbours is joined, and every room of the first and last rows has a window
+        self.assertEqual(len([a for a in apertures if a.destination in rooms]), 3*3+2*4)
+        self.assertGreater(len(paths_through_building(rooms, apertures)), 0)
+
+    def test_building_benchmarks(self):
+        results = BuildingBenchmarks().run(["get_trans_vars", "apply_wind"], repeat=2)
+        self.assertEqual([r.name for r in results], ["get_trans_vars", "assemble_trans_matrix", "apply_wind"])
+        for r in results:
+            self.assertEqual(len(r.seconds), 2)
+            self.assertGreater(r.best, 0)
+
+        with self.assertRaises(ValueError):
+            BuildingBenchmarks().run(["unknown"])
+
+
+if __name__ == '__main__':
+    unittest.main()
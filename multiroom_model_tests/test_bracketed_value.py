@@ -0,0 +1,75 @@
+import unittest
+import numpy as np
+from multiroom_model.bracketed_value import TimeBracketedValue
+
+
+class TestTimeBracketedValue(unittest.TestCase):
+    def setUp(self):
+        self.tbv = TimeBracketedValue([
+            (3600.0, 7200.0, 5.0),
+            (7200.0, 10800.0, 6.0),
+            (36000.0, 39600.0, 7.0),
+        ])
+
+    def test_values(self):
+        self.assertEqual(self.tbv.values(), [(3600.0, 7200.0, 5.0), (7200.0, 10800.0, 6.0), (36000.0, 39600.0, 7.0)])
+
+    def test_value_at_time(self):
+        self.assertEqual(self.tbv.value_at_time(0.0), 0)
+        self.assertEqual(self.tbv.value_at_time(3600.0), 5.0)
+        self.assertEqual(self.tbv.value_at_time(5000.0), 5.0)
+        self.assertEqual(self.tbv.value_at_time(10000.0), 6.0)
+        self.assertEqual(self.tbv.value_at_time(20000.0), 0)
+        self.assertEqual(self.tbv.value_at_time(50000.0), 0)
+
+    def test_boundary_shared_by_brackets_uses_the_first(self):
+        self.assertEqual(self.tbv.value_at_time(7200.0), 5.0)
+
+    def test_last_bracket(self):
+        self.assertEqual(self.tbv.value_at_time(36000.0), 7.0)
+        self.assertEqual(self.tbv.value_at_time(38000.0), 7.0)
+        self.assertEqual(self.tbv.value_at_time(39600.0), 7.0)
+
+    def test_single_bracket(self):
+        tbv = TimeBracketedValue([(46800, 50400, 5.0e8)])
+        self.assertEqual(tbv.value_at_time(48000), 5.0e8)
+        self.assertEqual(tbv.value_at_time(40000), 0)
+
+    def test_invalid_brackets_raise(self):
+        with self.assertRaises(Exception):
+            TimeBracketedValue([])
+        with self.assertRaises(Exception) as context:
+            TimeBracketedValue([(0.0, 10.0, 1.0), (30.0, 20.0, 1.0)])
+        self.assertIn("times were not in order", str(context.exception).lower())
+
+    def test_values_at_times(self):
+        times = np.array([0.0, 3600.0, 5000.0, 7200.0, 7201.0, 10800.0, 20000.0, 36000.0, 39600.0, 50000.0])
+        np.testing.assert_array_equal(self.tbv.values_at_times(times), [self.tbv.value_at_time(t) for t in times])
+
+    def test_unsorted_and_overlapping_brackets(self):
+        unsorted = TimeBracketedValue([(20.0, 30.0, 2.0), (0.0, 10.0, 1.0)])
+        self.assertEqual(unsorted.value_at_time(5.0), 1.0)
+        self.assertEqual(unsorted.value_at_time(25.0), 2.0)
+
+        # The first bracket provided takes precedence where they overlap
+        overlapping = TimeBracketedValue([(5.0, 30.0, 2.0), (0.0, 10.0, 1.0)])
+        times = np.array([0.0, 5.0, 8.0, 10.0, 20.0, 31.0])
+        np.testing.assert_array_equal(overlapping.values_at_times(times), [1.0, 2.0, 2.0, 2.0, 2.0, 0.0])
+
+    def test_next_boundary_after(self):
+        self.assertEqual(self.tbv.next_boundary_after(0.0), 3600.0)
+        self.assertEqual(self.tbv.next_boundary_after(3600.0), 7200.0)
+        self.assertEqual(self.tbv.next_boundary_after(7199.5), 7200.0)
+        self.assertEqual(self.tbv.next_boundary_after(10800.0), 36000.0)
+        self.assertIsNone(self.tbv.next_boundary_after(39600.0))
+        np.testing.assert_array_equal(self.tbv.boundaries(), [3600.0, 7200.0, 10800.0, 36000.0, 39600.0])
+
+    def test_many_brackets(self):
+        starts = np.arange(0.0, 7*24*3600.0, 120.0)
+        tbv = TimeBracketedValue([(s, s+60.0, float(i)) for i, s in enumerate(starts)])
+        grid = np.linspace(-10.0, starts[-1]+100.0, 2001)
+        np.testing.assert_array_equal(tbv.values_at_times(grid), [tbv.value_at_time(t) for t in grid])
+
+
+if __name__ == '__main__':
+    unittest.main()
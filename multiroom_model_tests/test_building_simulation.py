@@ -1,5 +1,10 @@
 import unittest
+import copy
 import math
+import os
+import tempfile
+import numpy as np
+import pandas as pd
 from multiroom_model.aperture_factory import build_apertures_from_double_definition, build_wind_definition
 from multiroom_model.transport_paths import paths_through_building
 from multiroom_model.room_factory import (
@@ -11,6 +16,11 @@ from multiroom_model.room_factory import (
 from multiroom_model.aperture_calculations import ApertureCalculation, Side
 from multiroom_model.simulation import Simulation
 from multiroom_model.global_settings import GlobalSettings
+from multiroom_model.adaptive_interval import AdaptiveInterval
+from multiroom_model.checkpoint import load_checkpoint, checkpoint_results_folder
+from multiroom_model.result_sinks import ChunkedResultSink, read_chunked_results
+from multiroom_model.diagnostics import Diagnostics
+from multiroom_model.time_dep_value import TimeDependentValue
 
 
 class TestBuildingSimulation(unittest.TestCase):
@@ -116,3 +126,189 @@ class TestBuildingSimulation(unittest.TestCase):
             t_interval=3.0,
             init_conditions=initial_conditions
         )
+
+    def test_running_with_coupled_transport(self):
+
+        initial_conditions = dict([(r, 'initial_concentrations.txt') for r in self.rooms])
+
+        simulation = Simulation(self.global_settings, self.rooms, self.apertures, self.wind_definition,
+                                coupled_transport=True)
+
+        result = simulation.run(
+            t0=0.0,
+            t_total=25,
+            t_interval=3.0,
+            init_conditions=initial_conditions
+        )
+
+        for r in self.rooms:
+            self.assertEqual(result[r].index[-1], 25.0)
+            self.assertFalse((result[r][['O3', 'NO', 'NO2']] < 0).any().any())
+
+    def test_running_with_diagnostics(self):
+
+        initial_conditions = dict([(r, 'initial_concentrations.txt') for r in self.rooms])
+
+        for coupled_transport in (False, True):
+            diagnostics = Diagnostics()
+            simulation = Simulation(self.global_settings, self.rooms, self.apertures, self.wind_definition,
+                                    coupled_transport=coupled_transport, diagnostics=diagnostics)
+            result = simulation.run(
+                t0=0.0,
+                t_total=25,
+                t_interval=3.0,
+                init_conditions=initial_conditions
+            )
+
+            summary = diagnostics.summary()
+            self.assertEqual(len(summary['negative_concentration_intervals']), len(self.rooms))
+            self.assertTrue((summary['negative_concentration_intervals'] <= 8).all())
+            self.assertTrue((summary['negative_concentrations'] >= summary['negative_concentration_intervals']).all())
+
+            # The load of every interval is kept, 9 intervals of 3s (the last one shorter) to reach 25s
+            self.assertEqual(summary['room_seconds'].shape, (9, len(self.rooms)))
+            self.assertTrue((summary['room_seconds'] >= 0).all())
+            self.assertTrue(0 <= summary['parallel_efficiency'] <= 1)
+
+            # The coupled transport can't give negative concentrations
+            if coupled_transport:
+                self.assertFalse(summary['negative_concentrations'].any())
+
+    def test_running_with_adaptive_interval(self):
+
+        initial_conditions = dict([(r, 'initial_concentrations.txt') for r in self.rooms])
+
+        result = self.simulation.run(
+            t0=0.0,
+            t_total=25,
+            t_interval=3.0,
+            init_conditions=initial_conditions,
+            adaptive_interval=AdaptiveInterval(min_interval=1.0, max_interval=10.0)
+        )
+
+        for r in self.rooms:
+            self.assertEqual(result[r].index[-1], 25.0)
+            self.assertTrue(result[r].index.is_monotonic_increasing)
+
+    def test_adaptive_interval_grows_through_flat_schedule(self):
+
+        # A room whose step-wise inputs are given every hour, but never change
+        room = copy.deepcopy(self.rooms[0])
+        room.emissions = {}
+        hours = [3600.0*h for h in range(25)]
+        room.light_switch = TimeDependentValue([(t, 0) for t in hours], continuous=False)
+        room.n_adults = TimeDependentValue([(t, 0) for t in hours], continuous=False)
+        room.n_children = TimeDependentValue([(t, 0) for t in hours], continuous=False)
+
+        diagnostics = Diagnostics()
+        simulation = Simulation(self.global_settings, [room], [], diagnostics=diagnostics)
+        simulation.run(
+            t0=3500.0,
+            t_total=400,
+            t_interval=1.0,
+            init_conditions={room: 'initial_concentrations.txt'},
+            adaptive_interval=AdaptiveInterval(min_interval=1.0, max_interval=256.0)
+        )
+
+        # Passing the hour at 3600s doesn't send the interval back to the minimum
+        steps = np.diff(np.append(diagnostics.summary()['interval_times'], 3900.0))
+        self.assertTrue(np.all(np.diff(steps) >= 0))
+        self.assertGreaterEqual(steps.max(), 128.0)
+
+    def test_adaptive_interval_stays_within_bounds_before_the_end(self):
+
+        room = copy.deepcopy(self.rooms[0])
+        diagnostics = Diagnostics()
+        simulation = Simulation(self.global_settings, [room], [], diagnostics=diagnostics)
+        adaptive_interval = AdaptiveInterval(min_interval=1.0, max_interval=1.5)
+        result = simulation.run(
+            t0=0.0,
+            t_total=3.5,
+            t_interval=1.5,
+            init_conditions={room: 'initial_concentrations.txt'},
+            adaptive_interval=adaptive_interval
+        )
+
+        # The last 2s is too long for one interval, and would leave less than the minimum after the longest,
+        # so it is split into two intervals of 1s
+        self.assertEqual(result[room].index[-1], 3.5)
+        steps = np.diff(np.append(diagnostics.summary()['interval_times'], 3.5))
+        np.testing.assert_allclose(steps, [1.5, 1.0, 1.0])
+
+    def test_resume_from_checkpoint(self):
+
+        initial_conditions = dict([(r, 'initial_concentrations.txt') for r in self.rooms])
+
+        with tempfile.TemporaryDirectory() as folder:
+            checkpoint_file = os.path.join(folder, "checkpoint.npz")
+
+            result = self.simulation.run(
+                t0=0.0,
+                t_total=25,
+                t_interval=3.0,
+                init_conditions=initial_conditions,
+                checkpoint_file=checkpoint_file,
+                checkpoint_every=2
+            )
+
+            # The last checkpoint is from before the end of the run, continuing from it gives the same results
+            checkpoint = load_checkpoint(checkpoint_file)
+            self.assertLess(checkpoint.solved_time, 25.0)
+            resumed = self.simulation.resume(checkpoint_file)
+
+            # The results were saved beside the checkpoint, not in it
+            self.assertNotIn('room_0_values', checkpoint.sink_state)
+            self.assertTrue(os.path.isdir(checkpoint_results_folder(checkpoint_file)))
+
+        for r in self.rooms:
+            pd.testing.assert_frame_equal(resumed[r], result[r])
+
+    def test_checkpoints_are_saved_on_the_clock(self):
+
+        initial_conditions = dict([(r, 'initial_concentrations.txt') for r in self.rooms])
+
+        with tempfile.TemporaryDirectory() as folder:
+            checkpoint_file = os.path.join(folder, "checkpoint.npz")
+
+            # By default a checkpoint is saved every 10 minutes, which a short run doesn't reach
+            self.simulation.run(t0=0.0, t_total=25, t_interval=3.0, init_conditions=initial_conditions,
+                                checkpoint_file=checkpoint_file)
+            self.assertFalse(os.path.exists(checkpoint_file))
+
+            self.simulation.run(t0=0.0, t_total=25, t_interval=3.0, init_conditions=initial_conditions,
+                                checkpoint_file=checkpoint_file, checkpoint_seconds=0.0)
+            self.assertEqual(load_checkpoint(checkpoint_file).solved_time, 24.0)
+
+    def test_running_with_chunked_result_sink(self):
+
+        initial_conditions = dict([(r, 'initial_concentrations.txt') for r in self.rooms])
+
+        expected = self.simulation.run(
+            t0=0.0,
+            t_total=25,
+            t_interval=3.0,
+            init_conditions=initial_conditions
+        )
+
+        with tempfile.TemporaryDirectory() as folder:
+            checkpoint_file = os.path.join(folder, "checkpoint.npz")
+            results_folder = os.path.join(folder, "results")
+
+            self.simulation.run(
+                t0=0.0,
+                t_total=25,
+                t_interval=3.0,
+                init_conditions=initial_conditions,
+                checkpoint_file=checkpoint_file,
+                checkpoint_every=3,
+                result_sink=ChunkedResultSink(results_folder, chunk_rows=5)
+            )
+            result = read_chunked_results(results_folder)
+
+            # Resuming from the last checkpoint rewrites the results after it
+            self.simulation.resume(checkpoint_file, result_sink=ChunkedResultSink(results_folder, chunk_rows=5))
+            resumed = read_chunked_results(results_folder)
+
+        for i, r in enumerate(self.rooms):
+            pd.testing.assert_frame_equal(result[f"room_{i}"], expected[r])
+            pd.testing.assert_frame_equal(resumed[f"room_{i}"], expected[r])
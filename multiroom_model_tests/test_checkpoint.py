@@ -0,0 +1,66 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from multiroom_model.adaptive_interval import AdaptiveInterval
+from multiroom_model.checkpoint import Checkpoint, save_checkpoint, load_checkpoint
+
+
+class TestCheckpoint(unittest.TestCase):
+    def interval(self, t0, t1, offset=0.0):
+        times = [float(t) for t in range(t0, t1+1)]
+        return pd.DataFrame({
+            'O3': [offset + 1.0e12 + t/3 for t in times],
+            'NO2': [offset + 2.0e11 - t/7 for t in times],
+            'adults': [2 for t in times],
+        }, index=pd.Index(times, name='t'))
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.folder.name, "checkpoint.npz")
+        self.room_results = [self.interval(9, 12, offset=room) for room in range(3)]
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_round_trip(self):
+        adaptive_interval = AdaptiveInterval(min_interval=1.0, max_interval=60.0, tolerance=0.01)
+        sink_state = {'last_step': np.array([1.0, np.nan, 3.0]), 'chunk_counts': np.array([1, 2, 3])}
+        save_checkpoint(self.filename, Checkpoint.from_room_results(12.0, 100.0, 1.0/3.0, adaptive_interval,
+                                                                    self.room_results, 'ChunkedResultSink', sink_state))
+
+        checkpoint = load_checkpoint(self.filename)
+
+        self.assertEqual(checkpoint.solved_time, 12.0)
+        self.assertEqual(checkpoint.t_final, 100.0)
+        self.assertEqual(checkpoint.t_interval, 1.0/3.0)
+        self.assertEqual(checkpoint.adaptive_interval, adaptive_interval)
+        self.assertEqual(checkpoint.sink_type, 'ChunkedResultSink')
+        self.assertEqual(sorted(checkpoint.sink_state.keys()), ['chunk_counts', 'last_step'])
+        np.testing.assert_array_equal(checkpoint.sink_state['last_step'], sink_state['last_step'])
+        np.testing.assert_array_equal(checkpoint.sink_state['chunk_counts'], sink_state['chunk_counts'])
+
+    def test_room_states(self):
+        save_checkpoint(self.filename, Checkpoint.from_room_results(12.0, 100.0, 3.0, None,
+                                                                    self.room_results, 'MemoryResultSink', {}))
+
+        checkpoint = load_checkpoint(self.filename)
+
+        self.assertIsNone(checkpoint.adaptive_interval)
+        self.assertEqual(checkpoint.sink_state, {})
+        for original, state in zip(self.room_results, checkpoint.room_states()):
+            pd.testing.assert_frame_equal(state, original.iloc[-1:].astype(float))
+
+    def test_overwrite_leaves_no_temporary_files(self):
+        save_checkpoint(self.filename, Checkpoint.from_room_results(9.0, 100.0, 3.0, None,
+                                                                    self.room_results, 'MemoryResultSink', {}))
+        save_checkpoint(self.filename, Checkpoint.from_room_results(12.0, 100.0, 3.0, None,
+                                                                    self.room_results, 'MemoryResultSink', {}))
+
+        self.assertEqual(os.listdir(self.folder.name), ["checkpoint.npz"])
+        self.assertEqual(load_checkpoint(self.filename).solved_time, 12.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import numpy as np
+from multiroom_model.coupled_transport import transport_rate_matrix, transport_propagators, propagate_transport
+
+
+class TestCoupledTransport(unittest.TestCase):
+    def setUp(self):
+        # Outdoors, then 3 rooms, the wind blows in through room 1 and out through room 3
+        self.trans_matrix = np.array([
+            [0.0, 2.5, 0.0, 0.0],
+            [0.0, 0.0, 2.0, 0.5],
+            [0.0, 0.0, 0.0, 2.0],
+            [2.5, 0.0, 0.0, 0.0],
+        ])
+        self.volumes = [10.0, 20.0, 40.0]
+        self.concentrations = np.array([
+            [1.0e12, 5.0],
+            [2.0e12, 0.0],
+            [0.0, 7.0],
+        ])
+        self.outdoor = np.array([
+            [3.0e11, 1.0],
+            [0.0, 0.0],
+            [3.0e11, 1.0],
+        ])
+
+    def test_rate_matrix(self):
+        A, b = transport_rate_matrix(self.trans_matrix, self.volumes)
+
+        self.assertEqual(A.shape, (3, 3))
+        np.testing.assert_allclose(A[0], [-2.5/10, 0.0, 0.0])
+        np.testing.assert_allclose(A[1], [2.0/20, -2.0/20, 0.0])
+        np.testing.assert_allclose(A[2], [0.5/40, 2.0/40, -2.5/40])
+        np.testing.assert_allclose(b, [2.5/10, 0.0, 0.0])
+
+    def test_closed_building_conserves_mass(self):
+        closed = self.trans_matrix.copy()
+        closed[0, :] = 0
+        closed[:, 0] = 0
+
+        result = propagate_transport(closed, self.volumes, 3600.0, self.concentrations, self.outdoor)
+
+        volumes = np.array(self.volumes)[:, None]
+        np.testing.assert_allclose((result*volumes).sum(axis=0), (self.concentrations*volumes).sum(axis=0))
+
+    def test_long_interval_stays_non_negative(self):
+        result = propagate_transport(self.trans_matrix, self.volumes, 1.0e6, self.concentrations, self.outdoor)
+        self.assertTrue((result >= 0).all())
+
+        # After a very long time every room reaches the concentration of the air blowing in
+        np.testing.assert_allclose(result, np.array([[3.0e11, 1.0]]*3), rtol=1.0e-6)
+
+    def test_short_interval_matches_explicit_step(self):
+        delta_time = 1.0e-3
+        A, b = transport_rate_matrix(self.trans_matrix, self.volumes)
+        explicit = self.concentrations + delta_time*(A @ self.concentrations + b[:, None]*self.outdoor)
+
+        result = propagate_transport(self.trans_matrix, self.volumes, delta_time, self.concentrations, self.outdoor)
+
+        np.testing.assert_allclose(result-self.concentrations, explicit-self.concentrations, rtol=1.0e-3)
+
+    def test_zero_interval_is_identity(self):
+        A, _ = transport_rate_matrix(self.trans_matrix, self.volumes)
+        E, F = transport_propagators(A, 0.0)
+        np.testing.assert_allclose(E, np.eye(3))
+        np.testing.assert_allclose(F, np.zeros((3, 3)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+import logging
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+from multiroom_model.diagnostics import Diagnostics
+
+
+class TestDiagnostics(unittest.TestCase):
+
+    def setUp(self):
+        self.columns = pd.Index(['O3', 'NO', 'NO2', 'HONO', 'O3OUT'])
+        self.logger = logging.getLogger("test_diagnostics")
+        self.logger.setLevel(logging.INFO)
+
+    def negative(self, *rooms_species):
+        negative = np.zeros((3, len(self.columns)), dtype=bool)
+        for room, species in rooms_species:
+            negative[room, self.columns.get_loc(species)] = True
+        return negative
+
+    def test_invalid_sampling(self):
+        with self.assertRaises(ValueError):
+            Diagnostics(sample_every=0)
+
+    def test_negative_concentrations_are_counted(self):
+        diagnostics = Diagnostics(self.logger)
+        diagnostics.open(3)
+
+        with self.assertLogs(self.logger, logging.WARNING) as logs:
+            diagnostics.record_negative_concentrations(10.0, self.negative((0, 'NO'), (0, 'NO2'), (2, 'O3')),
+                                                       self.columns)
+            diagnostics.record_negative_concentrations(20.0, self.negative((2, 'HONO')), self.columns)
+
+        self.assertEqual(len(logs.records), 2)
+        self.assertIn("time 10.0 in 2 room(s)", logs.output[0])
+        self.assertIn("room 0: NO, NO2; room 2: O3", logs.output[0])
+
+        summary = diagnostics.summary()
+        np.testing.assert_array_equal(summary['negative_concentration_intervals'], [1, 0, 2])
+        np.testing.assert_array_equal(summary['negative_concentrations'], [2, 0, 2])
+
+        with self.assertLogs(self.logger, logging.INFO) as logs:
+            diagnostics.close()
+        self.assertIn("in 2 interval(s)", logs.output[0])
+        self.assertIn("room 2: 2 interval(s), 2 concentration(s)", logs.output[0])
+
+        # Opening again starts a new count
+        diagnostics.open(3)
+        self.assertFalse(diagnostics.summary()['negative_concentrations'].any())
+
+    def test_sampling(self):
+        diagnostics = Diagnostics(self.logger, sample_every=3)
+        diagnostics.open(3)
+
+        with self.assertLogs(self.logger, logging.WARNING) as logs:
+            for t in range(7):
+                diagnostics.record_negative_concentrations(t, self.negative((1, 'O3')), self.columns)
+
+        # The 1st, 4th and 7th intervals are reported, all are counted
+        self.assertEqual(len(logs.records), 3)
+        self.assertEqual(diagnostics.summary()['negative_concentration_intervals'][1], 7)
+
+    def test_species_list_is_limited(self):
+        diagnostics = Diagnostics(self.logger, max_species_listed=2)
+        diagnostics.open(3)
+        with self.assertLogs(self.logger, logging.WARNING) as logs:
+            diagnostics.record_negative_concentrations(
+                0.0, self.negative((0, 'O3'), (0, 'NO'), (0, 'NO2'), (0, 'HONO')), self.columns)
+        self.assertIn("room 0: O3, NO and 2 more", logs.output[0])
+
+    def test_nothing_to_report(self):
+        diagnostics = Diagnostics(self.logger)
+        diagnostics.open(3)
+        with patch.object(self.logger, 'info') as info, patch.object(self.logger, 'warning') as warning:
+            diagnostics.close()
+        info.assert_not_called()
+        warning.assert_not_called()
+
+    def test_interval_load(self):
+        diagnostics = Diagnostics(self.logger)
+        diagnostics.open(3)
+        diagnostics.record_interval_load(0.0, 2.0, np.array([1.0, 2.0, 0.5]), 2)
+        diagnostics.record_interval_load(3.0, 1.0, np.array([1.0, 0.5, 0.5]), 2)
+
+        summary = diagnostics.summary()
+        np.testing.assert_array_equal(summary['interval_times'], [0.0, 3.0])
+        np.testing.assert_array_equal(summary['room_seconds'], [[1.0, 2.0, 0.5], [1.0, 0.5, 0.5]])
+        # 2 workers for 2s are 4s of work, of which 3.5s were spent solving rooms
+        np.testing.assert_allclose(summary['idle_seconds'], [0.5, 0.0])
+        self.assertAlmostEqual(float(summary['parallel_efficiency']), 5.5/6.0)
+
+        with self.assertLogs(self.logger, logging.INFO) as logs:
+            diagnostics.close()
+        self.assertIn("over 2 interval(s), with a parallel efficiency of 92%", logs.output[0])
+
+        # Opening again forgets the intervals
+        diagnostics.open(3)
+        self.assertEqual(diagnostics.summary()['room_seconds'].shape, (0, 3))
+
+    def test_incomplete_room(self):
+        diagnostics = Diagnostics(self.logger)
+        with self.assertLogs(self.logger, logging.ERROR) as logs:
+            diagnostics.record_incomplete_room(4, 12.5, 20.0)
+        self.assertIn("room 4, only ran to time 12.5, expected 20.0", logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
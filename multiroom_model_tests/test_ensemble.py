@@ -0,0 +1,172 @@
+import unittest
+import copy
+import math
+import os
+import tempfile
+from multiroom_model.aperture_factory import build_apertures_from_double_definition, build_wind_definition
+from multiroom_model.room_factory import (
+    build_rooms,
+    populate_room_with_emissions_file,
+    populate_room_with_tvar_file,
+    populate_room_with_expos_file
+)
+from multiroom_model.time_dep_value import TimeDependentValue
+from multiroom_model.wind_definition import WindDefinition
+from multiroom_model.simulation import Simulation
+from multiroom_model.global_settings import GlobalSettings
+from multiroom_model.ensemble import Ensemble, Scenario
+from multiroom_model.executors import SerialExecutor, ProcessExecutor, ThreadExecutor
+from multiroom_model.diagnostics import Diagnostics
+from multiroom_model.trans_matrix_cache import TransMatrixCache
+from multiroom_model.result_sinks import ChunkedResultSink, read_chunked_results
+
+
+class TestEnsemble(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rooms = build_rooms("config_rooms/mr_tcon_room_params.csv")
+        for i, room in rooms.items():
+            populate_room_with_emissions_file(room, f"config_rooms/mr_room_emis_params_{i}.csv")
+            populate_room_with_tvar_file(room, f"config_rooms/mr_tvar_room_params_{i}.csv")
+            populate_room_with_expos_file(room, f"config_rooms/mr_tvar_expos_params_{i}.csv")
+
+        cls.apertures = build_apertures_from_double_definition("config_rooms/mr_tcon_building.csv", rooms)
+        cls.wind_definition = build_wind_definition("config_rooms/mr_tvar_wind_params.csv")
+        cls.rooms = list(rooms.values())
+        cls.init_conditions = dict((r, 'initial_concentrations.txt') for r in cls.rooms)
+
+        cls.global_settings = GlobalSettings(
+            filename='chem_mech/mcm_subset.fac',
+            INCHEM_additional=False,
+            particles=True,
+            constrained_file=None,
+            output_folder=None,
+            dt=1,
+            H2O2_dep=False,
+            O3_dep=False,
+            custom=False,
+            custom_filename=None,
+            diurnal=True,
+            city='London_urban',
+            date='21-06-2020',
+            lat=45.4,
+            path=None,
+            reactions_output=False,
+            building_direction_in_radians=math.radians(180),
+            air_density=1.2,
+            upwind_pressure_coefficient=0.3,
+            downwind_pressure_coefficient=-0.2
+        )
+        cls.ensemble = Ensemble(cls.global_settings, cls.rooms, cls.apertures, cls.wind_definition, cpu_count=2)
+
+    def expected(self, rooms, apertures, wind_definition):
+        simulation = Simulation(self.global_settings, rooms, apertures, wind_definition, cpu_count=1)
+        return simulation.run(dict((r, 'initial_concentrations.txt') for r in rooms), 36000, 9, 3.0)
+
+    def test_scenarios_match_separate_simulations(self):
+        day = [0, 86400]
+        calm = WindDefinition(TimeDependentValue([(t, 0.0) for t in day], continuous=False),
+                              TimeDependentValue([(t, 0.0) for t in day], continuous=False))
+
+        # The same building with more people in it, which is one of its time dependent inputs
+        crowded_rooms, crowded_apertures = copy.deepcopy((self.rooms, self.apertures))
+        for r in crowded_rooms:
+            r.n_adults = TimeDependentValue([(t, 4) for t in day], continuous=False)
+
+        scenarios = [Scenario("default"),
+                     Scenario("calm", wind_definition=calm),
+                     Scenario("crowded", rooms=crowded_rooms,
+                              init_conditions=dict((r, 'initial_concentrations.txt') for r in crowded_rooms))]
+        results = self.ensemble.run(scenarios, 36000, 9, 3.0, init_conditions=self.init_conditions)
+
+        self.assertEqual(set(results.keys()), {"default", "calm", "crowded"})
+        for name, rooms, apertures, wind_definition in [
+                ("default", self.rooms, self.apertures, self.wind_definition),
+                ("calm", self.rooms, self.apertures, calm),
+                ("crowded", crowded_rooms, crowded_apertures, self.wind_definition)]:
+            with self.subTest(scenario=name):
+                expected = self.expected(rooms, apertures, wind_definition)
+                self.assertEqual(list(results[name].keys()), rooms)
+                for r in rooms:
+                    self.assertTrue(expected[r].equals(results[name][r]))
+
+    def test_variant_rooms_use_the_initial_conditions_of_the_building(self):
+        day = [0, 86400]
+        crowded_rooms, crowded_apertures = copy.deepcopy((self.rooms, self.apertures))
+        for r in crowded_rooms:
+            r.n_adults = TimeDependentValue([(t, 4) for t in day], continuous=False)
+
+        results = self.ensemble.run([Scenario("crowded", rooms=crowded_rooms)], 36000, 9, 3.0,
+                                    init_conditions=self.init_conditions)
+
+        expected = self.expected(crowded_rooms, crowded_apertures, self.wind_definition)
+        self.assertEqual(list(results["crowded"].keys()), crowded_rooms)
+        for r in crowded_rooms:
+            self.assertTrue(expected[r].equals(results["crowded"][r]))
+
+    def test_scenarios_stream_to_their_own_sinks(self):
+        with tempfile.TemporaryDirectory() as folder:
+            scenarios = [Scenario(name, result_sink=ChunkedResultSink(os.path.join(folder, name)))
+                         for name in ["first", "second"]]
+            results = self.ensemble.run(scenarios, 36000, 6, 3.0, init_conditions=self.init_conditions)
+
+            for name in ["first", "second"]:
+                self.assertEqual(len(results[name]), len(self.rooms))
+                stored = read_chunked_results(os.path.join(folder, name))
+                self.assertEqual(len(stored), len(self.rooms))
+
+    def test_executor_is_reused_across_runs(self):
+        scenarios = [Scenario("first"), Scenario("second")]
+        expected = self.ensemble.run(scenarios, 36000, 6, 3.0, init_conditions=self.init_conditions)
+
+        for executor in [SerialExecutor(), ProcessExecutor(2), ThreadExecutor(2)]:
+            with self.subTest(executor=type(executor).__name__), executor:
+                ensemble = Ensemble(self.global_settings, self.rooms, self.apertures, self.wind_definition,
+                                    executor=executor)
+                for _ in range(2):
+                    results = ensemble.run(scenarios, 36000, 6, 3.0, init_conditions=self.init_conditions)
+                    for name in ["first", "second"]:
+                        for r in self.rooms:
+                            self.assertTrue(expected[name][r].equals(results[name][r]))
+                # The ensemble left the executor open
+                self.assertEqual(executor.map(abs, [-2]), [2])
+
+    def test_variants_have_their_own_state(self):
+        diagnostics = Diagnostics(sample_every=3)
+        trans_matrix_cache = TransMatrixCache(max_size=8, wind_speed_tolerance=0.5)
+        simulation = Simulation(self.global_settings, self.rooms, self.apertures, self.wind_definition, cpu_count=1,
+                                trans_matrix_cache=trans_matrix_cache, diagnostics=diagnostics)
+
+        variant = simulation.with_inputs()
+        variant.run(self.init_conditions, 36000, 6, 3.0)
+
+        # The variant's run is not recorded in the diagnostics or cache of the simulation it varies
+        self.assertEqual(len(diagnostics.summary()['interval_times']), 0)
+        self.assertEqual(trans_matrix_cache.hits + trans_matrix_cache.misses, 0)
+        self.assertEqual(len(trans_matrix_cache._matrices), 0)
+
+        # but has its own, with the same settings
+        self.assertIsNot(variant._diagnostics, diagnostics)
+        self.assertEqual(variant._diagnostics.sample_every, 3)
+        self.assertGreater(len(variant._diagnostics.summary()['interval_times']), 0)
+        self.assertIsNot(variant._trans_matrix_cache, trans_matrix_cache)
+        self.assertEqual(variant._trans_matrix_cache.max_size, 8)
+        self.assertEqual(variant._trans_matrix_cache.wind_speed_tolerance, 0.5)
+        self.assertGreater(variant._trans_matrix_cache.misses, 0)
+
+    def test_rooms_must_match_the_building(self):
+        smaller_rooms = copy.deepcopy(self.rooms)
+        smaller_rooms[0].volume_in_m3 /= 2
+        with self.assertRaises(ValueError):
+            self.ensemble.simulation.with_inputs(smaller_rooms)
+        with self.assertRaises(ValueError):
+            self.ensemble.simulation.with_inputs(self.rooms[1:])
+
+    def test_names_must_be_unique(self):
+        with self.assertRaises(ValueError):
+            self.ensemble.run([Scenario("a"), Scenario("a")], 36000, 3, 3.0, init_conditions=self.init_conditions)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+import unittest
+import gc
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from multiroom_model.executors import Executor, SerialExecutor, ProcessExecutor, ThreadExecutor, FuturesExecutor
+from multiroom_model.global_settings import GlobalSettings
+from multiroom_model.simulation import Simulation
+from multiroom_model import room_inchempy_evolver
+from multiroom_model.room_inchempy_evolver import RoomInchemPyEvolver, main_class_lock
+from multiroom_model.room_factory import (
+    build_rooms,
+    populate_room_with_emissions_file,
+    populate_room_with_tvar_file,
+    populate_room_with_expos_file
+)
+
+
+def square(x):
+    return x*x
+
+
+def add(x, y):
+    return x+y
+
+
+def process_id(_):
+    return os.getpid()
+
+
+class MainClassRecordingOverlaps:
+    """
+    Stands in for a generated InChemPy class, recording the most rooms which ran it at once
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running = 0
+        self.most_running = 0
+
+    def run(self, *args):
+        with self._lock:
+            self._running += 1
+            self.most_running = max(self.most_running, self._running)
+        time.sleep(0.02)
+        with self._lock:
+            self._running -= 1
+        return pd.DataFrame(), pd.DataFrame()
+
+
+class SendingExecutor(SerialExecutor):
+    """
+    Runs the tasks in this process as though they were sent to another, counting the evolvers sent with them
+    """
+    sends_tasks = True
+
+    def __init__(self):
+        self.evolvers_sent = 0
+
+    def imap_unordered(self, function, iterable):
+        tasks = list(iterable)
+        self.evolvers_sent += sum(t[1] is not None for t in tasks)
+        return super().imap_unordered(function, tasks)
+
+
+class TestExecutors(unittest.TestCase):
+
+    def executors(self):
+        return [SerialExecutor(), ProcessExecutor(2, preload_modules=[]), ThreadExecutor(2),
+                FuturesExecutor(ThreadPoolExecutor(2), 2)]
+
+    def test_executors_run_tasks(self):
+        for executor in self.executors():
+            with self.subTest(executor=type(executor).__name__), executor:
+                self.assertEqual(executor.map(square, [1, 2, 3]), [1, 4, 9])
+                self.assertEqual(executor.starmap(add, [(1, 2), (3, 4)]), [3, 7])
+                self.assertEqual(sorted(executor.imap_unordered(square, [3, 1, 2])), [1, 4, 9])
+
+    def test_workers(self):
+        for executor, workers in zip(self.executors(), [1, 2, 2, 2]):
+            with executor:
+                self.assertEqual(executor.workers, workers)
+
+    def test_processes_are_reused(self):
+        with ProcessExecutor(2) as executor:
+            first = set(executor.map(process_id, range(8)))
+            second = set(executor.map(process_id, range(8)))
+        self.assertLessEqual(len(first | second), 2)
+        self.assertNotIn(os.getpid(), first)
+
+    def test_incomplete_executor_cannot_be_created(self):
+        class MapOnlyExecutor(Executor):
+            def map(self, function, iterable):
+                return [function(a) for a in iterable]
+
+        with self.assertRaises(TypeError):
+            MapOnlyExecutor()
+
+    def test_failure_is_raised(self):
+        for executor in self.executors():
+            with self.subTest(executor=type(executor).__name__):
+                with self.assertRaises(TypeError), executor:
+                    executor.map(square, ["a"])
+
+
+class TestSimulationWithExecutor(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rooms = build_rooms("config_rooms/mr_tcon_room_params.csv")
+        for i, room in rooms.items():
+            populate_room_with_emissions_file(room, f"config_rooms/mr_room_emis_params_{i}.csv")
+            populate_room_with_tvar_file(room, f"config_rooms/mr_tvar_room_params_{i}.csv")
+            populate_room_with_expos_file(room, f"config_rooms/mr_tvar_expos_params_{i}.csv")
+        cls.rooms = [rooms[2], rooms[4], rooms[5]]
+        cls.global_settings = GlobalSettings(
+            filename='chem_mech/mcm_subset.fac',
+            INCHEM_additional=False,
+            particles=True,
+            constrained_file=None,
+            output_folder=None,
+            dt=1.0,
+            H2O2_dep=False,
+            O3_dep=False,
+            custom=False,
+            custom_filename=None,
+            diurnal=True,
+            city='London_urban',
+            date='21-06-2020',
+            lat=45.4,
+            path=None,
+            reactions_output=False
+        )
+        cls.init_conditions = dict([(r, 'initial_concentrations.txt') for r in cls.rooms])
+
+    def test_threads_take_turns_with_a_shared_class(self):
+        shared = MainClassRecordingOverlaps()
+        evolvers = [RoomInchemPyEvolver(r, self.global_settings, inchem=shared) for r in self.rooms]
+
+        with ThreadExecutor(len(evolvers)) as executor:
+            executor.map(lambda e: e.run(0.0, 10.0, initial_text_file='initial_concentrations.txt'), evolvers)
+
+        self.assertEqual(shared.most_running, 1)
+
+    def test_locks_are_forgotten_with_their_class(self):
+        locks = len(room_inchempy_evolver._main_class_locks)
+        shared = MainClassRecordingOverlaps()
+        lock = main_class_lock(shared)
+        self.assertIs(main_class_lock(shared), lock)
+        self.assertIsNot(main_class_lock(MainClassRecordingOverlaps()), lock)
+
+        del shared
+        gc.collect()
+        self.assertEqual(len(room_inchempy_evolver._main_class_locks), locks)
+
+    def test_executor_is_reused_across_runs(self):
+        expected = Simulation(self.global_settings, self.rooms, []).run(
+            t0=0.0, t_total=10, t_interval=3.0, init_conditions=self.init_conditions)
+
+        for executor in [SerialExecutor(), ProcessExecutor(2), ThreadExecutor(2)]:
+            with self.subTest(executor=type(executor).__name__), executor:
+                simulation = Simulation(self.global_settings, self.rooms, [], executor=executor)
+                for _ in range(2):
+                    result = simulation.run(t0=0.0, t_total=10, t_interval=3.0, init_conditions=self.init_conditions)
+                    for r in self.rooms:
+                        self.assertTrue(expected[r].equals(result[r]))
+                # The simulation left the executor open
+                self.assertEqual(executor.map(square, [2]), [4])
+
+    def test_evolvers_are_only_sent_once(self):
+        expected = Simulation(self.global_settings, self.rooms, [], cpu_count=1).run(
+            t0=0.0, t_total=10, t_interval=3.0, init_conditions=self.init_conditions)
+
+        executor = SendingExecutor()
+        simulation = Simulation(self.global_settings, self.rooms, [], executor=executor)
+        for _ in range(2):
+            result = simulation.run(t0=0.0, t_total=10, t_interval=3.0, init_conditions=self.init_conditions)
+            for r in self.rooms:
+                self.assertTrue(expected[r].equals(result[r]))
+        self.assertEqual(executor.evolvers_sent, len(self.rooms))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from multiroom_model.exposure_metrics import (
+    ExposureMetrics,
+    ExposureMetricsSink,
+    exposure_metrics,
+    exposure_metrics_from_reader
+)
+from multiroom_model.result_sinks import MemoryResultSink
+from multiroom_model.results_format import write_results, ResultsReader
+from multiroom_model.room_chemistry import RoomChemistry
+from multiroom_model.time_dep_value import TimeDependentValue
+
+
+class TestExposureMetrics(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        times = np.arange(0.0, 600.0, 10.0)
+        self.n_adults = TimeDependentValue([(0.0, 0), (100.0, 2), (300.0, 0), (600.0, 1)], continuous=False)
+        self.n_children = TimeDependentValue([(0.0, 1), (200.0, 0), (600.0, 0)], continuous=False)
+
+        # O3 around the guidelines, 1.0e12 molecule cm-3 is 81 ug/m3
+        self.results = pd.DataFrame({
+            'O3': rng.uniform(0.5e12, 1.5e12, len(times)),
+            'NO2': rng.uniform(0.0, 0.5e12, len(times)),
+            'tspx': rng.uniform(0.0, 30.0, len(times)),
+            'adults': self.n_adults.values_at_times(times),
+            'children': self.n_children.values_at_times(times),
+        }, index=times)
+
+    def room(self):
+        room = RoomChemistry.__new__(RoomChemistry)
+        room.n_adults = self.n_adults
+        room.n_children = self.n_children
+        return room
+
+    def value(self, table, species, metric, room='Room 1'):
+        is_species = table['Species'].isna() if species is None else table['Species'] == species
+        selected = table[is_species & (table['Metrics'] == metric)]
+        self.assertEqual(len(selected), 1, f"{species} {metric}")
+        return selected[room].iloc[0]
+
+    def test_metrics_match_direct_calculation(self):
+        table = exposure_metrics({'Room 1': self.results})
+
+        o3 = self.results['O3']*2/2.46e10
+        tspx = self.results['tspx']
+        adults = self.results['adults'] > 0
+        children = self.results['children'] > 0
+        steps = len(self.results.index)
+
+        self.assertAlmostEqual(self.value(table, None, "Mean number of adults in the room"), self.results['adults'].mean())
+        self.assertAlmostEqual(self.value(table, 'O3', "Mean concentration (ug/m3)"), o3.mean())
+        self.assertAlmostEqual(self.value(table, 'O3', "Mean concentration when adults are in the room (ug/m3)"),
+                               o3[adults].mean())
+        self.assertAlmostEqual(self.value(table, 'O3', "Max concentration when children are in the room (ug/m3)"),
+                               o3[children].max())
+        self.assertAlmostEqual(self.value(table, 'tspx', "Max concentration (ug/m3)"), tspx.max())
+        self.assertAlmostEqual(
+            self.value(table, 'O3', "Time exceeding WHO guideline of 60 ug/m3 (Peak season) (%)"),
+            100*(o3 > 60).sum()/steps)
+        self.assertAlmostEqual(
+            self.value(table, 'O3', "Time exceeding WHO guideline of 100 ug/m3 when adults are in the room (8-hour) (%)"),
+            100*((o3 > 100) & adults).sum()/steps)
+        self.assertAlmostEqual(
+            self.value(table, 'NO2', "Time exceeding WHO guideline of 25 ug/m3 when children are in the room (24-hour) (%)"),
+            100*((self.results['NO2']*2/2.46e10 > 25) & children).sum()/steps)
+
+        # tspx has no guideline, the numbers of people are not species
+        self.assertEqual(len(table[table['Species'] == 'tspx']), 6)
+        self.assertFalse(table['Species'].isin(['adults', 'children']).any())
+
+    def test_each_room_uses_its_own_steps(self):
+        other = self.results.iloc[:10]
+        table = exposure_metrics({'Room 1': self.results, 'Room 2': other})
+
+        o3 = other['O3']*2/2.46e10
+        self.assertAlmostEqual(self.value(table, 'O3', "Time exceeding WHO guideline of 60 ug/m3 (Peak season) (%)", 'Room 2'),
+                               100*(o3 > 60).sum()/10)
+        self.assertAlmostEqual(self.value(table, 'O3', "Mean concentration (ug/m3)", 'Room 2'), o3.mean())
+
+    def test_schedules_of_the_rooms(self):
+        without_people = self.results.drop(columns=['adults', 'children'])
+
+        with self.assertRaises(ValueError):
+            exposure_metrics({'Room 1': without_people})
+
+        table = exposure_metrics({'Room 1': without_people}, rooms={'Room 1': self.room()})
+        pd.testing.assert_frame_equal(table, exposure_metrics({'Room 1': self.results}))
+
+    def test_incremental_updates(self):
+        variables = ['O3', 'NO2', 'tspx']
+        metrics = ExposureMetrics(variables)
+        for start in range(0, len(self.results.index), 7):
+            block = self.results.iloc[start:start+7]
+            metrics.update(block[variables].to_numpy(), block['adults'].to_numpy(), block['children'].to_numpy())
+
+        expected = exposure_metrics({'Room 1': self.results}, variables=variables)
+        table = metrics.table().rename(columns={'Value': 'Room 1'})
+        pd.testing.assert_frame_equal(table, expected, check_exact=False, rtol=1e-12)
+
+    def test_metrics_from_reader(self):
+        with tempfile.TemporaryDirectory() as folder:
+            write_results(folder, {'Room 1': self.results})
+            table = exposure_metrics_from_reader(ResultsReader(folder), chunk_rows=9)
+
+        pd.testing.assert_frame_equal(table, exposure_metrics({'Room 1': self.results}), check_exact=False, rtol=1e-12)
+
+    def test_sink(self):
+        sink = ExposureMetricsSink(rooms=[self.room()], variables=['O3', 'NO2'], results_sink=MemoryResultSink())
+        sink.open(1)
+        for start in range(0, len(self.results.index), 6):
+            sink.append(0, self.results.iloc[start:start+6])
+
+        # The metrics are available before the run finishes, the state can be restored
+        state = sink.checkpoint_state()
+        restored = ExposureMetricsSink(rooms=[self.room()], variables=['O3', 'NO2'], results_sink=MemoryResultSink())
+        restored.restore(1, state)
+
+        expected = exposure_metrics({'Room 1': self.results}, variables=['O3', 'NO2'])
+        pd.testing.assert_frame_equal(sink.metrics(), expected, check_exact=False, rtol=1e-12)
+        pd.testing.assert_frame_equal(restored.metrics(), expected, check_exact=False, rtol=1e-12)
+        pd.testing.assert_frame_equal(restored.close()[0], self.results)
+
+
+if __name__ == '__main__':
+    unittest.main()
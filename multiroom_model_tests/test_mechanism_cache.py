@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from multiroom_model import mechanism_cache
+from multiroom_model.mechanism_cache import cached_main_class, mechanism_cache_key
+
+
+class TestMechanismCache(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.arguments = dict(
+            filename='chem_mech/mcm_subset.fac',
+            INCHEM_additional=False,
+            particles=False,
+            volume=30.0,
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_key_depends_on_arguments(self):
+        key = mechanism_cache_key(self.arguments)
+        self.assertEqual(key, mechanism_cache_key(dict(self.arguments)))
+        self.assertNotEqual(key, mechanism_cache_key(dict(self.arguments, volume=31.0)))
+        self.assertNotEqual(key, mechanism_cache_key(dict(self.arguments, particles=True)))
+
+    def test_key_depends_on_file_content(self):
+        filename = os.path.join(self.folder, 'mechanism.fac')
+        shutil.copyfile('chem_mech/mcm_subset.fac', filename)
+        arguments = dict(self.arguments, filename=filename)
+        key = mechanism_cache_key(arguments)
+
+        with open(filename, 'a') as f:
+            f.write("\n* a comment\n")
+
+        self.assertNotEqual(key, mechanism_cache_key(arguments))
+
+    def test_file_is_read_once_while_unchanged(self):
+        filename = os.path.join(self.folder, 'mechanism.fac')
+        shutil.copyfile('chem_mech/mcm_subset.fac', filename)
+
+        with patch('multiroom_model.mechanism_cache._hash_file', wraps=mechanism_cache._hash_file) as hash_file:
+            keys = [mechanism_cache_key(dict(self.arguments, filename=filename, volume=v)) for v in (10.0, 20.0, 30.0)]
+            self.assertEqual(len(set(keys)), 3)
+            self.assertEqual([c.args[1] for c in hash_file.call_args_list].count(os.path.abspath(filename)), 1)
+
+            with open(filename, 'a') as f:
+                f.write("\n* a comment\n")
+            self.assertNotEqual(keys[0], mechanism_cache_key(dict(self.arguments, filename=filename, volume=10.0)))
+            self.assertEqual([c.args[1] for c in hash_file.call_args_list].count(os.path.abspath(filename)), 2)
+
+    def test_cached_class_is_reused(self):
+        cache_folder = os.path.join(self.folder, 'cache')
+
+        built = cached_main_class(cache_folder, **self.arguments)
+        cache_file = os.path.join(cache_folder, f"{mechanism_cache_key(self.arguments)}.pkl")
+        self.assertTrue(os.path.isfile(cache_file))
+        modified_time = os.path.getmtime(cache_file)
+
+        loaded = cached_main_class(cache_folder, **self.arguments)
+        self.assertEqual(built.species, loaded.species)
+        self.assertEqual(modified_time, os.path.getmtime(cache_file))
+
+    def test_unreadable_cache_file_is_rebuilt(self):
+        cache_folder = os.path.join(self.folder, 'cache')
+        os.makedirs(cache_folder)
+        cache_file = os.path.join(cache_folder, f"{mechanism_cache_key(self.arguments)}.pkl")
+        with open(cache_file, 'wb') as f:
+            f.write(b"not a pickle")
+
+        built = cached_main_class(cache_folder, **self.arguments)
+        loaded = cached_main_class(cache_folder, **self.arguments)
+        self.assertEqual(built.species, loaded.species)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import unittest
+import math
+import random
+import numpy as np
+from multiroom_model.aperture import Aperture, Side
+from multiroom_model.pressure_network import PressureNetwork
+
+
+class MockRoom:
+    pass
+
+
+class TestPressureNetwork(unittest.TestCase):
+
+    def grid_building(self, rows, columns, seed=0):
+        """
+        Rooms in a grid, each joined to its neighbours, with windows on every outside wall
+        """
+        rng = random.Random(seed)
+        rooms = [MockRoom() for n in range(rows*columns)]
+        apertures = []
+        for y in range(rows):
+            for x in range(columns):
+                room = rooms[y*columns+x]
+                if x+1 < columns:
+                    apertures.append(Aperture(room, rooms[y*columns+x+1], rng.uniform(0.5, 3)))
+                if y+1 < rows:
+                    apertures.append(Aperture(room, rooms[(y+1)*columns+x], rng.uniform(0.5, 3)))
+                if y == 0:
+                    apertures.append(Aperture(room, Side.Front, rng.uniform(0.5, 3)))
+                if y == rows-1:
+                    apertures.append(Aperture(room, Side.Back, rng.uniform(0.5, 3)))
+                if x == 0:
+                    apertures.append(Aperture(room, Side.Left, rng.uniform(0.5, 3)))
+                if x == columns-1:
+                    apertures.append(Aperture(room, Side.Right, rng.uniform(0.5, 3)))
+        return rooms, apertures
+
+    def test_invalid_settings(self):
+        rooms = [MockRoom()]
+        with self.assertRaises(ValueError):
+            PressureNetwork(rooms, [Aperture(rooms[0], Side.Front, 1)], air_density=0)
+        with self.assertRaises(Exception):
+            PressureNetwork(rooms, [Aperture(rooms[0], Side.Front, 1)], air_density=1.2,
+                            building_pressure_coefficients=(-0.2, 0.3))
+        with self.assertRaises(ValueError):
+            PressureNetwork(rooms, [Aperture(rooms[0], Side.Unknown, 1)], air_density=1.2)
+
+    def test_side_pressure_coefficients(self):
+        rooms = [MockRoom()]
+        network = PressureNetwork(rooms, [], building_direction_in_radians=math.radians(30), air_density=1.2,
+                                  building_pressure_coefficients=(0.3, -0.2))
+
+        # A wind in the building direction blows from the back to the front
+        front, left, back, right = network.side_pressure_coefficients(math.radians(30))
+        self.assertAlmostEqual(back, 0.3)
+        self.assertAlmostEqual(front, -0.2)
+        self.assertAlmostEqual(left, 0.05)
+        self.assertAlmostEqual(right, 0.05)
+
+        front, left, back, right = network.side_pressure_coefficients(math.radians(30+90))
+        self.assertAlmostEqual(left, 0.3)
+        self.assertAlmostEqual(right, -0.2)
+
+    def test_one_room_cross_ventilated(self):
+        rooms = [MockRoom()]
+        apertures = [Aperture(rooms[0], Side.Back, 3), Aperture(rooms[0], Side.Front, 4)]
+        network = PressureNetwork(rooms, apertures, air_density=1.2, building_pressure_coefficients=(0.3, -0.2),
+                                  discharge_coefficient=0.6)
+
+        flows = network.aperture_flows(2.0, 0.0)
+
+        # The 2 apertures in series act as one with an area of (1/3^2 + 1/4^2)^-1/2 = 2.4
+        pressure_difference = 0.5*1.2*2.0**2*(0.3+0.2)
+        expected = 0.6*2.4*math.sqrt(2*pressure_difference/1.2)
+        self.assertAlmostEqual(flows[0], -expected)
+        self.assertAlmostEqual(flows[1], expected)
+
+        # The other way round when the wind does
+        np.testing.assert_allclose(network.aperture_flows(2.0, math.pi), -flows)
+
+    def test_no_flow(self):
+        rooms = [MockRoom(), MockRoom(), MockRoom()]
+        apertures = [
+            Aperture(rooms[0], Side.Front, 1),
+            Aperture(rooms[0], rooms[1], 1),
+            Aperture(rooms[2], Side.Back, 0),
+        ]
+        network = PressureNetwork(rooms, apertures, air_density=1.2)
+
+        # Without wind nothing flows
+        np.testing.assert_array_equal(network.aperture_flows(0.0, 1.0), 0)
+        np.testing.assert_array_equal(network.room_pressures(0.0, 1.0), 0)
+
+        # A room with only one way in has the pressure outside it, and no flow
+        flows = network.aperture_flows(3.0, 1.0)
+        np.testing.assert_allclose(flows, 0, atol=1e-12)
+        pressures = network.room_pressures(3.0, 1.0)
+        self.assertAlmostEqual(pressures[0], network.side_pressures(3.0, 1.0)[0])
+        self.assertAlmostEqual(pressures[1], pressures[0])
+
+        # A room which can't be reached stays at the outside pressure
+        self.assertEqual(pressures[2], 0)
+        self.assertFalse(network.ventilated_rooms(flows).any())
+
+    def test_mass_is_conserved(self):
+        rooms, apertures = self.grid_building(8, 8)
+        network = PressureNetwork(rooms, apertures, building_direction_in_radians=0.3, air_density=1.2)
+        origins = [rooms.index(a.origin) for a in apertures]
+        destinations = [None if type(a.destination) is Side else rooms.index(a.destination) for a in apertures]
+
+        for wind_direction in np.linspace(0, 2*math.pi, 13):
+            with self.subTest(wind_direction=wind_direction):
+                flows = network.aperture_flows(3.0, wind_direction)
+                net_inflow = np.zeros(len(rooms))
+                for q, o, d in zip(flows, origins, destinations):
+                    net_inflow[o] -= q
+                    if d is not None:
+                        net_inflow[d] += q
+                self.assertLess(np.max(np.abs(net_inflow)), 1e-8*np.max(np.abs(flows)))
+
+                # Air flows in on the sides with higher pressure, and out on the sides with lower pressure
+                pressures = network.room_pressures(3.0, wind_direction)
+                side_pressures = network.side_pressures(3.0, wind_direction)
+                for q, o, d, a in zip(flows, origins, destinations, apertures):
+                    if d is None:
+                        outside = side_pressures[[Side.Front, Side.Left, Side.Back, Side.Right].index(a.destination)]
+                        self.assertEqual(np.sign(q), np.sign(pressures[o]-outside))
+
+    def test_flows_scale_with_wind_speed(self):
+        rooms, apertures = self.grid_building(3, 4, seed=1)
+        network = PressureNetwork(rooms, apertures, air_density=1.2)
+        np.testing.assert_allclose(network.aperture_flows(4.0, 0.7), 2*network.aperture_flows(2.0, 0.7),
+                                   rtol=1e-6, atol=1e-9)
+
+
+if __name__ == '__main__':
+    unittest.main()
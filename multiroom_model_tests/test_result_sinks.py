@@ -0,0 +1,174 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from multiroom_model.result_sinks import ResultSink, MemoryResultSink, ChunkedResultSink, read_chunked_results
+
+
+class TestResultSinks(unittest.TestCase):
+    def interval(self, t0, t1, offset=0.0):
+        times = [t/2 for t in range(2*t0, 2*t1+1)]
+        return pd.DataFrame({
+            'O3': [offset + 1.0e12 + t/3 for t in times],
+            'NO2': [offset + 2.0e11 - t/7 for t in times],
+            'adults': [2 for t in times],
+        }, index=times)
+
+    def intervals(self, room, first=0, count=10):
+        return [self.interval(3*i, 3*i+3, offset=room) for i in range(first, first+count)]
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def give(self, sink, first=0, count=10):
+        for i in range(first, first+count):
+            for room in range(2):
+                sink.append(room, self.interval(3*i, 3*i+3, offset=room))
+
+    def test_memory_sink(self):
+        sink = MemoryResultSink(initial_capacity=2)
+        sink.open(2)
+        self.give(sink)
+        results = sink.close()
+
+        for room in range(2):
+            pd.testing.assert_frame_equal(results[room], pd.concat(self.intervals(room), axis=0))
+
+    def test_incomplete_sink_cannot_be_created(self):
+        class AppendOnlySink(ResultSink):
+            def _append(self, room_index, results):
+                pass
+
+        with self.assertRaises(TypeError):
+            AppendOnlySink()
+
+    def test_column_selection(self):
+        sink = MemoryResultSink(columns=['NO2', 'adults'])
+        sink.open(2)
+        self.give(sink)
+        results = sink.close()
+
+        self.assertEqual(list(results[0].columns), ['NO2', 'adults'])
+        pd.testing.assert_frame_equal(results[1], pd.concat(self.intervals(1), axis=0)[['NO2', 'adults']])
+
+    def test_missing_column(self):
+        sink = MemoryResultSink(columns=['NO3'])
+        sink.open(2)
+        with self.assertRaises(ValueError):
+            self.give(sink)
+
+    def test_decimation(self):
+        sink = MemoryResultSink(min_time_step=2.0)
+        sink.open(2)
+        self.give(sink)
+        results = sink.close()
+
+        # One row every 2 seconds, the rows repeated at the ends of the intervals are dropped
+        self.assertEqual(list(results[0].index), [float(t) for t in range(0, 31, 2)])
+        self.assertEqual(results[0].loc[4.0, 'O3'], self.interval(3, 6).loc[4.0, 'O3'])
+
+    def test_chunked_sink(self):
+        sink = ChunkedResultSink(self.folder.name, chunk_rows=16, room_names=['Room 1', 'Room 2'])
+        sink.open(2)
+        self.give(sink)
+        folders = sink.close()
+
+        self.assertEqual(folders, [os.path.join(self.folder.name, "room_0"), os.path.join(self.folder.name, "room_1")])
+        results = read_chunked_results(self.folder.name)
+        self.assertEqual(list(results.keys()), ['Room 1', 'Room 2'])
+        for room, name in enumerate(results.keys()):
+            pd.testing.assert_frame_equal(results[name], pd.concat(self.intervals(room), axis=0))
+
+        # Each chunk holds species x rows
+        chunk = np.load(os.path.join(folders[0], "chunk_000000.npy"))
+        self.assertEqual(chunk.shape, (3, 21))
+        self.assertTrue(chunk.flags.c_contiguous)
+
+    def test_chunked_sink_with_selection_and_decimation(self):
+        sink = ChunkedResultSink(self.folder.name, columns=['O3'], min_time_step=3.0, chunk_rows=4)
+        sink.open(2)
+        self.give(sink)
+        sink.close()
+
+        results = read_chunked_results(self.folder.name)
+        self.assertEqual(list(results['room_1'].columns), ['O3'])
+        self.assertEqual(list(results['room_1'].index), [float(t) for t in range(0, 31, 3)])
+
+    def test_restore_memory_sink(self):
+        uninterrupted = MemoryResultSink(min_time_step=2.0)
+        uninterrupted.open(2)
+        self.give(uninterrupted)
+        expected = uninterrupted.close()
+
+        sink = MemoryResultSink(min_time_step=2.0)
+        sink.open(2)
+        self.give(sink, 0, 4)
+        state = sink.checkpoint_state()
+        self.give(sink, 4, 2)
+
+        restored = MemoryResultSink(min_time_step=2.0)
+        restored.restore(2, state)
+        self.give(restored, 4, 6)
+        for room, result in enumerate(restored.close()):
+            pd.testing.assert_frame_equal(result, expected[room])
+
+    def test_restore_memory_sink_saved_in_parts(self):
+        uninterrupted = MemoryResultSink(min_time_step=2.0)
+        uninterrupted.open(2)
+        self.give(uninterrupted)
+        expected = uninterrupted.close()
+
+        folder = os.path.join(self.folder.name, "parts")
+        sink = MemoryResultSink(min_time_step=2.0)
+        sink.open(2)
+        self.give(sink, 0, 3)
+        sink.checkpoint_state(folder)
+        self.give(sink, 3, 1)
+        state = sink.checkpoint_state(folder)
+
+        # Each checkpoint saved only the rows added since the one before, none of the results are in the state
+        saved = [np.load(os.path.join(folder, f"room_0_times_{part:06d}.npy")) for part in range(2)]
+        np.testing.assert_array_equal(np.concatenate(saved), sink.stores[0].times())
+        self.assertGreater(saved[1][0], saved[0][-1])
+        self.assertNotIn('room_0_values', state)
+
+        # Written after the checkpoint, then the run was interrupted
+        self.give(sink, 4, 2)
+        sink.checkpoint_state(folder)
+
+        restored = MemoryResultSink(min_time_step=2.0)
+        restored.restore(2, state)
+        self.give(restored, 4, 3)
+        restored.checkpoint_state(folder)
+        self.give(restored, 7, 3)
+        for room, result in enumerate(restored.close()):
+            pd.testing.assert_frame_equal(result, expected[room])
+
+        # The part saved after the checkpoint was replaced by the one saved after restoring
+        self.assertEqual(len([n for n in os.listdir(folder) if n.startswith("room_0_times")]), 3)
+
+    def test_restore_chunked_sink(self):
+        sink = ChunkedResultSink(self.folder.name, chunk_rows=16)
+        sink.open(2)
+        self.give(sink, 0, 4)
+        state = sink.checkpoint_state()
+
+        # Written after the checkpoint, then the run was interrupted
+        self.give(sink, 4, 5)
+
+        restored = ChunkedResultSink(self.folder.name, chunk_rows=16)
+        restored.restore(2, state)
+        self.give(restored, 4, 6)
+        restored.close()
+
+        results = read_chunked_results(self.folder.name)
+        for room in range(2):
+            pd.testing.assert_frame_equal(results[f'room_{room}'], pd.concat(self.intervals(room), axis=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import os
+import pickle
+import tempfile
+import pandas as pd
+from multiroom_model.results_format import write_results
+from multiroom_model.results_extractor import extract_results
+
+
+class TestResultsExtractor(unittest.TestCase):
+    def room_results(self, offset=0.0, rows=50):
+        times = [t*0.5 for t in range(rows)]
+        return pd.DataFrame({
+            'O3': [offset + 1.0e12 + t/3 for t in times],
+            'O3OUT': [offset + 2.0e12 for t in times],
+            'NO2': [offset + 2.0e11 - t/7 for t in times],
+            'NO2OUT': [offset + 3.0e11 for t in times],
+            'HONO': [offset + 4.0e9 for t in times],
+            'adults': [2 for t in times],
+        }, index=times)
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.results = {'Room 1': self.room_results(), 'Room 2': self.room_results(offset=1.0, rows=30)}
+        self.variables = ['O3', 'NO2', 'adults', 'NO3']
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def expected_csv(self, name, columns):
+        filename = os.path.join(self.folder.name, "expected.csv")
+        self.results[name].to_csv(filename, columns=columns, index_label='Time')
+        with open(filename) as f:
+            return f.read()
+
+    def check_output(self, output_folder, files):
+        self.assertEqual(sorted(os.path.basename(f) for f in files),
+                         ['Room 1.csv', 'Room 1_outdoor.csv', 'Room 2.csv', 'Room 2_outdoor.csv'])
+        for name in self.results.keys():
+            with open(os.path.join(output_folder, f"{name}.csv")) as f:
+                self.assertEqual(f.read(), self.expected_csv(name, ['O3', 'NO2', 'adults']))
+            with open(os.path.join(output_folder, f"{name}_outdoor.csv")) as f:
+                self.assertEqual(f.read(), self.expected_csv(name, ['O3OUT', 'NO2OUT']))
+
+    def test_extract_from_results_folder(self):
+        results_folder = os.path.join(self.folder.name, "results")
+        output_folder = os.path.join(self.folder.name, "extracted")
+        write_results(results_folder, self.results)
+
+        files = extract_results(results_folder, self.variables, output_folder, processes=2, chunk_rows=7)
+
+        self.check_output(output_folder, files)
+
+    def test_extract_serially(self):
+        results_folder = os.path.join(self.folder.name, "results")
+        output_folder = os.path.join(self.folder.name, "extracted")
+        write_results(results_folder, self.results)
+
+        files = extract_results(results_folder, self.variables, output_folder, processes=1, chunk_rows=1000)
+
+        self.check_output(output_folder, files)
+
+    def test_extract_from_pickle(self):
+        pickle_file = os.path.join(self.folder.name, "results.pkl")
+        output_folder = os.path.join(self.folder.name, "extracted")
+        with open(pickle_file, 'wb') as f:
+            pickle.dump(self.results, f)
+
+        files = extract_results(pickle_file, self.variables, output_folder, chunk_rows=7)
+
+        self.check_output(output_folder, files)
+
+
+if __name__ == '__main__':
+    unittest.main()
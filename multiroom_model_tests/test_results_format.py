@@ -0,0 +1,75 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from multiroom_model.results_format import write_results, write_results_from_chunks, ResultsReader
+from multiroom_model.result_sinks import ChunkedResultSink
+
+
+class TestResultsFormat(unittest.TestCase):
+    def room_results(self, offset=0.0, rows=50):
+        times = [t*0.5 for t in range(rows)]
+        return pd.DataFrame({
+            'O3': [offset + 1.0e12 + t/3 for t in times],
+            'O3OUT': [offset + 2.0e12 for t in times],
+            'NO2': [offset + 2.0e11 - t/7 for t in times],
+            'adults': [2 for t in times],
+        }, index=times)
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.results = {'Room 1': self.room_results(), 'Room 2': self.room_results(offset=1.0, rows=30)}
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_round_trip(self):
+        write_results(self.folder.name, self.results)
+        reader = ResultsReader(self.folder.name)
+
+        self.assertTrue(ResultsReader.is_results_folder(self.folder.name))
+        self.assertEqual(reader.room_names(), ['Room 1', 'Room 2'])
+        self.assertEqual(reader.species('Room 2'), ['O3', 'O3OUT', 'NO2', 'adults'])
+        for name, df in self.results.items():
+            pd.testing.assert_frame_equal(reader.dataframe(name), df)
+
+    def test_series_are_memory_mapped(self):
+        write_results(self.folder.name, self.results)
+        reader = ResultsReader(self.folder.name)
+
+        series = reader.series('Room 2', 'NO2')
+        self.assertIsInstance(series, np.memmap)
+        self.assertTrue(series.flags.c_contiguous)
+        self.assertFalse(series.flags.writeable)
+        np.testing.assert_array_equal(series, self.results['Room 2']['NO2'].to_numpy())
+        np.testing.assert_array_equal(reader.times('Room 2'), self.results['Room 2'].index.to_numpy())
+
+        with self.assertRaises(KeyError):
+            reader.series('Room 2', 'NO3')
+
+    def test_selected_species(self):
+        write_results(self.folder.name, self.results)
+        reader = ResultsReader(self.folder.name)
+
+        df = reader.dataframe('Room 1', ['NO2', 'NO3', 'adults'])
+        pd.testing.assert_frame_equal(df, self.results['Room 1'][['NO2', 'adults']])
+
+    def test_from_chunks(self):
+        chunked_folder = os.path.join(self.folder.name, "chunks")
+        sink = ChunkedResultSink(chunked_folder, chunk_rows=7, room_names=list(self.results.keys()))
+        sink.open(2)
+        for i, df in enumerate(self.results.values()):
+            for start in range(0, len(df.index), 10):
+                sink.append(i, df.iloc[start:start+10])
+        sink.close()
+
+        write_results_from_chunks(chunked_folder, chunked_folder)
+        reader = ResultsReader(chunked_folder)
+
+        for name, df in self.results.items():
+            pd.testing.assert_frame_equal(reader.dataframe(name), df)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import numpy as np
+import pandas as pd
+from multiroom_model.results_store import RoomResultsStore
+
+
+class TestRoomResultsStore(unittest.TestCase):
+    def interval(self, t0, t1, offset=0.0):
+        times = [float(t) for t in range(t0, t1+1)]
+        return pd.DataFrame({
+            'O3': [offset + 1.0e12 + t for t in times],
+            'NO2': [offset + 2.0e11 - t for t in times],
+            'adults': [2 for t in times],
+        }, index=times)
+
+    def test_empty(self):
+        store = RoomResultsStore()
+        self.assertEqual(len(store), 0)
+        self.assertTrue(store.to_dataframe().empty)
+
+    def test_matches_concatenation(self):
+        intervals = [self.interval(3*i, 3*i+3, offset=i) for i in range(10)]
+
+        store = RoomResultsStore(initial_capacity=2)
+        for df in intervals:
+            store.append(df)
+
+        expected = pd.concat(intervals, axis=0)
+        result = store.to_dataframe()
+
+        self.assertEqual(len(store), len(expected.index))
+        pd.testing.assert_frame_equal(result, expected)
+        self.assertEqual(result['adults'].dtype, expected['adults'].dtype)
+
+    def test_repeated_times_are_kept(self):
+        store = RoomResultsStore()
+        store.append(self.interval(0, 3))
+        store.append(self.interval(3, 6))
+
+        self.assertEqual(list(store.times()), [0.0, 1.0, 2.0, 3.0, 3.0, 4.0, 5.0, 6.0])
+        self.assertEqual(store.values().shape, (8, 3))
+
+    def test_views_are_read_only(self):
+        store = RoomResultsStore()
+        store.append(self.interval(0, 3))
+        with self.assertRaises(ValueError):
+            store.values()[0, 0] = 0.0
+
+    def test_dtype_promotion(self):
+        store = RoomResultsStore()
+        store.append(self.interval(0, 3))
+        later = self.interval(3, 6)
+        later['adults'] = later['adults'].astype(float) + 0.5
+        store.append(later)
+
+        result = store.to_dataframe()
+        self.assertEqual(result['adults'].dtype, np.float64)
+        self.assertEqual(result['adults'].iloc[-1], 2.5)
+
+    def test_changed_columns_raises(self):
+        store = RoomResultsStore()
+        store.append(self.interval(0, 3))
+        with self.assertRaises(ValueError):
+            store.append(self.interval(3, 6).drop(columns=['NO2']))
+
+
+if __name__ == '__main__':
+    unittest.main()
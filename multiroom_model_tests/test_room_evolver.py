@@ -65,3 +65,23 @@ class TestRoomEvolverClass(unittest.TestCase):
             seconds_to_integrate=10,
             initial_dataframe=output_data
         )
+
+    def test_room__evolver_class_sharing_inchem(self):
+        room: RoomChemistry = self.rooms[2]
+
+        evolver = RoomInchemPyEvolver(room, self.global_settings)
+        sharing_evolver = RoomInchemPyEvolver(room, self.global_settings, inchem=evolver.inchem)
+
+        self.assertIs(sharing_evolver.inchem, evolver.inchem)
+
+        output_data, _ = evolver.run(
+            t0=0,
+            seconds_to_integrate=10,
+            initial_text_file='initial_concentrations.txt'
+        )
+        sharing_output_data, _ = sharing_evolver.run(
+            t0=0,
+            seconds_to_integrate=10,
+            initial_text_file='initial_concentrations.txt'
+        )
+        self.assertTrue(output_data.equals(sharing_output_data))
@@ -0,0 +1,108 @@
+import unittest
+import pandas as pd
+from multiroom_model.global_settings import GlobalSettings
+from multiroom_model.room_chemistry import RoomChemistry
+from multiroom_model.room_inchempy_evolver import RoomInchemPyEvolver, state_dataframe
+from multiroom_model.room_worker import RoomWorker
+from multiroom_model.simulation import Simulation
+from multiroom_model.room_factory import (
+    build_rooms,
+    populate_room_with_emissions_file,
+    populate_room_with_tvar_file,
+    populate_room_with_expos_file
+)
+
+
+class TestRoomWorker(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.rooms = build_rooms("config_rooms/mr_tcon_room_params.csv")
+        for i, room in cls.rooms.items():
+            populate_room_with_emissions_file(room, f"config_rooms/mr_room_emis_params_{i}.csv")
+            populate_room_with_tvar_file(room, f"config_rooms/mr_tvar_room_params_{i}.csv")
+            populate_room_with_expos_file(room, f"config_rooms/mr_tvar_expos_params_{i}.csv")
+        cls.global_settings = GlobalSettings(
+            filename='chem_mech/mcm_subset.fac',
+            INCHEM_additional=False,
+            particles=True,
+            constrained_file=None,
+            output_folder=None,
+            dt=1.0,
+            H2O2_dep=False,
+            O3_dep=False,
+            custom=False,
+            custom_filename=None,
+            diurnal=True,
+            city='London_urban',
+            date='21-06-2020',
+            lat=45.4,
+            path=None,
+            reactions_output=False
+        )
+
+    def test_worker_matches_evolver(self):
+        room: RoomChemistry = self.rooms[2]
+
+        evolver = RoomInchemPyEvolver(room, self.global_settings)
+        expected_1, _ = evolver.run(t0=0, seconds_to_integrate=10, initial_text_file='initial_concentrations.txt')
+        expected_2, _ = evolver.run(t0=10, seconds_to_integrate=10, initial_dataframe=expected_1)
+
+        worker = RoomWorker(room, self.global_settings)
+        try:
+            worker.wait_until_built()
+            worker.submit(0, 10, 'initial_concentrations.txt', True)
+            result_1 = worker.result()
+            worker.submit(10, 10, result_1, False)
+            result_2 = worker.result()
+        finally:
+            worker.close()
+
+        self.assertTrue(expected_1.equals(result_1))
+        self.assertTrue(expected_2.equals(result_2))
+
+    def test_worker_from_state_matches_evolver(self):
+        room: RoomChemistry = self.rooms[2]
+
+        evolver = RoomInchemPyEvolver(room, self.global_settings)
+        first, _ = evolver.run(t0=0, seconds_to_integrate=10, initial_text_file='initial_concentrations.txt')
+        expected_1, _ = evolver.run(t0=10, seconds_to_integrate=10, initial_dataframe=first.iloc[-1:])
+        expected_2, _ = evolver.run(t0=20, seconds_to_integrate=10, initial_dataframe=expected_1.iloc[-1:])
+
+        template = first.iloc[:0]
+        worker = RoomWorker(room, self.global_settings)
+        try:
+            worker.submit_state(10, 10, first.iloc[-1].to_numpy(dtype=float), template)
+            result_1 = worker.result()
+            # The template is only sent with the first state
+            worker.submit_state(20, 10, result_1.iloc[-1].to_numpy(dtype=float), template)
+            result_2 = worker.result()
+        finally:
+            worker.close()
+
+        self.assertTrue(expected_1.equals(result_1))
+        self.assertTrue(expected_2.equals(result_2))
+
+    def test_state_dataframe(self):
+        evolver = RoomInchemPyEvolver(self.rooms[2], self.global_settings)
+        results, _ = evolver.run(t0=0, seconds_to_integrate=10, initial_text_file='initial_concentrations.txt')
+
+        rebuilt = state_dataframe(results.iloc[:0], results.index[-1], results.iloc[-1].to_numpy(dtype=float))
+        # The states are always floats, as they are after transport
+        pd.testing.assert_frame_equal(results.iloc[-1:], rebuilt, check_dtype=False)
+
+    def test_persistent_workers_simulation(self):
+        rooms = [self.rooms[2], self.rooms[4]]
+        initial_conditions = dict([(r, 'initial_concentrations.txt') for r in rooms])
+
+        expected = Simulation(self.global_settings, rooms, []).run(
+            t0=0.0, t_total=10, t_interval=3.0, init_conditions=initial_conditions)
+
+        with Simulation(self.global_settings, rooms, [], persistent_workers=True) as simulation:
+            result = simulation.run(t0=0.0, t_total=10, t_interval=3.0, init_conditions=initial_conditions)
+
+        for r in rooms:
+            self.assertTrue(expected[r].equals(result[r]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -97,8 +97,8 @@ class TestAssembleAllRoomsFromCSV(unittest.TestCase):
             'saero': 1.3e-2  # aerosol surface area concentration
         }
         light_on_times = interpret_light_on_times(room.light_switch, t0+seconds_to_integrate)
-        temperatures = list(zip(room.temp_in_kelvin.times(), room.temp_in_kelvin.values()))
-        ACRate_dict = dict(zip(room.airchange_in_per_second.times(), room.airchange_in_per_second.values()))
+        temperatures = room.temp_in_kelvin.pairs()
+        ACRate_dict = dict(room.airchange_in_per_second.pairs())
 
         result = run_main_class(inchem,
                                 t0=t0,
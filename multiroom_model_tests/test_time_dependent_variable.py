@@ -1,4 +1,5 @@
 import unittest
+import numpy as np
 from multiroom_model.time_dep_value import TimeDependentValue
 
 
@@ -13,10 +14,23 @@ class TestTimeDependentValueLinearInterpolation(unittest.TestCase):
         self.tdv = TimeDependentValue(self.data, continuous=True)
 
     def test_times(self):
-        self.assertEqual(self.tdv.times(), [0.0, 1.0, 2.0, 3.0])
+        self.assertEqual(list(self.tdv.times()), [0.0, 1.0, 2.0, 3.0])
 
     def test_values(self):
-        self.assertEqual(self.tdv.values(), [0.0, 10.0, 20.0, 30.0])
+        self.assertEqual(list(self.tdv.values()), [0.0, 10.0, 20.0, 30.0])
+
+    def test_arrays_are_read_only_views(self):
+        times, values = self.tdv.times(), self.tdv.values()
+        self.assertTrue(np.shares_memory(times, self.tdv.times()))
+        self.assertTrue(np.shares_memory(values, self.tdv.values()))
+        with self.assertRaises(ValueError):
+            times[0] = 5.0
+        with self.assertRaises(ValueError):
+            values[0] = 5.0
+        self.assertEqual(self.tdv.value_at_time(0.0), 0.0)
+
+    def test_pairs(self):
+        self.assertEqual(self.tdv.pairs(), self.data)
 
     def test_value_at_exact_times(self):
         self.assertAlmostEqual(self.tdv.value_at_time(0.0), 0.0)
@@ -51,6 +65,19 @@ class TestTimeDependentValueLinearInterpolation(unittest.TestCase):
         with self.assertRaises(Exception):
             tdv_single.value_at_time(2.1)
 
+    def test_values_at_times(self):
+        times = np.array([0.0, 0.25, 1.0, 1.5, 2.9, 3.0])
+        expected = [self.tdv.value_at_time(t) for t in times]
+        np.testing.assert_array_equal(self.tdv.values_at_times(times), expected)
+
+    def test_values_at_times_out_of_range_raises(self):
+        with self.assertRaises(Exception) as context:
+            self.tdv.values_at_times(np.array([1.0, -1.0]))
+        self.assertIn("too early", str(context.exception).lower())
+        with self.assertRaises(Exception) as context:
+            self.tdv.values_at_times(np.array([1.0, 3.1]))
+        self.assertIn("too late", str(context.exception).lower())
+
 class TestTimeDependentDiscontinuous(unittest.TestCase):
     def setUp(self):
         self.data = [
@@ -62,10 +89,10 @@ class TestTimeDependentDiscontinuous(unittest.TestCase):
         self.tdv = TimeDependentValue(self.data, continuous=False)
 
     def test_times(self):
-        self.assertEqual(self.tdv.times(), [0.0, 1.0, 2.0, 3.0])
+        self.assertEqual(list(self.tdv.times()), [0.0, 1.0, 2.0, 3.0])
 
     def test_values(self):
-        self.assertEqual(self.tdv.values(), [0.0, 10.0, 20.0, 30.0])
+        self.assertEqual(list(self.tdv.values()), [0.0, 10.0, 20.0, 30.0])
 
     def test_value_at_exact_times(self):
         self.assertAlmostEqual(self.tdv.value_at_time(0.0), 0.0)
@@ -92,5 +119,16 @@ class TestTimeDependentDiscontinuous(unittest.TestCase):
             TimeDependentValue([(1.0, 10.0), (0.5, 20.0)], continuous=True)
         self.assertIn("times were not in order", str(context.exception).lower())
 
+    def test_values_at_times(self):
+        times = np.array([0.0, 0.5, 1.0, 1.5, 2.999, 3.0])
+        expected = [self.tdv.value_at_time(t) for t in times]
+        np.testing.assert_array_equal(self.tdv.values_at_times(times), expected)
+
+    def test_long_schedule(self):
+        times = np.arange(0.0, 7*24*3600.0+1, 60.0)
+        tdv = TimeDependentValue(list(zip(times, np.sin(times))), continuous=False)
+        grid = np.linspace(0.0, times[-1], 1001)
+        np.testing.assert_array_equal(tdv.values_at_times(grid), [tdv.value_at_time(t) for t in grid])
+
 if __name__ == '__main__':
     unittest.main()
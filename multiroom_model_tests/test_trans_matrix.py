@@ -12,6 +12,7 @@ from multiroom_model.aperture_calculations import Side
 from multiroom_model.simulation import Simulation, Aperture, WindDefinition
 from multiroom_model.global_settings import GlobalSettings
 from multiroom_model.aperture_calculations import flow_advection
+from multiroom_model.trans_matrix_cache import TransMatrixCache
 import numpy as np
 
 
@@ -83,6 +84,43 @@ class TestTransMatrix(unittest.TestCase):
             self.assertFalse(np.isnan(matrix.min()))
             print(matrix)
 
+    def test_trans_matrix_cache(self):
+
+        uncached = Simulation(self.global_settings, self.rooms, self.apertures, self.wind_definition,
+                              trans_matrix_cache=TransMatrixCache(max_size=0))
+        cache = TransMatrixCache()
+        cached = Simulation(self.global_settings, self.rooms, self.apertures, self.wind_definition,
+                            trans_matrix_cache=cache)
+
+        for time in (0, 46805, 82800, 0, 46805):
+            np.testing.assert_array_equal(cached.trans_matrix(time), uncached.trans_matrix(time))
+
+        self.assertEqual(cache.misses, 3)
+        self.assertEqual(cache.hits, 2)
+
+        # The matrix returned can be altered without changing the cache
+        matrix = cached.trans_matrix(0)
+        matrix[:] = 0
+        self.assertTrue(cached.trans_matrix(0).any())
+
+    def test_pressure_network(self):
+
+        settings = GlobalSettings(**{**vars(self.global_settings), 'airflow_model': 'pressure_network'})
+        simulation = Simulation(settings, self.rooms, self.apertures, self.wind_definition)
+
+        for time in (0, 46805, 82800, ):
+            matrix = simulation.trans_matrix(time)
+            self.assertEqual(matrix.shape, (10, 10))
+            self.assertTrue((matrix >= 0).all())
+
+            # As much air leaves each room as enters it
+            np.testing.assert_allclose(matrix[1:, :].sum(axis=1), matrix[:, 1:].sum(axis=0),
+                                       rtol=1e-8, atol=1e-12)
+
+        with self.assertRaises(ValueError):
+            Simulation(GlobalSettings(**{**vars(self.global_settings), 'airflow_model': 'unknown'}),
+                       self.rooms, self.apertures, self.wind_definition)
+
     def test_one_room(self):
 
         rooms = [self.rooms[0],]
@@ -0,0 +1,86 @@
+import unittest
+import math
+import numpy as np
+from multiroom_model.trans_matrix_cache import TransMatrixCache
+
+
+class TestTransMatrixCache(unittest.TestCase):
+
+    def setUp(self):
+        self.calculated = []
+
+    def calculate(self, wind_speed, wind_direction):
+        self.calculated.append((wind_speed, wind_direction))
+        return np.array([[wind_speed, wind_direction], [0.0, 0.0]])
+
+    def test_invalid_settings(self):
+        with self.assertRaises(ValueError):
+            TransMatrixCache(max_size=-1)
+        with self.assertRaises(ValueError):
+            TransMatrixCache(wind_speed_tolerance=-0.1)
+        with self.assertRaises(ValueError):
+            TransMatrixCache(wind_direction_tolerance_in_radians=-0.1)
+
+    def test_exact_wind_state_is_reused(self):
+        cache = TransMatrixCache()
+        first = cache.get(1.5, 0.25, self.calculate)
+        second = cache.get(1.5, 0.25, self.calculate)
+        self.assertIs(first, second)
+        self.assertEqual(self.calculated, [(1.5, 0.25)])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        cache.get(1.5, 0.2500001, self.calculate)
+        self.assertEqual(len(self.calculated), 2)
+
+    def test_matrices_are_read_only(self):
+        matrix = TransMatrixCache().get(1.0, 0.0, self.calculate)
+        with self.assertRaises(ValueError):
+            matrix[0, 0] = 2.0
+
+    def test_no_wind_ignores_direction(self):
+        cache = TransMatrixCache()
+        cache.get(0.0, 0.5, self.calculate)
+        cache.get(0.0, 2.5, self.calculate)
+        self.assertEqual(self.calculated, [(0.0, 0.0)])
+
+    def test_quantised_wind_state(self):
+        cache = TransMatrixCache(wind_speed_tolerance=0.5, wind_direction_tolerance_in_radians=math.radians(10))
+        cache.get(2.1, math.radians(31), self.calculate)
+        cache.get(1.9, math.radians(29) + 2*math.pi, self.calculate)
+        self.assertEqual(len(self.calculated), 1)
+
+        # The matrix is calculated for the rounded wind state, not the first one seen
+        wind_speed, wind_direction = self.calculated[0]
+        self.assertEqual(wind_speed, 2.0)
+        self.assertAlmostEqual(wind_direction, math.radians(30))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = TransMatrixCache(max_size=2)
+        cache.get(1.0, 0.0, self.calculate)
+        cache.get(2.0, 0.0, self.calculate)
+        cache.get(1.0, 0.0, self.calculate)
+        cache.get(3.0, 0.0, self.calculate)
+        self.assertEqual(len(cache), 2)
+
+        # 2.0 was the least recently used, so it has to be calculated again, 1.0 doesn't
+        cache.get(1.0, 0.0, self.calculate)
+        cache.get(2.0, 0.0, self.calculate)
+        self.assertEqual([s for s, _ in self.calculated], [1.0, 2.0, 3.0, 2.0])
+
+    def test_disabled(self):
+        cache = TransMatrixCache(max_size=0)
+        cache.get(1.0, 0.0, self.calculate)
+        cache.get(1.0, 0.0, self.calculate)
+        self.assertEqual(len(self.calculated), 2)
+        self.assertEqual(len(cache), 0)
+
+    def test_clear(self):
+        cache = TransMatrixCache()
+        cache.get(1.0, 0.0, self.calculate)
+        cache.get(1.0, 0.0, self.calculate)
+        cache.clear()
+        self.assertEqual((len(cache), cache.hits, cache.misses), (0, 0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
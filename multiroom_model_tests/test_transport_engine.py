@@ -0,0 +1,83 @@
+import unittest
+import numpy as np
+import pandas as pd
+from multiroom_model.aperture_calculations import Fluxes
+from multiroom_model.aperture_flow_calculations import ApertureFlowCalculator
+from multiroom_model.transport_engine import TransportEngine
+
+
+class TestTransportEngine(unittest.TestCase):
+    def setUp(self):
+        self.columns = pd.Index(['O3', 'NO2', 'CO', 'O3OUT', 'NO2OUT', 'r1', 'J4', 'O3SURF', 'ACRate', 'temp'])
+        self.states = np.array([
+            [1.0e12, 2.0e11, 3.0e12, 4.0e11, 5.0e10, 1.0, 2.0, 3.0, 1.0e-4, 293.0],
+            [2.0e12, 1.0e11, 1.0e12, 4.0e11, 5.0e10, 4.0, 5.0, 6.0, 2.0e-4, 294.0],
+        ])
+        self.volumes = np.array([30.0, 45.0])
+        self.delta_time = 3.0
+
+        # Room 1 <-> room 2, and room 1 <-> outside, and room 2 -> outside
+        self.fluxes = [
+            (Fluxes(from_1_to_2=0.2, from_2_to_1=0.05), 0, 1),
+            (Fluxes(from_1_to_2=0.1, from_2_to_1=0.3), 0, None),
+            (Fluxes(from_1_to_2=0.15, from_2_to_1=0.0), 1, None),
+        ]
+        self.trans_matrix = np.zeros((3, 3))
+        for f, origin_index, destination_index in self.fluxes:
+            i = origin_index+1
+            j = 0 if destination_index is None else destination_index+1
+            self.trans_matrix[i, j] += f.from_1_to_2
+            self.trans_matrix[j, i] += f.from_2_to_1
+
+    def test_indices(self):
+        engine = TransportEngine(self.columns)
+        self.assertEqual(list(self.columns[engine.indoor_index]), ['O3', 'NO2', 'CO'])
+        self.assertEqual(list(self.columns[engine.outdoor_source_index]), ['O3OUT', 'NO2OUT'])
+        self.assertEqual(list(self.columns[engine.outdoor_destination_index]), ['O3', 'NO2'])
+
+    def test_explicit_step_matches_aperture_flow_calculator(self):
+        calculator = ApertureFlowCalculator(self.columns)
+        rows = [pd.Series(s, index=self.columns) for s in self.states]
+
+        expected = [r.copy() for r in rows]
+        for flux, origin_index, destination_index in self.fluxes:
+            if destination_index is None:
+                change = calculator.outdoor_concentration_changes(
+                    flux, self.delta_time, rows[origin_index], self.volumes[origin_index])
+                expected[origin_index] = expected[origin_index].add(change, fill_value=0.0)
+            else:
+                change_1, change_2 = calculator.concentration_changes(
+                    flux, self.delta_time, rows[origin_index], rows[destination_index],
+                    self.volumes[origin_index], self.volumes[destination_index])
+                expected[origin_index] = expected[origin_index].add(change_1, fill_value=0.0)
+                expected[destination_index] = expected[destination_index].add(change_2, fill_value=0.0)
+
+        engine = TransportEngine(self.columns)
+        result = engine.explicit_step(self.trans_matrix, self.volumes, self.delta_time, self.states)
+
+        for i in range(2):
+            np.testing.assert_allclose(result[i], expected[i][self.columns].to_numpy(), rtol=1.0e-14)
+
+    def test_steps_leave_other_columns_alone(self):
+        engine = TransportEngine(self.columns)
+        untouched = self.columns.get_indexer(['O3OUT', 'NO2OUT', 'r1', 'J4', 'O3SURF', 'ACRate', 'temp'])
+        for step in (engine.explicit_step, engine.coupled_step):
+            result = step(self.trans_matrix, self.volumes, self.delta_time, self.states)
+            np.testing.assert_array_equal(result[:, untouched], self.states[:, untouched])
+
+    def test_coupled_step_is_close_to_explicit_step_for_short_intervals(self):
+        engine = TransportEngine(self.columns)
+        explicit = engine.explicit_step(self.trans_matrix, self.volumes, 1.0e-3, self.states)
+        coupled = engine.coupled_step(self.trans_matrix, self.volumes, 1.0e-3, self.states)
+        np.testing.assert_allclose(coupled-self.states, explicit-self.states, rtol=1.0e-3, atol=1.0)
+
+    def test_negative_species(self):
+        engine = TransportEngine(self.columns)
+        state = self.states[0].copy()
+        state[1] = -1.0
+        self.assertEqual(engine.negative_species(state), ['NO2'])
+        self.assertEqual(engine.negative_species(self.states[0]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
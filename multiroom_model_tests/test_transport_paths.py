@@ -1,6 +1,7 @@
 import unittest
+import random
 from multiroom_model.aperture import Aperture, Side
-from multiroom_model.transport_paths import paths_through_building
+from multiroom_model.transport_paths import paths_through_building, transport_path_effective_area
 
 
 class MockRoom:
@@ -183,3 +184,96 @@ class TestTransportPaths(unittest.TestCase):
         self.assertEqual(len(a), 2)
 
         self.assertEqual(len(result), 13)
+
+
+class TestLimitedTransportPaths(unittest.TestCase):
+
+    def grid_building(self, rows, columns, seed=0):
+        """
+        Rooms in a grid, each joined to its neighbours, with windows to the front and back along the first and last rows
+        and some windows to the left and right
+        """
+        rng = random.Random(seed)
+        rooms = [MockRoom() for n in range(rows*columns)]
+        apertures = []
+        for y in range(rows):
+            for x in range(columns):
+                room = rooms[y*columns+x]
+                if x+1 < columns:
+                    apertures.append(Aperture(room, rooms[y*columns+x+1], rng.uniform(0.5, 3)))
+                if y+1 < rows:
+                    apertures.append(Aperture(room, rooms[(y+1)*columns+x], rng.uniform(0.5, 3)))
+                if y == 0:
+                    apertures.append(Aperture(room, Side.Front, rng.uniform(0.5, 3)))
+                if y == rows-1:
+                    apertures.append(Aperture(room, Side.Back, rng.uniform(0.5, 3)))
+                if x == 0 and rng.random() < 0.5:
+                    apertures.append(Aperture(room, Side.Left, rng.uniform(0.5, 3)))
+                if x == columns-1 and rng.random() < 0.5:
+                    apertures.append(Aperture(room, Side.Right, rng.uniform(0.5, 3)))
+        return rooms, apertures
+
+    def test_effective_area(self):
+        rooms = [MockRoom()]
+        single = paths_through_building(rooms, [Aperture(rooms[0], Side.Front, 3), Aperture(rooms[0], Side.Back, 4)])
+        self.assertAlmostEqual(transport_path_effective_area(single[0]), 2.4)
+
+        closed = paths_through_building(rooms, [Aperture(rooms[0], Side.Front, 3), Aperture(rooms[0], Side.Back, 0)])
+        self.assertEqual(transport_path_effective_area(closed[0]), 0)
+
+    def test_max_route_length(self):
+        rooms, apertures = self.grid_building(3, 3)
+        every_path = paths_through_building(rooms, apertures)
+
+        for max_route_length in (2, 4, 6):
+            result = paths_through_building(rooms, apertures, max_route_length=max_route_length)
+            expected = [p for p in every_path if len(p.route) <= max_route_length]
+            self.assertEqual(len(result), len(expected))
+            for r, e in zip(result, expected):
+                self.assertEqual(r.route, e.route)
+
+    def test_max_paths_are_the_widest(self):
+        for seed in range(5):
+            rooms, apertures = self.grid_building(3, 3, seed)
+            for max_route_length in (None, 5):
+                every_path = paths_through_building(rooms, apertures, max_route_length=max_route_length)
+                every_area = sorted((transport_path_effective_area(p) for p in every_path), reverse=True)
+
+                for max_paths in (1, 5, 20, len(every_path)+10):
+                    with self.subTest(seed=seed, max_route_length=max_route_length, max_paths=max_paths):
+                        result = paths_through_building(rooms, apertures, max_route_length, max_paths)
+                        areas = [transport_path_effective_area(p) for p in result]
+
+                        self.assertEqual(len(result), min(max_paths, len(every_path)))
+                        for a, e in zip(areas, every_area):
+                            self.assertAlmostEqual(a, e)
+
+                        # Each path is different, and goes through each room only once
+                        routes = [tuple(id(p.aperture) for p in r.route) for r in result]
+                        self.assertEqual(len(set(routes)), len(routes))
+                        for r in result:
+                            self.assertEqual(len(set(map(id, r.route))), len(r.route))
+                            if max_route_length is not None:
+                                self.assertLessEqual(len(r.route), max_route_length)
+
+    def test_max_paths_ignores_closed_apertures(self):
+        rooms = [MockRoom(), MockRoom()]
+        apertures = [
+            Aperture(rooms[0], Side.Front, 1),
+            Aperture(rooms[0], rooms[1], 0),
+            Aperture(rooms[1], Side.Back, 1),
+            Aperture(rooms[0], Side.Back, 1),
+        ]
+        self.assertEqual(len(paths_through_building(rooms, apertures)), 2)
+
+        result = paths_through_building(rooms, apertures, max_paths=5)
+        self.assertEqual(len(result), 1)
+        self.assertIs(result[0].route[1].aperture, apertures[3])
+
+    def test_large_building(self):
+        # Far too many paths to find them all, but the widest are found quickly
+        rooms, apertures = self.grid_building(10, 10)
+        result = paths_through_building(rooms, apertures, max_paths=10)
+        self.assertEqual(len(result), 10)
+        areas = [transport_path_effective_area(p) for p in result]
+        self.assertEqual(areas, sorted(areas, reverse=True))
@@ -1,5 +1,8 @@
+import copy
 import pickle
 import unittest
+from unittest.mock import patch
+from multiroom_model import mechanism_cache
 from multiroom_model.global_settings import GlobalSettings
 from multiroom_model.simulation import Simulation
 from multiroom_model.room_factory import (
@@ -76,3 +79,31 @@ class TestTwoRoomSimulation(unittest.TestCase):
             self.assertEqual(result[r].index[-2], 24.0)
             self.assertEqual(result[r].index[-1], 25.0)
             self.assertEqual(len(result[r].index), int(25/1)+1+int(25/3))
+
+    def test_identical_rooms_share_inchem(self):
+        rooms = [self.rooms[0], copy.deepcopy(self.rooms[0]), self.rooms[1]]
+
+        simulation = Simulation(
+            global_settings=self.global_settings,
+            rooms=rooms,
+            apertures=[])
+
+        evolvers = simulation._room_evolvers
+        self.assertIs(evolvers[0].inchem, evolvers[1].inchem)
+        self.assertIsNot(evolvers[0].inchem, evolvers[2].inchem)
+        self.assertIs(evolvers[1].room, rooms[1])
+
+    def test_variants_share_inchem(self):
+        simulation = Simulation(
+            global_settings=self.global_settings,
+            rooms=self.rooms,
+            apertures=[],
+            cpu_count=1)
+
+        with patch('multiroom_model.mechanism_cache._hash_file', wraps=mechanism_cache._hash_file) as hash_file:
+            variant = simulation.with_inputs([copy.deepcopy(r) for r in self.rooms])
+        # The mechanism file was already hashed when the simulation was built
+        self.assertEqual(hash_file.call_count, 0)
+
+        for evolver, variant_evolver in zip(simulation._room_evolvers, variant._room_evolvers):
+            self.assertIs(variant_evolver.inchem, evolver.inchem)
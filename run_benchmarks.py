@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+# This script times the hot paths of the model: building the evolvers, one interval of chemistry in each room,
+# the transport between the rooms, finding the transport paths of growing buildings, classifying the species,
+# and a whole run like run_mbm.py, on the example building in config_rooms and the mcm_subset.fac mechanism.
+# The times are added to a history file (one json record per line), and compared with the earlier times
+# measured on the same machine. The script fails (exit status 1) if any benchmark has become slower.
+#
+# eg.   python run_benchmarks.py --only apply_wind transport_paths --repeat 5
+#
+# The same benchmarks are available from python as multiroom_model.benchmarks.BuildingBenchmarks
+
+# Import modules
+import argparse
+import sys
+from multiroom_model.benchmarks import (
+    BuildingBenchmarks,
+    history_record,
+    append_history,
+    read_history,
+    find_regressions
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the hot paths of MBM-Flex, and compare with earlier times")
+    parser.add_argument('--only', nargs='+', default=None, metavar='BENCHMARK',
+                        help="the groups of benchmarks to run (default: all of them): evolver_construction, "
+                             "room_interval, apply_wind, transport_paths, get_trans_vars, end_to_end")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="the number of times to time each benchmark, the best time is compared (default: 3)")
+    parser.add_argument('--history', default='benchmark_history.jsonl',
+                        help="the file of earlier times, which the new times are added to "
+                             "(default: benchmark_history.jsonl)")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="the fraction by which a benchmark may be slower than its baseline (default: 0.25)")
+    parser.add_argument('--window', type=int, default=5,
+                        help="the number of earlier times of each benchmark its baseline is made from (default: 5)")
+    parser.add_argument('--no-record', action='store_true',
+                        help="compare with the history without adding the new times to it")
+    args = parser.parse_args(argv)
+
+    results = BuildingBenchmarks().run(args.only, args.repeat)
+    record = history_record(results)
+    regressions = find_regressions(record, read_history(args.history), args.tolerance, args.window)
+
+    for r in results:
+        flag = "  SLOWER" if r.name in regressions else ""
+        print(f"{r.name:<50} best {r.best:10.6f}s  median {r.median:10.6f}s{flag}")
+
+    if not args.no_record:
+        append_history(args.history, record)
+        print(f'\n*** Times added to {args.history} ***')
+
+    for name, (best, baseline) in regressions.items():
+        print(f"{name} took {best:.6f}s, {100*(best/baseline-1):.0f}% slower than its baseline of {baseline:.6f}s")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,11 @@
+import logging
 import math
-import pickle
+import os
+import shutil
 from multiroom_model.global_settings import GlobalSettings
 from multiroom_model.simulation import Simulation
+from multiroom_model.result_sinks import ChunkedResultSink
+from multiroom_model.results_format import write_results_from_chunks, ResultsReader
 from multiroom_model.room_factory import (
     build_rooms,
     populate_room_with_emissions_file,
@@ -17,6 +21,9 @@ from multiroom_model.aperture_factory import (
 # Define some global settings which are true for the whole building
 if __name__ == '__main__':
 
+    # Report warnings (such as negative concentrations) for each interval, and a summary at the end of the run
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
     ambient_press = 1013.0   # ambient pressure (mbar) is assumed to be constant, and is the same in all rooms
     ambient_temp = 293.0     # ambient temperature (K) is assumed to be constant
     # ambient air density (assuming dry air), in kg/m3
@@ -43,7 +50,9 @@ if __name__ == '__main__':
         building_direction_in_radians=math.radians(180),
         air_density=rho,
         upwind_pressure_coefficient=0.3,
-        downwind_pressure_coefficient=-0.2
+        downwind_pressure_coefficient=-0.2,
+        # The InChemPy classes built for the rooms are saved here, so later runs can skip rebuilding them
+        mechanism_cache_folder='mechanism_cache'
     )
 
     # Construct the rooms
@@ -81,28 +90,52 @@ if __name__ == '__main__':
     # This lines uses the same file for all the rooms, but this could be different for the different rooms
     initial_conditions = dict((r, 'initial_concentrations.txt') for r in rooms)
 
-    # Run the simulation starting at time t0
-    # Run for a duration of t_total seconds
-    # interrupt the inchempy solver to apply the effects of windows every t_interval seconds
-    result = simulation.run(
-        t0=0,
-        t_total=20,
-        t_interval=6,
-        init_conditions=initial_conditions
-    )
-
-    # Save to pickle file
-
-    results_as_dictionary = dict((f"Room {i+1}", result[r]) for i, r in enumerate(rooms))
-
-    pickle.dump(results_as_dictionary, open("./results.pkl", "wb"))
+    # The results are streamed to disk as the run progresses, a chunk at a time, rather than kept in memory,
+    # so the memory needed doesn't grow with the length of the run
+    chunks_folder = "./results_chunks"
+    result_sink = ChunkedResultSink(
+        chunks_folder,
+        # Only keep these species, eg. columns=['O3', 'NO', 'NO2'], or all of them if None
+        columns=None,
+        # Only keep one row in each step of this many seconds, eg. min_time_step=60, or every row if None
+        min_time_step=None,
+        room_names=[f"Room {i+1}" for i in range(len(rooms))])
+
+    # The state of the run is saved to this file as it progresses (every 10 minutes, set by checkpoint_seconds)
+    # If a previous job was stopped before finishing (eg. by a time limit) the run continues from where it got to
+    checkpoint_file = "./checkpoint.npz"
+
+    if os.path.exists(checkpoint_file):
+        simulation.resume(checkpoint_file, checkpoint_file=checkpoint_file, result_sink=result_sink)
+    else:
+        # Run the simulation starting at time t0
+        # Run for a duration of t_total seconds
+        # interrupt the inchempy solver to apply the effects of windows every t_interval seconds
+        simulation.run(
+            t0=0,
+            t_total=20,
+            t_interval=6,
+            init_conditions=initial_conditions,
+            checkpoint_file=checkpoint_file,
+            result_sink=result_sink
+        )
+
+    # Save to the results folder, copying the chunks one at a time
+    # Each room's results are saved as arrays which can be memory mapped, read them with ResultsReader
+    write_results_from_chunks(chunks_folder, "./results")
+
+    # The run is complete, so a later job should start again rather than continue it
+    if os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+    shutil.rmtree(chunks_folder)
 
     # Make use of results here eg
     # plot tool
 
-    # Demo: Print one of the many results to the output
-    room_of_interest = rooms_dictionary[1]
+    # Demo: Print one of the many results to the output, reading only that species from the results folder
+    room_of_interest = "Room 1"
     species_of_interest = "CO"
     time_of_interest = 9
 
-    print(f"\n\nCO concentration in room 1 after 9 seconds = {result[room_of_interest][species_of_interest][time_of_interest]}")
+    result = ResultsReader("./results").dataframe(room_of_interest, [species_of_interest])
+    print(f"\n\nCO concentration in room 1 after 9 seconds = {result[species_of_interest][time_of_interest]}")